@@ -0,0 +1,226 @@
+"""Registry of the app's analyses and a dependency-aware executor.
+
+The "Run Analysis" pipeline used to call every selected helper in turn, and
+the report, insights and badges re-ran analyses that earlier sections had
+already computed. Here each analysis declares its inputs: shared per-chat
+structures (sentiment columns, reply table, text features, ...) or other
+analyses. ``run_analyses`` resolves what a selection needs, computes each
+node at most once per chat and user, runs nodes concurrently on a thread pool
+as soon as their inputs are ready, and records how long each node took.
+
+Results are kept on the chat's ``ChatIndex``, for the ``ANALYSIS_USERS``
+users analysed last; the app keeps one index per chat and privacy mode, so a
+rerun only computes what was not asked for before. This is the only copy of
+the results: the app reads them from here on every rerun.
+
+The app's indexes are shared by every session, so a run holds its index's
+lock from start to finish: frame columns are only added, and results of
+other users only dropped, while no other run reads them.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from chat_index import ChatIndex
+from emojis import emoji_table
+from enhanced_helper_1 import (
+    fetch_stats, monthly_timeline, daily_timeline, emoji_helper, most_common_words,
+    create_wordcloud, most_busy_users, sentiment_analysis, sentiment_timeline,
+    response_time_analysis, conversation_initiator_analysis, message_length_analysis,
+    communication_style_analysis, topic_modeling, detect_important_moments,
+    keyword_category_analysis
+)
+from enhanced_helper_2 import (
+    group_interaction_matrix, identify_group_roles, generate_chat_insights,
+    conversation_highlights, predict_activity_patterns, relationship_evolution_analysis,
+    calculate_communication_badges, personality_matching_analysis,
+    generate_comprehensive_report
+)
+from keywords import keyword_hits
+from links import add_links
+from sentiment import add_sentiment
+from text_corpus import corpus, term_index
+from text_features import text_features
+
+# Threads running analyses at once
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', '4'))
+
+# Users whose per-user results are kept on a chat's index
+ANALYSIS_USERS = 4
+
+
+def text_reply_table(chat):
+    """Reply table of text messages, as read by the interaction analyses."""
+    return chat.reply_table(media=False)
+
+
+# Each node: the function, whether it takes the selected user ('user') or only
+# the chat ('chat'), and the nodes it reads. Nodes that add frame columns say
+# so; nodes marked 'reuses_inputs' receive their inputs' results as `computed`.
+ANALYSES = {
+    # Shared per-chat structures
+    'sentiment': {'func': add_sentiment, 'scope': 'chat', 'inputs': [], 'writes_frame': True},
+    'links': {'func': add_links, 'scope': 'chat', 'inputs': [], 'writes_frame': True},
+    'text_features': {'func': text_features, 'scope': 'chat', 'inputs': []},
+    'keyword_hits': {'func': keyword_hits, 'scope': 'chat', 'inputs': []},
+    'corpus': {'func': corpus, 'scope': 'chat', 'inputs': []},
+    'term_index': {'func': term_index, 'scope': 'chat', 'inputs': ['corpus']},
+    'emoji_table': {'func': emoji_table, 'scope': 'chat', 'inputs': []},
+    'reply_table': {'func': ChatIndex.reply_table, 'scope': 'chat', 'inputs': []},
+    'text_reply_table': {'func': text_reply_table, 'scope': 'chat', 'inputs': []},
+
+    # Analyses shown by the app
+    'fetch_stats': {'func': fetch_stats, 'scope': 'user', 'inputs': ['links', 'text_features']},
+    'monthly_timeline': {'func': monthly_timeline, 'scope': 'user', 'inputs': []},
+    'daily_timeline': {'func': daily_timeline, 'scope': 'user', 'inputs': []},
+    'emoji_helper': {'func': emoji_helper, 'scope': 'user', 'inputs': ['emoji_table']},
+    'most_common_words': {'func': most_common_words, 'scope': 'user', 'inputs': ['term_index']},
+    'create_wordcloud': {'func': create_wordcloud, 'scope': 'user', 'inputs': ['term_index']},
+    'most_busy_users': {'func': most_busy_users, 'scope': 'chat', 'inputs': []},
+    'sentiment_analysis': {'func': sentiment_analysis, 'scope': 'user', 'inputs': ['sentiment']},
+    'sentiment_timeline': {'func': sentiment_timeline, 'scope': 'user', 'inputs': ['sentiment']},
+    'response_time_analysis': {'func': response_time_analysis, 'scope': 'user', 'inputs': ['reply_table']},
+    'conversation_initiator_analysis': {'func': conversation_initiator_analysis, 'scope': 'user', 'inputs': ['reply_table']},
+    'message_length_analysis': {'func': message_length_analysis, 'scope': 'user', 'inputs': ['text_features']},
+    'communication_style_analysis': {'func': communication_style_analysis, 'scope': 'user', 'inputs': ['text_features']},
+    'topic_modeling': {'func': topic_modeling, 'scope': 'user', 'inputs': ['corpus']},
+    'detect_important_moments': {'func': detect_important_moments, 'scope': 'user', 'inputs': ['text_features', 'keyword_hits']},
+    'keyword_category_analysis': {'func': keyword_category_analysis, 'scope': 'user', 'inputs': ['keyword_hits']},
+    'group_interaction_matrix': {'func': group_interaction_matrix, 'scope': 'chat', 'inputs': ['text_reply_table']},
+    'identify_group_roles': {'func': identify_group_roles, 'scope': 'chat', 'inputs': ['text_features', 'text_reply_table']},
+    'conversation_highlights': {'func': conversation_highlights, 'scope': 'user', 'inputs': ['text_features', 'keyword_hits']},
+    'predict_activity_patterns': {'func': predict_activity_patterns, 'scope': 'chat', 'inputs': []},
+    'relationship_evolution_analysis': {'func': relationship_evolution_analysis, 'scope': 'user', 'inputs': ['sentiment', 'text_features']},
+    'calculate_communication_badges': {'func': calculate_communication_badges, 'scope': 'user', 'inputs': ['reply_table']},
+    'personality_matching_analysis': {'func': personality_matching_analysis, 'scope': 'chat', 'inputs': ['sentiment', 'text_features']},
+    'generate_chat_insights': {'func': generate_chat_insights, 'scope': 'user', 'reuses_inputs': True,
+                               'inputs': ['sentiment_analysis', 'response_time_analysis']},
+    'generate_comprehensive_report': {'func': generate_comprehensive_report, 'scope': 'user', 'reuses_inputs': True,
+                                      'inputs': ['fetch_stats', 'sentiment_analysis', 'response_time_analysis',
+                                                 'communication_style_analysis', 'detect_important_moments',
+                                                 'generate_chat_insights', 'calculate_communication_badges']},
+}
+
+
+def resolve(names):
+    """The requested nodes and everything they read, inputs before their readers."""
+    order = []
+
+    def visit(name, path=()):
+        if name in order:
+            return
+        if name in path:
+            raise ValueError(f"Analysis dependency cycle: {' -> '.join(path + (name,))}")
+        if name not in ANALYSES:
+            raise KeyError(f"Unknown analysis {name!r}")
+        for dependency in ANALYSES[name]['inputs']:
+            visit(dependency, path + (name,))
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def run_analyses(df, selected_user='Overall', names=(), workers=None):
+    """Compute the requested analyses and their inputs, each at most once per chat and user.
+
+    Returns a dict with ``results`` and ``errors`` (by node name, an analysis
+    that raised has an error instead of a result) and ``timings`` (seconds per
+    node computed by this call; nodes reused from earlier calls are absent).
+    """
+    chat = ChatIndex.of(df)
+    with chat._cache.setdefault('analysis_lock', threading.Lock()):
+        return _run(chat, selected_user, names, workers or ANALYSIS_WORKERS)
+
+
+def result(run, name):
+    """An analysis result from ``run_analyses``, raising the error it failed with."""
+    if name in run['errors']:
+        raise run['errors'][name]
+    return run['results'][name]
+
+
+def _run(chat, selected_user, names, workers):
+    memo = chat._cache.setdefault('analyses', {})
+    _forget_users(chat, memo, selected_user)
+    run = {'results': {}, 'errors': {}, 'timings': {}}
+
+    def key(name):
+        return (name, None if ANALYSES[name]['scope'] == 'chat' else selected_user)
+
+    def collect(name):
+        value, error, _ = memo[key(name)]
+        if error is None:
+            run['results'][name] = value
+        else:
+            run['errors'][name] = error
+
+    def record(name, outcome):
+        memo[key(name)] = outcome
+        run['timings'][name] = outcome[2]
+        collect(name)
+
+    order = resolve(names)
+    pending = [name for name in order if key(name) not in memo]
+    for name in order:
+        if name not in pending:
+            collect(name)
+
+    # pandas does not support adding columns while other threads read the frame,
+    # so nodes that do run first, one at a time
+    for name in [name for name in pending if ANALYSES[name].get('writes_frame')]:
+        record(name, _compute(chat, selected_user, name, run['results']))
+    pending = [name for name in pending if not ANALYSES[name].get('writes_frame')]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            # Start every node whose inputs are all finished
+            for name in list(pending):
+                failed_writer = next((dependency for dependency in resolve([name])
+                                      if dependency in run['errors'] and ANALYSES[dependency].get('writes_frame')), None)
+                if failed_writer:
+                    # Running it would add the failed node's columns again, from several threads at once
+                    pending.remove(name)
+                    record(name, (None, run['errors'][failed_writer], 0.0))
+                elif not any(dependency in pending or dependency in running.values()
+                             for dependency in ANALYSES[name]['inputs']):
+                    pending.remove(name)
+                    running[pool.submit(_compute, chat, selected_user, name, dict(run['results']))] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                record(name, future.result())
+
+    return run
+
+
+def _forget_users(chat, memo, selected_user):
+    """Mark ``selected_user`` as analysed last and drop the results of users beyond ``ANALYSIS_USERS``."""
+    users = chat._cache.setdefault('analysis_users', [])
+    if selected_user in users:
+        users.remove(selected_user)
+    users.append(selected_user)
+    while len(users) > ANALYSIS_USERS:
+        user = users.pop(0)
+        for key in [key for key in memo if key[1] == user]:
+            memo.pop(key, None)
+
+
+def _compute(chat, selected_user, name, results):
+    """Run one node; returns ``(result, error, seconds)``."""
+    spec = ANALYSES[name]
+    args = (chat,) if spec['scope'] == 'chat' else (selected_user, chat)
+    kwargs = {}
+    if spec.get('reuses_inputs'):
+        kwargs['computed'] = {dependency: results[dependency] for dependency in spec['inputs'] if dependency in results}
+
+    start = time.perf_counter()
+    try:
+        value, error = spec['func'](*args, **kwargs), None
+    except Exception as e:
+        value, error = None, e
+    return value, error, time.perf_counter() - start
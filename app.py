@@ -1,17 +1,9 @@
 import streamlit as st
-import preprocessor
-from enhanced_helper_1 import (
-    fetch_stats, monthly_timeline, daily_timeline, emoji_helper, most_common_words, 
-    create_wordcloud, most_busy_users, sentiment_analysis, sentiment_timeline,
-    response_time_analysis, conversation_initiator_analysis, message_length_analysis,
-    communication_style_analysis, topic_modeling, detect_important_moments
-)
-from enhanced_helper_2 import (
-    group_interaction_matrix, identify_group_roles, generate_chat_insights,
-    conversation_highlights, predict_activity_patterns, relationship_evolution_analysis,
-    calculate_communication_badges, personality_matching_analysis, create_anonymous_analysis,
-    generate_comprehensive_report
-)
+import chat_cache
+from chat_append import index_chat
+from chat_index import ChatIndex
+from analysis_graph import ANALYSES, run_analyses, result
+from enhanced_helper_2 import create_anonymous_analysis
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
@@ -22,20 +14,54 @@ import warnings
 import html
 warnings.filterwarnings('ignore')
 
+def get_chat_key(uploaded_file):
+    """Hash each upload once per session instead of on every rerun"""
+    if st.session_state.get('chat_file_id') != uploaded_file.file_id:
+        st.session_state.chat_file_id = uploaded_file.file_id
+        st.session_state.chat_key = chat_cache.chat_key(uploaded_file)
+        st.session_state.analysis_timings = {}
+    return st.session_state.chat_key
+
 # Enable caching for better performance
-@st.cache_data
-def load_data(uploaded_file):
-    """Cache the data loading process"""
-    if uploaded_file is not None:
-        bytes_data = uploaded_file.getvalue()
-        data = bytes_data.decode("utf-8")
-        return preprocessor.preprocess(data)
-    return None
+@st.cache_resource(max_entries=4)
+def get_chat_index(chat_key, _uploaded_file):
+    """Load a chat and build its row index once, shared across reruns
+    
+    The index owns the parsed frame, memory-mapped from the on-disk chat
+    cache, so reruns neither reload nor copy it. A newer export of a chat
+    analysed earlier extends that chat's index.
+    """
+    return index_chat(chat_cache.load_chat(_uploaded_file, chat_key), key=chat_key)
+
+@st.cache_resource(max_entries=4)
+def get_anonymous_index(chat_key, _chat):
+    """Anonymise a chat once, so privacy mode reuses its analyses across reruns"""
+    df_analysis, user_mapping = create_anonymous_analysis(_chat)
+    return ChatIndex(df_analysis), user_mapping
+
+def section_results(chat_key, privacy_mode, selected_user, chat, names):
+    """A section's analyses, read from the results kept on the cached chat index
+    
+    The index is cached per chat fingerprint and privacy mode and keeps each
+    analysis for the users analysed last, so it already serves reruns and user
+    switches. It is the only copy of the results: st.cache_data would pickle a
+    copy of every result on each rerun, and session state only remembers how
+    long this session's analyses took.
+    """
+    run = run_analyses(chat, selected_user, names)
+    timings = st.session_state.setdefault('analysis_timings', {})
+    for name, seconds in run['timings'].items():
+        # Chat-wide analyses are shared by every selected user
+        user = None if ANALYSES[name]['scope'] == 'chat' else selected_user
+        timings[(chat_key, privacy_mode, user, name)] = (round(seconds, 3), 'failed' if name in run['errors'] else 'computed')
+    return run
 
-@st.cache_data
-def get_cached_stats(selected_user, df):
-    """Cache basic statistics"""
-    return fetch_stats(selected_user, df)
+def analysis_timings(chat_key, privacy_mode, selected_user):
+    """Seconds per analysis computed for the sections opened this session"""
+    rows = [(name, seconds, status)
+            for (key, privacy, user, name), (seconds, status) in st.session_state.get('analysis_timings', {}).items()
+            if (key, privacy) == (chat_key, privacy_mode) and user in (selected_user, None)]
+    return pd.DataFrame(rows, columns=['analysis', 'seconds', 'status'])
 
 # Set page configuration
 st.set_page_config(
@@ -95,7 +121,13 @@ def get_chart_colors():
 uploaded_file = st.sidebar.file_uploader("📁 Upload Your Chat File", type=['txt'], help="Upload WhatsApp, Telegram, or any chat export file")
 
 if uploaded_file is not None:
-    df = load_data(uploaded_file)
+    try:
+        chat_key = get_chat_key(uploaded_file)
+        chat_index = get_chat_index(chat_key, uploaded_file)
+    except ValueError as e:
+        st.error(f"❌ Could not read this chat export: {str(e)}")
+        st.stop()
+    df = chat_index.frame
 
     # User selection
     user_list = df['user'].unique().tolist()
@@ -150,187 +182,114 @@ if uploaded_file is not None:
     privacy_mode = st.sidebar.checkbox("🕵️ Anonymous Mode", value=False, help="Analyze patterns without showing actual messages")
 
     if st.sidebar.button("🚀 Run Analysis", type="primary"):
+        st.session_state.analysis_chat = chat_key
+
+    # Sections stay on screen across reruns; each computes its analyses only once opened
+    if st.session_state.get('analysis_chat') == chat_key:
         
-        # Initialize progress tracking
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Show loading message
-        with st.spinner("🔄 Processing your chat data... This may take a few moments for large files."):
-            
-            # Step 1: Privacy mode and data preparation
-            if privacy_mode:
-                status_text.text("🔒 Enabling privacy mode...")
-                progress_bar.progress(5)
-                st.info("🔒 Privacy Mode Enabled: All analysis will be performed anonymously without showing actual message content.")
-                df_analysis, user_mapping = create_anonymous_analysis(df)
-                progress_bar.progress(15)
-                # Show user mapping for reference
-                with st.expander("👥 User Mapping (for reference)"):
-                    for original, anonymous in user_mapping.items():
-                        if original != 'group_notification':
-                            st.write(f"{original} → {anonymous}")
-            else:
-                status_text.text("📊 Preparing data...")
-                progress_bar.progress(10)
-                df_analysis = df
-        
+        # Privacy mode and data preparation
+        if privacy_mode:
+            st.info("🔒 Privacy Mode Enabled: All analysis will be performed anonymously without showing actual message content.")
+            with st.spinner("🔒 Enabling privacy mode..."):
+                chat, user_mapping = get_anonymous_index(chat_key, chat_index)
+            df_analysis = chat.frame
+            # Show user mapping for reference
+            with st.expander("👥 User Mapping (for reference)"):
+                for original, anonymous in user_mapping.items():
+                    if original != 'group_notification':
+                        st.write(f"{original} → {anonymous}")
+        else:
+            df_analysis = df
+            chat = chat_index
+
+        # Sections open in any order, so the chart colours are set before all of them
+        colors = get_chart_colors()
+
         # Basic Statistics
         if basic_stats:
-            status_text.text("📊 Calculating basic statistics...")
-            progress_bar.progress(25)
-            
-            st.header("📊 Chat Statistics Overview")
-            
-            num_messages, words, num_media_messages, num_links = get_cached_stats(selected_user, df_analysis)
-            
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>💬</h3>
-                    <h2>{num_messages:,}</h2>
-                    <p>Messages</p>
-                </div>
-                """, unsafe_allow_html=True)
-            with col2:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>📝</h3>
-                    <h2>{words:,}</h2>
-                    <p>Words</p>
-                </div>
-                """, unsafe_allow_html=True)
-            with col3:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>📷</h3>
-                    <h2>{num_media_messages:,}</h2>
-                    <p>Media</p>
-                </div>
-                """, unsafe_allow_html=True)
-            with col4:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>🔗</h3>
-                    <h2>{num_links:,}</h2>
-                    <p>Links</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown("---")
+            with st.expander("📊 Chat Statistics Overview", expanded=True, key='section_stats', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("📊 Calculating basic statistics..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['fetch_stats'])
+                    
+                    num_messages, words, num_media_messages, num_links = result(run, 'fetch_stats')
+                    
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.markdown(f"""
+                        <div class="metric-card">
+                            <h3>💬</h3>
+                            <h2>{num_messages:,}</h2>
+                            <p>Messages</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    with col2:
+                        st.markdown(f"""
+                        <div class="metric-card">
+                            <h3>📝</h3>
+                            <h2>{words:,}</h2>
+                            <p>Words</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    with col3:
+                        st.markdown(f"""
+                        <div class="metric-card">
+                            <h3>📷</h3>
+                            <h2>{num_media_messages:,}</h2>
+                            <p>Media</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    with col4:
+                        st.markdown(f"""
+                        <div class="metric-card">
+                            <h3>🔗</h3>
+                            <h2>{num_links:,}</h2>
+                            <p>Links</p>
+                        </div>
+                        """, unsafe_allow_html=True)
 
         # Timeline Analysis
         if timeline:
-            status_text.text("📈 Generating timeline analysis...")
-            progress_bar.progress(35)
-            
-            st.header("📈 Timeline Analysis")
-            
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.subheader("📅 Monthly Timeline")
-                timeline_data = monthly_timeline(selected_user, df_analysis)
-                colors = get_chart_colors()
-                fig = px.line(timeline_data, x='time', y='message', 
-                             title='Messages Over Time (Monthly)',
-                             labels={'message': 'Message Count', 'time': 'Month-Year'})
-                fig.update_traces(line_color=colors['line_colors'][0], line_width=3)
-                fig.update_layout(
-                    plot_bgcolor=colors['bg_color'],
-                    paper_bgcolor=colors['paper_bg_color'],
-                    font=dict(color=colors['font_color'], size=12),
-                    xaxis=dict(
-                        gridcolor=colors['grid_color'],
-                        tickfont=dict(color=colors['axis_color']),
-                        title=dict(font=dict(color=colors['axis_color']))
-                    ),
-                    yaxis=dict(
-                        gridcolor=colors['grid_color'],
-                        tickfont=dict(color=colors['axis_color']),
-                        title=dict(font=dict(color=colors['axis_color']))
-                    )
-                )
-                st.plotly_chart(fig, use_container_width=True)
-
-            with col2:
-                st.subheader("📊 Daily Timeline")
-                daily_timeline_data = daily_timeline(selected_user, df_analysis)
-                fig = px.line(daily_timeline_data, x='only_date', y='message',
-                             title='Messages Over Time (Daily)',
-                             labels={'message': 'Message Count', 'only_date': 'Date'})
-                fig.update_traces(line_color=colors['line_colors'][1], line_width=3)
-                fig.update_layout(
-                    plot_bgcolor=colors['bg_color'],
-                    paper_bgcolor=colors['paper_bg_color'],
-                    font=dict(color=colors['font_color'], size=12),
-                    xaxis=dict(
-                        gridcolor=colors['grid_color'],
-                        tickfont=dict(color=colors['axis_color']),
-                        title=dict(font=dict(color=colors['axis_color']))
-                    ),
-                    yaxis=dict(
-                        gridcolor=colors['grid_color'],
-                        tickfont=dict(color=colors['axis_color']),
-                        title=dict(font=dict(color=colors['axis_color']))
-                    )
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            st.markdown("---")
-
-        # Emoji Analysis
-        if emoji_analysis:
-            status_text.text("😊 Analyzing emoji usage...")
-            progress_bar.progress(45)
-            
-            st.header("😊 Emoji Analysis")
-            try:
-                emoji_df = emoji_helper(selected_user, df_analysis)
-                if not emoji_df.empty:
+            with st.expander("📈 Timeline Analysis", expanded=False, key='section_timeline', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("📈 Generating timeline analysis..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['monthly_timeline', 'daily_timeline'])
+                    
                     col1, col2 = st.columns(2)
+
                     with col1:
-                        st.subheader("😊 Top Emojis Used")
-                        st.dataframe(emoji_df.head(10), use_container_width=True)
-                    with col2:
-                        fig = px.pie(emoji_df.head(8), values='count', names='emoji',
-                                   title='Top Emojis Used',
-                                   color_discrete_sequence=px.colors.qualitative.Set3)
+                        st.subheader("📅 Monthly Timeline")
+                        timeline_data = result(run, 'monthly_timeline')
+                        colors = get_chart_colors()
+                        fig = px.line(timeline_data, x='time', y='message', 
+                                     title='Messages Over Time (Monthly)',
+                                     labels={'message': 'Message Count', 'time': 'Month-Year'})
+                        fig.update_traces(line_color=colors['line_colors'][0], line_width=3)
                         fig.update_layout(
                             plot_bgcolor=colors['bg_color'],
                             paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12)
+                            font=dict(color=colors['font_color'], size=12),
+                            xaxis=dict(
+                                gridcolor=colors['grid_color'],
+                                tickfont=dict(color=colors['axis_color']),
+                                title=dict(font=dict(color=colors['axis_color']))
+                            ),
+                            yaxis=dict(
+                                gridcolor=colors['grid_color'],
+                                tickfont=dict(color=colors['axis_color']),
+                                title=dict(font=dict(color=colors['axis_color']))
+                            )
                         )
                         st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("No emojis found in the selected data.")
-            except Exception as e:
-                st.warning(f"Could not analyze emojis: {str(e)}")
-            
-            st.markdown("---")
-
-        # Word Analysis
-        if word_analysis:
-            status_text.text("📝 Analyzing word patterns...")
-            progress_bar.progress(55)
-            
-            st.header("📝 Word Analysis")
-            
-            col1, col2 = st.columns(2)
 
-            with col1:
-                st.subheader("📝 Most Common Words")
-                try:
-                    most_common_df = most_common_words(selected_user, df_analysis)
-                    if not most_common_df.empty:
-                        colors = get_chart_colors()
-                        fig = px.bar(most_common_df, x=1, y=0, orientation='h',
-                                   title='Top 20 Most Common Words',
-                                   color=1,
-                                   color_continuous_scale='Viridis')
+                    with col2:
+                        st.subheader("📊 Daily Timeline")
+                        daily_timeline_data = result(run, 'daily_timeline')
+                        fig = px.line(daily_timeline_data, x='only_date', y='message',
+                                     title='Messages Over Time (Daily)',
+                                     labels={'message': 'Message Count', 'only_date': 'Date'})
+                        fig.update_traces(line_color=colors['line_colors'][1], line_width=3)
                         fig.update_layout(
-                            showlegend=False,
                             plot_bgcolor=colors['bg_color'],
                             paper_bgcolor=colors['paper_bg_color'],
                             font=dict(color=colors['font_color'], size=12),
@@ -346,90 +305,146 @@ if uploaded_file is not None:
                             )
                         )
                         st.plotly_chart(fig, use_container_width=True)
-                except Exception as e:
-                    st.warning(f"Could not analyze common words: {str(e)}")
-            
-            with col2:
-                st.subheader("☁️ Word Cloud")
-                try:
-                    df_wc = create_wordcloud(selected_user, df_analysis)
-                    fig, ax = plt.subplots(figsize=(10, 6), facecolor='none')
-                    ax.imshow(df_wc, interpolation='bilinear')
-                    ax.axis('off')
-                    ax.set_facecolor('none')
-                    fig.patch.set_alpha(0)
-                    st.pyplot(fig)
-                except Exception as e:
-                    st.warning(f"Could not generate word cloud: {str(e)}")
-            
-            st.markdown("---")
+
+        # Emoji Analysis
+        if emoji_analysis:
+            with st.expander("😊 Emoji Analysis", expanded=False, key='section_emoji', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("😊 Analyzing emoji usage..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['emoji_helper'])
+                    
+                    try:
+                        emoji_df = result(run, 'emoji_helper')
+                        if not emoji_df.empty:
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                st.subheader("😊 Top Emojis Used")
+                                st.dataframe(emoji_df.head(10), use_container_width=True)
+                            with col2:
+                                fig = px.pie(emoji_df.head(8), values='count', names='emoji',
+                                           title='Top Emojis Used',
+                                           color_discrete_sequence=px.colors.qualitative.Set3)
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12)
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        else:
+                            st.info("No emojis found in the selected data.")
+                    except Exception as e:
+                        st.warning(f"Could not analyze emojis: {str(e)}")
+
+        # Word Analysis
+        if word_analysis:
+            with st.expander("📝 Word Analysis", expanded=False, key='section_words', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("📝 Analyzing word patterns..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['most_common_words', 'create_wordcloud'])
+                    
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        st.subheader("📝 Most Common Words")
+                        try:
+                            most_common_df = result(run, 'most_common_words')
+                            if not most_common_df.empty:
+                                colors = get_chart_colors()
+                                fig = px.bar(most_common_df, x=1, y=0, orientation='h',
+                                           title='Top 20 Most Common Words',
+                                           color=1,
+                                           color_continuous_scale='Viridis')
+                                fig.update_layout(
+                                    showlegend=False,
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        except Exception as e:
+                            st.warning(f"Could not analyze common words: {str(e)}")
+                    
+                    with col2:
+                        st.subheader("☁️ Word Cloud")
+                        try:
+                            df_wc = result(run, 'create_wordcloud')
+                            fig, ax = plt.subplots(figsize=(10, 6), facecolor='none')
+                            ax.imshow(df_wc, interpolation='bilinear')
+                            ax.axis('off')
+                            ax.set_facecolor('none')
+                            fig.patch.set_alpha(0)
+                            st.pyplot(fig)
+                        except Exception as e:
+                            st.warning(f"Could not generate word cloud: {str(e)}")
 
         # Activity Analysis
         if activity_analysis:
-            status_text.text("🔥 Analyzing activity patterns...")
-            progress_bar.progress(65)
-            
-            st.header("🔥 Activity Analysis")
-            
-            # Most Busy Users (for group chats)
-            if selected_user == 'Overall' and len(df_analysis['user'].unique()) > 2:
-                st.subheader("👥 Most Active Users")
-                x, new_df = most_busy_users(df_analysis)
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    colors = get_chart_colors()
-                    fig = px.bar(x=x.values, y=x.index, orientation='h',
-                               title='Most Active Users (Message Count)',
-                               labels={'x': 'Message Count', 'y': 'User'},
-                               color=x.values,
-                               color_continuous_scale='Viridis')
-                    fig.update_layout(
-                        plot_bgcolor=colors['bg_color'],
-                        paper_bgcolor=colors['paper_bg_color'],
-                        font=dict(color=colors['font_color'], size=12),
-                        xaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        ),
-                        yaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        )
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                
-                with col2:
-                    st.subheader("📊 Activity Percentage")
-                    st.dataframe(new_df, use_container_width=True)
-            
-            st.markdown("---")
+            with st.expander("🔥 Activity Analysis", expanded=False, key='section_activity', on_change='rerun') as section:
+                if section.open:
+                    # Most Busy Users (for group chats)
+                    if selected_user == 'Overall' and len(df_analysis['user'].unique()) > 2:
+                        st.subheader("👥 Most Active Users")
+                        with st.spinner("🔥 Analyzing activity patterns..."):
+                            run = section_results(chat_key, privacy_mode, selected_user, chat, ['most_busy_users'])
+                        x, new_df = result(run, 'most_busy_users')
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            colors = get_chart_colors()
+                            fig = px.bar(x=x.values, y=x.index, orientation='h',
+                                       title='Most Active Users (Message Count)',
+                                       labels={'x': 'Message Count', 'y': 'User'},
+                                       color=x.values,
+                                       color_continuous_scale='Viridis')
+                            fig.update_layout(
+                                plot_bgcolor=colors['bg_color'],
+                                paper_bgcolor=colors['paper_bg_color'],
+                                font=dict(color=colors['font_color'], size=12),
+                                xaxis=dict(
+                                    gridcolor=colors['grid_color'],
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                ),
+                                yaxis=dict(
+                                    gridcolor=colors['grid_color'],
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                )
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
+                        
+                        with col2:
+                            st.subheader("📊 Activity Percentage")
+                            st.dataframe(new_df, use_container_width=True)
 
         # User Analysis
         if user_analysis:
-            status_text.text("👥 Analyzing user interactions...")
-            progress_bar.progress(75)
-            
-            st.header("👥 User Analysis")
-            
-            if selected_user == 'Overall' and len(df_analysis['user'].unique()) > 2:
-                st.subheader("📊 User Statistics")
-                user_stats = df_analysis[df_analysis['user'] != 'group_notification']['user'].value_counts()
-                
-                colors = get_chart_colors()
-                fig = px.pie(values=user_stats.values, names=user_stats.index,
-                           title='Message Distribution by User',
-                           color_discrete_sequence=px.colors.qualitative.Set3)
-                fig.update_layout(
-                    plot_bgcolor=colors['bg_color'],
-                    paper_bgcolor=colors['paper_bg_color'],
-                    font=dict(color=colors['font_color'], size=12)
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            st.markdown("---")
+            with st.expander("👥 User Analysis", expanded=False, key='section_users', on_change='rerun') as section:
+                if section.open:
+                    if selected_user == 'Overall' and len(df_analysis['user'].unique()) > 2:
+                        st.subheader("📊 User Statistics")
+                        user_stats = df_analysis[df_analysis['user'] != 'group_notification']['user'].value_counts()
+                        
+                        colors = get_chart_colors()
+                        fig = px.pie(values=user_stats.values, names=user_stats.index,
+                                   title='Message Distribution by User',
+                                   color_discrete_sequence=px.colors.qualitative.Set3)
+                        fig.update_layout(
+                            plot_bgcolor=colors['bg_color'],
+                            paper_bgcolor=colors['paper_bg_color'],
+                            font=dict(color=colors['font_color'], size=12)
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
 
         # ==================== ADVANCED ANALYTICS ====================
 
@@ -438,172 +453,301 @@ if uploaded_file is not None:
 
         # Sentiment Analysis
         if sentiment_checkbox:
-            status_text.text("😊 Analyzing sentiment and emotions...")
-            progress_bar.progress(80)
-            
-            st.header("😊 Sentiment & Emotion Analysis")
-            
-            try:
-                sentiment_data = sentiment_analysis(selected_user, df_analysis)
-                
-                if not sentiment_data.empty:
-                    col1, col2 = st.columns(2)
+            with st.expander("😊 Sentiment & Emotion Analysis", expanded=False, key='section_sentiment', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("😊 Analyzing sentiment and emotions..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['sentiment_analysis', 'sentiment_timeline'])
+                    
+                    try:
+                        sentiment_data = result(run, 'sentiment_analysis')
+                        
+                        if not sentiment_data.empty:
+                            col1, col2 = st.columns(2)
 
-                    with col1:
-                        # Sentiment distribution
-                        sentiment_counts = sentiment_data['sentiment'].value_counts()
-                        colors = get_chart_colors()
-                        fig = px.pie(values=sentiment_counts.values, 
-                                   names=sentiment_counts.index,
-                                   title='Overall Sentiment Distribution',
-                                   color_discrete_map={
-                                       'Positive': '#10b981',
-                                       'Negative': '#ef4444',
-                                       'Neutral': '#f59e0b'
-                                   })
-                        fig.update_layout(
-                            plot_bgcolor=colors['bg_color'],
-                            paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12)
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
+                            with col1:
+                                # Sentiment distribution
+                                sentiment_counts = sentiment_data['sentiment'].value_counts()
+                                colors = get_chart_colors()
+                                fig = px.pie(values=sentiment_counts.values, 
+                                           names=sentiment_counts.index,
+                                           title='Overall Sentiment Distribution',
+                                           color_discrete_map={
+                                               'Positive': '#10b981',
+                                               'Negative': '#ef4444',
+                                               'Neutral': '#f59e0b'
+                                           })
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12)
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
 
-                    with col2:
-                        # Sentiment metrics
-                        avg_polarity = sentiment_data['polarity'].mean()
-                        avg_subjectivity = sentiment_data['subjectivity'].mean()
-                        
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>📊</h3>
-                            <h2>{avg_polarity:.3f}</h2>
-                            <p>Avg Polarity</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>🎭</h3>
-                            <h2>{avg_subjectivity:.3f}</h2>
-                            <p>Avg Subjectivity</p>
-                        </div>
-                        """, unsafe_allow_html=True)
+                            with col2:
+                                # Sentiment metrics
+                                avg_polarity = sentiment_data['polarity'].mean()
+                                avg_subjectivity = sentiment_data['subjectivity'].mean()
+                                
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>📊</h3>
+                                    <h2>{avg_polarity:.3f}</h2>
+                                    <p>Avg Polarity</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>🎭</h3>
+                                    <h2>{avg_subjectivity:.3f}</h2>
+                                    <p>Avg Subjectivity</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                
+                                # Sentiment interpretation
+                                if avg_polarity > 0.1:
+                                    st.success("😊 Overall Positive Communication")
+                                elif avg_polarity < -0.1:
+                                    st.error("😔 Overall Negative Communication")
+                                else:
+                                    st.info("😐 Neutral Communication Tone")
+                            
+                            # Sentiment timeline
+                            st.subheader("📈 Sentiment Over Time")
+                            sentiment_timeline_data = result(run, 'sentiment_timeline')
+                            
+                            fig = go.Figure()
+                            fig.add_trace(go.Scatter(x=sentiment_timeline_data['only_date'], 
+                                                   y=sentiment_timeline_data['positive_ratio'],
+                                                   mode='lines', name='Positive Ratio',
+                                                   line=dict(color=colors['line_colors'][1], width=3)))
+                            fig.add_trace(go.Scatter(x=sentiment_timeline_data['only_date'], 
+                                                   y=sentiment_timeline_data['negative_ratio'],
+                                                   mode='lines', name='Negative Ratio',
+                                                   line=dict(color=colors['line_colors'][0], width=3)))
+                            fig.update_layout(
+                                title=dict(
+                                    text='Sentiment Trends Over Time',
+                                    font=dict(color=colors['title_color'], size=16)
+                                ),
+                                xaxis_title='Date', 
+                                yaxis_title='Ratio',
+                                plot_bgcolor=colors['bg_color'],
+                                paper_bgcolor=colors['paper_bg_color'],
+                                font=dict(color=colors['font_color'], size=12),
+                                xaxis=dict(
+                                    gridcolor=colors['grid_color'],
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                ),
+                                yaxis=dict(
+                                    gridcolor=colors['grid_color'],
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                )
+                            )
+                            st.plotly_chart(fig, use_container_width=True)
                         
-                        # Sentiment interpretation
-                        if avg_polarity > 0.1:
-                            st.success("😊 Overall Positive Communication")
-                        elif avg_polarity < -0.1:
-                            st.error("😔 Overall Negative Communication")
                         else:
-                            st.info("😐 Neutral Communication Tone")
-                    
-                    # Sentiment timeline
-                    st.subheader("📈 Sentiment Over Time")
-                    sentiment_timeline_data = sentiment_timeline(selected_user, df_analysis)
-                    
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(x=sentiment_timeline_data['only_date'], 
-                                           y=sentiment_timeline_data['positive_ratio'],
-                                           mode='lines', name='Positive Ratio',
-                                           line=dict(color=colors['line_colors'][1], width=3)))
-                    fig.add_trace(go.Scatter(x=sentiment_timeline_data['only_date'], 
-                                           y=sentiment_timeline_data['negative_ratio'],
-                                           mode='lines', name='Negative Ratio',
-                                           line=dict(color=colors['line_colors'][0], width=3)))
-                    fig.update_layout(
-                        title=dict(
-                            text='Sentiment Trends Over Time',
-                            font=dict(color=colors['title_color'], size=16)
-                        ),
-                        xaxis_title='Date', 
-                        yaxis_title='Ratio',
-                        plot_bgcolor=colors['bg_color'],
-                        paper_bgcolor=colors['paper_bg_color'],
-                        font=dict(color=colors['font_color'], size=12),
-                        xaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        ),
-                        yaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        )
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                
-                else:
-                    st.warning("Unable to perform sentiment analysis on this data.")
-                    
-            except Exception as e:
-                st.error(f"Error in sentiment analysis: {str(e)}")
-            
-            st.markdown("---")
+                            st.warning("Unable to perform sentiment analysis on this data.")
+                            
+                    except Exception as e:
+                        st.error(f"Error in sentiment analysis: {str(e)}")
 
         # Response Time Analysis
         if response_analysis:
-            status_text.text("⚡ Analyzing response patterns...")
-            progress_bar.progress(82)
-            
-            st.header("⚡ Response Time & Conversation Dynamics")
-            
-            try:
-                response_df, avg_response = response_time_analysis(selected_user, df_analysis)
-                
-                if not response_df.empty:
-                    col1, col2 = st.columns(2)
+            with st.expander("⚡ Response Time & Conversation Dynamics", expanded=False, key='section_response', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("⚡ Analyzing response patterns..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['response_time_analysis', 'conversation_initiator_analysis'])
                     
-                    with col1:
-                        st.subheader("📊 Response Time Statistics")
-                        avg_resp_time = response_df['response_time_minutes'].mean()
-                        median_resp_time = response_df['response_time_minutes'].median()
+                    try:
+                        response_df, avg_response = result(run, 'response_time_analysis')
                         
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>⏱️</h3>
-                            <h2>{avg_resp_time:.1f}m</h2>
-                            <p>Avg Response</p>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        if not response_df.empty:
+                            col1, col2 = st.columns(2)
+                            
+                            with col1:
+                                st.subheader("📊 Response Time Statistics")
+                                avg_resp_time = response_df['response_time_minutes'].mean()
+                                median_resp_time = response_df['response_time_minutes'].median()
+                                
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>⏱️</h3>
+                                    <h2>{avg_resp_time:.1f}m</h2>
+                                    <p>Avg Response</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>📊</h3>
+                                    <h2>{median_resp_time:.1f}m</h2>
+                                    <p>Median Response</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                
+                                # Response time distribution
+                                colors = get_chart_colors()
+                                fig = px.histogram(response_df, x='response_time_minutes',
+                                                 title='Response Time Distribution',
+                                                 nbins=30, color_discrete_sequence=['#3b82f6'])
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                            
+                            with col2:
+                                st.subheader("👥 Response Time by User")
+                                if not avg_response.empty:
+                                    fig = px.bar(x=avg_response.index, y=avg_response['mean'],
+                                               title='Average Response Time by User',
+                                               labels={'y': 'Avg Response Time (min)', 'x': 'User'},
+                                               color=avg_response['mean'],
+                                               color_continuous_scale='Viridis')
+                                    fig.update_layout(
+                                        plot_bgcolor=colors['bg_color'],
+                                        paper_bgcolor=colors['paper_bg_color'],
+                                        font=dict(color=colors['font_color'], size=12),
+                                        xaxis=dict(
+                                            gridcolor=colors['grid_color'],
+                                            tickfont=dict(color=colors['axis_color']),
+                                            title=dict(font=dict(color=colors['axis_color']))
+                                        ),
+                                        yaxis=dict(
+                                            gridcolor=colors['grid_color'],
+                                            tickfont=dict(color=colors['axis_color']),
+                                            title=dict(font=dict(color=colors['axis_color']))
+                                        )
+                                    )
+                                    st.plotly_chart(fig, use_container_width=True)
                         
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>📊</h3>
-                            <h2>{median_resp_time:.1f}m</h2>
-                            <p>Median Response</p>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        # Conversation initiator analysis
+                        st.subheader("🎯 Conversation Initiators")
+                        initiator_data = result(run, 'conversation_initiator_analysis')
                         
-                        # Response time distribution
-                        colors = get_chart_colors()
-                        fig = px.histogram(response_df, x='response_time_minutes',
-                                         title='Response Time Distribution',
-                                         nbins=30, color_discrete_sequence=['#3b82f6'])
-                        fig.update_layout(
-                            plot_bgcolor=colors['bg_color'],
-                            paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12),
-                            xaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            ),
-                            yaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
+                        if not initiator_data.empty:
+                            fig = px.pie(values=initiator_data.values, names=initiator_data.index,
+                                       title='Who Starts Conversations Most Often?',
+                                       color_discrete_sequence=px.colors.qualitative.Set3)
+                            fig.update_layout(
+                                plot_bgcolor=colors['bg_color'],
+                                paper_bgcolor=colors['paper_bg_color'],
+                                font=dict(color=colors['font_color'], size=12)
                             )
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(fig, use_container_width=True)
+                        
+                    except Exception as e:
+                        st.error(f"Error in response analysis: {str(e)}")
+
+        # Communication Style Analysis
+        if style_analysis:
+            with st.expander("💬 Communication Style & Personality", expanded=False, key='section_style', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("💬 Analyzing communication styles..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['message_length_analysis', 'communication_style_analysis'])
                     
-                    with col2:
-                        st.subheader("👥 Response Time by User")
-                        if not avg_response.empty:
-                            fig = px.bar(x=avg_response.index, y=avg_response['mean'],
-                                       title='Average Response Time by User',
-                                       labels={'y': 'Avg Response Time (min)', 'x': 'User'},
-                                       color=avg_response['mean'],
+                    try:
+                        # Message length analysis
+                        msg_data, length_stats = result(run, 'message_length_analysis')
+                        
+                        col1, col2 = st.columns(2)
+                        
+                        with col1:
+                            st.subheader("📏 Message Length Patterns")
+                            if not length_stats.empty:
+                                st.dataframe(length_stats, use_container_width=True)
+                            
+                            # Message length distribution
+                            if not msg_data.empty:
+                                colors = get_chart_colors()
+                                fig = px.box(msg_data, x='user', y='message_length',
+                                           title='Message Length Distribution by User',
+                                           color_discrete_sequence=['#3b82f6'])
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        
+                        with col2:
+                            st.subheader("🎨 Communication Style Metrics")
+                            style_data = result(run, 'communication_style_analysis')
+                            
+                            if not style_data.empty:
+                                st.dataframe(style_data, use_container_width=True)
+                                
+                                # Create a simpler visualization instead of radar
+                                fig = px.bar(style_data.reset_index(), 
+                                           x='user', y='exclamation_count',
+                                           title='Exclamation Usage by User',
+                                           color='exclamation_count',
+                                           color_continuous_scale='Viridis')
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        
+                    except Exception as e:
+                        st.error(f"Error in communication style analysis: {str(e)}")
+
+        # Topic Analysis
+        if topics_analysis:
+            with st.expander("🎯 Smart Content & Topic Analysis", expanded=False, key='section_topics', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("🎯 Analyzing topics and content..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['topic_modeling', 'detect_important_moments', 'keyword_category_analysis'])
+                    
+                    try:
+                        topics_data, lda_model = result(run, 'topic_modeling')
+                        
+                        if topics_data:
+                            st.subheader("🔍 Discovered Topics")
+                            for i, topic in enumerate(topics_data):
+                                st.write(f"**Topic {i+1}:** {', '.join(topic['words'][:5])}")
+                            
+                            # Topic visualization
+                            topic_df = pd.DataFrame(topics_data)
+                            colors = get_chart_colors()
+                            fig = px.bar(topic_df, x='topic_id', y='weight',
+                                       title='Topic Strength Distribution',
+                                       color='weight',
                                        color_continuous_scale='Viridis')
                             fig.update_layout(
                                 plot_bgcolor=colors['bg_color'],
@@ -621,484 +765,354 @@ if uploaded_file is not None:
                                 )
                             )
                             st.plotly_chart(fig, use_container_width=True)
-                
-                # Conversation initiator analysis
-                st.subheader("🎯 Conversation Initiators")
-                initiator_data = conversation_initiator_analysis(selected_user, df_analysis)
-                
-                if not initiator_data.empty:
-                    fig = px.pie(values=initiator_data.values, names=initiator_data.index,
-                               title='Who Starts Conversations Most Often?',
-                               color_discrete_sequence=px.colors.qualitative.Set3)
-                    fig.update_layout(
-                        plot_bgcolor=colors['bg_color'],
-                        paper_bgcolor=colors['paper_bg_color'],
-                        font=dict(color=colors['font_color'], size=12)
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error in response analysis: {str(e)}")
-            
-            st.markdown("---")
+                        else:
+                            st.info("Not enough data for topic modeling or analysis failed.")
+                        
+                        # Important moments detection
+                        st.subheader("⭐ Important Moments")
+                        important_moments = result(run, 'detect_important_moments')
+                        
+                        if not important_moments.empty:
+                            st.dataframe(important_moments.head(10)[['date', 'user', 'message', 'score']], use_container_width=True)
+                        else:
+                            st.info("No significant moments detected.")
+                        
+                        # Keyword categories, including any keyword files in KEYWORD_DIR
+                        st.subheader("🏷️ Keyword Categories")
+                        category_counts = result(run, 'keyword_category_analysis')
+                        
+                        if category_counts.to_numpy().any():
+                            st.dataframe(category_counts, use_container_width=True)
+                        else:
+                            st.info("No category keywords found.")
+                        
+                    except Exception as e:
+                        st.error(f"Error in topic analysis: {str(e)}")
 
-        # Communication Style Analysis
-        if style_analysis:
-            status_text.text("💬 Analyzing communication styles...")
-            progress_bar.progress(84)
-            
-            st.header("💬 Communication Style & Personality")
-            
-            try:
-                # Message length analysis
-                msg_data, length_stats = message_length_analysis(selected_user, df_analysis)
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.subheader("📏 Message Length Patterns")
-                    if not length_stats.empty:
-                        st.dataframe(length_stats, use_container_width=True)
+        # Group Dynamics (only for group chats)
+        if dynamics_analysis and len(df_analysis['user'].unique()) > 3:
+            with st.expander("🏆 Group Dynamics & Social Network", expanded=False, key='section_dynamics', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("🏆 Analyzing group dynamics..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['group_interaction_matrix', 'identify_group_roles'])
                     
-                    # Message length distribution
-                    if not msg_data.empty:
-                        colors = get_chart_colors()
-                        fig = px.box(msg_data, x='user', y='message_length',
-                                   title='Message Length Distribution by User',
-                                   color_discrete_sequence=['#3b82f6'])
-                        fig.update_layout(
-                            plot_bgcolor=colors['bg_color'],
-                            paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12),
-                            xaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            ),
-                            yaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
+                    try:
+                        # Interaction Matrix
+                        st.subheader("🤝 Interaction Matrix")
+                        interaction_matrix = result(run, 'group_interaction_matrix')
+                        
+                        if not interaction_matrix.empty:
+                            colors = get_chart_colors()
+                            fig = px.imshow(interaction_matrix,
+                                          title='Who Responds to Whom?',
+                                          labels=dict(color="Interactions"),
+                                          color_continuous_scale='Viridis')
+                            fig.update_layout(
+                                plot_bgcolor=colors['bg_color'],
+                                paper_bgcolor=colors['paper_bg_color'],
+                                font=dict(color=colors['font_color'], size=12),
+                                xaxis=dict(
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                ),
+                                yaxis=dict(
+                                    tickfont=dict(color=colors['axis_color']),
+                                    title=dict(font=dict(color=colors['axis_color']))
+                                )
                             )
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                
-                with col2:
-                    st.subheader("🎨 Communication Style Metrics")
-                    style_data = communication_style_analysis(selected_user, df_analysis)
-                    
-                    if not style_data.empty:
-                        st.dataframe(style_data, use_container_width=True)
+                            st.plotly_chart(fig, use_container_width=True)
+                        
+                        # Group roles
+                        st.subheader("👥 Group Roles")
+                        roles = result(run, 'identify_group_roles')
+                        
+                        role_summary = []
+                        for user, role_data in roles.items():
+                            role_summary.append({
+                                'User': user,
+                                'Primary Role': role_data['primary_role'],
+                                'Messages': role_data['stats']['total_messages'],
+                                'Response Rate': f"{role_data['stats']['response_rate']:.2%}"
+                            })
+                        
+                        roles_df = pd.DataFrame(role_summary)
+                        st.dataframe(roles_df, use_container_width=True)
                         
-                        # Create a simpler visualization instead of radar
-                        fig = px.bar(style_data.reset_index(), 
-                                   x='user', y='exclamation_count',
-                                   title='Exclamation Usage by User',
-                                   color='exclamation_count',
-                                   color_continuous_scale='Viridis')
+                        # Role distribution
+                        role_counts = roles_df['Primary Role'].value_counts()
+                        colors = get_chart_colors()
+                        fig = px.pie(values=role_counts.values, names=role_counts.index,
+                                   title='Group Role Distribution',
+                                   color_discrete_sequence=px.colors.qualitative.Set3)
                         fig.update_layout(
                             plot_bgcolor=colors['bg_color'],
                             paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12),
-                            xaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            ),
-                            yaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            )
+                            font=dict(color=colors['font_color'], size=12)
                         )
                         st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error in communication style analysis: {str(e)}")
-            
-            st.markdown("---")
-
-        # Topic Analysis
-        if topics_analysis:
-            status_text.text("🎯 Analyzing topics and content...")
-            progress_bar.progress(86)
-            
-            st.header("🎯 Smart Content & Topic Analysis")
-            
-            try:
-                topics_data, lda_model = topic_modeling(selected_user, df_analysis)
-                
-                if topics_data:
-                    st.subheader("🔍 Discovered Topics")
-                    for i, topic in enumerate(topics_data):
-                        st.write(f"**Topic {i+1}:** {', '.join(topic['words'][:5])}")
-                    
-                    # Topic visualization
-                    topic_df = pd.DataFrame(topics_data)
-                    colors = get_chart_colors()
-                    fig = px.bar(topic_df, x='topic_id', y='weight',
-                               title='Topic Strength Distribution',
-                               color='weight',
-                               color_continuous_scale='Viridis')
-                    fig.update_layout(
-                        plot_bgcolor=colors['bg_color'],
-                        paper_bgcolor=colors['paper_bg_color'],
-                        font=dict(color=colors['font_color'], size=12),
-                        xaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        ),
-                        yaxis=dict(
-                            gridcolor=colors['grid_color'],
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        )
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("Not enough data for topic modeling or analysis failed.")
-                
-                # Important moments detection
-                st.subheader("⭐ Important Moments")
-                important_moments = detect_important_moments(selected_user, df_analysis)
-                
-                if not important_moments.empty:
-                    st.dataframe(important_moments.head(10)[['date', 'user', 'message', 'score']], use_container_width=True)
-                else:
-                    st.info("No significant moments detected.")
-                
-            except Exception as e:
-                st.error(f"Error in topic analysis: {str(e)}")
-            
-            st.markdown("---")
-
-        # Group Dynamics (only for group chats)
-        if dynamics_analysis and len(df_analysis['user'].unique()) > 3:
-            status_text.text("🏆 Analyzing group dynamics...")
-            progress_bar.progress(88)
-            
-            st.header("🏆 Group Dynamics & Social Network")
-            
-            try:
-                # Interaction Matrix
-                st.subheader("🤝 Interaction Matrix")
-                interaction_matrix = group_interaction_matrix(df_analysis)
-                
-                if not interaction_matrix.empty:
-                    colors = get_chart_colors()
-                    fig = px.imshow(interaction_matrix,
-                                  title='Who Responds to Whom?',
-                                  labels=dict(color="Interactions"),
-                                  color_continuous_scale='Viridis')
-                    fig.update_layout(
-                        plot_bgcolor=colors['bg_color'],
-                        paper_bgcolor=colors['paper_bg_color'],
-                        font=dict(color=colors['font_color'], size=12),
-                        xaxis=dict(
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        ),
-                        yaxis=dict(
-                            tickfont=dict(color=colors['axis_color']),
-                            title=dict(font=dict(color=colors['axis_color']))
-                        )
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
-                
-                # Group roles
-                st.subheader("👥 Group Roles")
-                roles = identify_group_roles(df_analysis)
-                
-                role_summary = []
-                for user, role_data in roles.items():
-                    role_summary.append({
-                        'User': user,
-                        'Primary Role': role_data['primary_role'],
-                        'Messages': role_data['stats']['total_messages'],
-                        'Response Rate': f"{role_data['stats']['response_rate']:.2%}"
-                    })
-                
-                roles_df = pd.DataFrame(role_summary)
-                st.dataframe(roles_df, use_container_width=True)
-                
-                # Role distribution
-                role_counts = roles_df['Primary Role'].value_counts()
-                colors = get_chart_colors()
-                fig = px.pie(values=role_counts.values, names=role_counts.index,
-                           title='Group Role Distribution',
-                           color_discrete_sequence=px.colors.qualitative.Set3)
-                fig.update_layout(
-                    plot_bgcolor=colors['bg_color'],
-                    paper_bgcolor=colors['paper_bg_color'],
-                    font=dict(color=colors['font_color'], size=12)
-                )
-                st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error in group dynamics analysis: {str(e)}")
-            
-            st.markdown("---")
+                        
+                    except Exception as e:
+                        st.error(f"Error in group dynamics analysis: {str(e)}")
 
         # AI Insights
         if insights_analysis:
-            status_text.text("🧠 Generating AI insights...")
-            progress_bar.progress(90)
-            
-            st.header("🧠 AI-Generated Insights")
-            
-            try:
-                insights_data = generate_chat_insights(selected_user, df_analysis)
-                
-                for insight in insights_data:
-                    st.markdown(f'<div class="insight-box">{html.escape(str(insight))}</div>', unsafe_allow_html=True)
-                
-                # Conversation highlights
-                st.subheader("💎 Conversation Highlights")
-                highlights = conversation_highlights(selected_user, df_analysis)
-                
-                if not highlights.empty:
-                    for _, highlight in highlights.head(5).iterrows():
-                        with st.expander(f"📅 {highlight['date'].strftime('%Y-%m-%d %H:%M')} - {highlight['user']}"):
-                            st.write(highlight['message'])
-                            st.caption(f"Importance Score: {highlight['score']}")
-                
-                # Predictions
-                st.subheader("🔮 Activity Predictions")
-                predictions = predict_activity_patterns(df_analysis)
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("**Peak Hours:**")
-                    for hour in predictions['peak_hours']:
-                        st.write(f"• {hour}:00")
-                
-                with col2:
-                    st.write("**Quiet Hours:**")
-                    for hour in predictions['quiet_hours']:
-                        st.write(f"• {hour}:00")
-                
-                # Relationship evolution
-                if selected_user != 'Overall':
-                    st.subheader("📈 Relationship Evolution")
-                    evolution = relationship_evolution_analysis(selected_user, df_analysis)
+            with st.expander("🧠 AI-Generated Insights", expanded=False, key='section_insights', on_change='rerun') as section:
+                if section.open:
+                    names = ['generate_chat_insights', 'conversation_highlights', 'predict_activity_patterns']
+                    if selected_user != 'Overall':
+                        names.append('relationship_evolution_analysis')
+                    with st.spinner("🧠 Generating AI insights..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, names)
                     
-                    if not evolution.empty:
-                        colors = get_chart_colors()
-                        fig = px.line(evolution, x='period', y=['message_count', 'avg_sentiment'],
-                                    title='Communication Evolution Over Time')
-                        fig.update_layout(
-                            plot_bgcolor=colors['bg_color'],
-                            paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12),
-                            xaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            ),
-                            yaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            )
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error in AI insights: {str(e)}")
-            
-            st.markdown("---")
+                    try:
+                        insights_data = result(run, 'generate_chat_insights')
+                        
+                        for insight in insights_data:
+                            st.markdown(f'<div class="insight-box">{html.escape(str(insight))}</div>', unsafe_allow_html=True)
+                        
+                        # Conversation highlights
+                        st.subheader("💎 Conversation Highlights")
+                        highlights = result(run, 'conversation_highlights')
+                        
+                        if not highlights.empty:
+                            for _, highlight in highlights.head(5).iterrows():
+                                with st.expander(f"📅 {highlight['date'].strftime('%Y-%m-%d %H:%M')} - {highlight['user']}"):
+                                    st.write(highlight['message'])
+                                    st.caption(f"Importance Score: {highlight['score']}")
+                        
+                        # Predictions
+                        st.subheader("🔮 Activity Predictions")
+                        predictions = result(run, 'predict_activity_patterns')
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.write("**Peak Hours:**")
+                            for hour in predictions['peak_hours']:
+                                st.write(f"• {hour}:00")
+                        
+                        with col2:
+                            st.write("**Quiet Hours:**")
+                            for hour in predictions['quiet_hours']:
+                                st.write(f"• {hour}:00")
+                        
+                        # Relationship evolution
+                        if selected_user != 'Overall':
+                            st.subheader("📈 Relationship Evolution")
+                            evolution = result(run, 'relationship_evolution_analysis')
+                            
+                            if not evolution.empty:
+                                colors = get_chart_colors()
+                                fig = px.line(evolution, x='period', y=['message_count', 'avg_sentiment'],
+                                            title='Communication Evolution Over Time')
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        
+                    except Exception as e:
+                        st.error(f"Error in AI insights: {str(e)}")
 
         # Gamification & Badges
         if len(df_analysis['user'].unique()) > 2:
-            st.header("🎮 Gamification & Achievements")
-            
-            try:
-                badges = calculate_communication_badges(selected_user, df_analysis)
-                
-                # Filter users who have badges
-                users_with_badges = {user: user_badges for user, user_badges in badges.items() if len(user_badges) > 0}
-                
-                if users_with_badges:
-                    st.subheader("🏆 User Badges")
-                    for user, user_badges in users_with_badges.items():
-                        with st.expander(f"🎯 {user}'s Achievements ({len(user_badges)} badges)"):
-                            for badge in user_badges:
-                                st.markdown(f'<span class="badge">{html.escape(str(badge))}</span>', unsafe_allow_html=True)
-                else:
-                    st.info("No badges earned yet. Keep chatting to unlock achievements!")
-                
-                # Personality matching
-                if len(df_analysis['user'].unique()) > 2:
-                    st.subheader("🧬 Personality Matching")
-                    similarities, personalities = personality_matching_analysis(df_analysis)
+            with st.expander("🎮 Gamification & Achievements", expanded=False, key='section_badges', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("🎮 Awarding badges..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['calculate_communication_badges', 'personality_matching_analysis'])
                     
-                    if not similarities.empty:
-                        st.dataframe(similarities.head(), use_container_width=True)
+                    try:
+                        badges = result(run, 'calculate_communication_badges')
                         
-                        # Compatibility chart
-                        colors = get_chart_colors()
-                        fig = px.bar(similarities.head(10), x='similarity_score', 
-                                   y=[f"{row['user1']} - {row['user2']}" for _, row in similarities.head(10).iterrows()],
-                                   orientation='h',
-                                   title='Top User Compatibility Matches',
-                                   color='similarity_score',
-                                   color_continuous_scale='Viridis')
-                        fig.update_layout(
-                            plot_bgcolor=colors['bg_color'],
-                            paper_bgcolor=colors['paper_bg_color'],
-                            font=dict(color=colors['font_color'], size=12),
-                            xaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            ),
-                            yaxis=dict(
-                                gridcolor=colors['grid_color'],
-                                tickfont=dict(color=colors['axis_color']),
-                                title=dict(font=dict(color=colors['axis_color']))
-                            )
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                
-            except Exception as e:
-                st.error(f"Error in gamification analysis: {str(e)}")
-            
-            st.markdown("---")
+                        # Filter users who have badges
+                        users_with_badges = {user: user_badges for user, user_badges in badges.items() if len(user_badges) > 0}
+                        
+                        if users_with_badges:
+                            st.subheader("🏆 User Badges")
+                            for user, user_badges in users_with_badges.items():
+                                with st.expander(f"🎯 {user}'s Achievements ({len(user_badges)} badges)"):
+                                    for badge in user_badges:
+                                        st.markdown(f'<span class="badge">{html.escape(str(badge))}</span>', unsafe_allow_html=True)
+                        else:
+                            st.info("No badges earned yet. Keep chatting to unlock achievements!")
+                        
+                        # Personality matching
+                        if len(df_analysis['user'].unique()) > 2:
+                            st.subheader("🧬 Personality Matching")
+                            similarities, personalities = result(run, 'personality_matching_analysis')
+                            
+                            if not similarities.empty:
+                                st.dataframe(similarities.head(), use_container_width=True)
+                                
+                                # Compatibility chart
+                                colors = get_chart_colors()
+                                fig = px.bar(similarities.head(10), x='similarity_score', 
+                                           y=[f"{row['user1']} - {row['user2']}" for _, row in similarities.head(10).iterrows()],
+                                           orientation='h',
+                                           title='Top User Compatibility Matches',
+                                           color='similarity_score',
+                                           color_continuous_scale='Viridis')
+                                fig.update_layout(
+                                    plot_bgcolor=colors['bg_color'],
+                                    paper_bgcolor=colors['paper_bg_color'],
+                                    font=dict(color=colors['font_color'], size=12),
+                                    xaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    ),
+                                    yaxis=dict(
+                                        gridcolor=colors['grid_color'],
+                                        tickfont=dict(color=colors['axis_color']),
+                                        title=dict(font=dict(color=colors['axis_color']))
+                                    )
+                                )
+                                st.plotly_chart(fig, use_container_width=True)
+                        
+                    except Exception as e:
+                        st.error(f"Error in gamification analysis: {str(e)}")
 
         # Enhanced section divider for report section
         st.markdown('<div class="section-spacer"></div>', unsafe_allow_html=True)
 
         # Comprehensive Report
         if report_analysis:
-            status_text.text("📋 Generating comprehensive report...")
-            progress_bar.progress(95)
-            
-            st.header("📋 Comprehensive Analysis Report")
-            
-            try:
-                report_data = generate_comprehensive_report(selected_user, df_analysis)
-                
-                # Display report sections
-                if 'basic_stats' in report_data:
-                    st.subheader("📊 Summary Statistics")
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>💬</h3>
-                            <h2>{report_data['basic_stats']['total_messages']:,}</h2>
-                            <p>Messages</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>📝</h3>
-                            <h2>{report_data['basic_stats']['total_words']:,}</h2>
-                            <p>Words</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col3:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>📷</h3>
-                            <h2>{report_data['basic_stats']['media_messages']:,}</h2>
-                            <p>Media</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col4:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>🔗</h3>
-                            <h2>{report_data['basic_stats']['links_shared']:,}</h2>
-                            <p>Links</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                if 'sentiment_analysis' in report_data and report_data['sentiment_analysis']:
-                    st.subheader("😊 Sentiment Summary")
-                    sentiment = report_data['sentiment_analysis']
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>😊</h3>
-                            <h2>{sentiment['positive_ratio']:.1%}</h2>
-                            <p>Positive</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>😐</h3>
-                            <h2>{sentiment['neutral_ratio']:.1%}</h2>
-                            <p>Neutral</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col3:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <h3>😔</h3>
-                            <h2>{sentiment['negative_ratio']:.1%}</h2>
-                            <p>Negative</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                if 'insights' in report_data:
-                    st.subheader("🔍 Key Insights")
-                    for insight in report_data['insights']:
-                        st.markdown(f'<div class="insight-box">• {html.escape(str(insight))}</div>', unsafe_allow_html=True)
-                
-                # Download report as JSON
-                st.subheader("💾 Export Report")
-                
-                # Create the report JSON
-                import json
-                report_json = json.dumps(report_data, indent=2, default=str)
-                
-                # Create CSV report for basic stats
-                csv_data = ""
-                if 'basic_stats' in report_data:
-                    csv_data += "Metric,Value\n"
-                    csv_data += f"Total Messages,{report_data['basic_stats']['total_messages']}\n"
-                    csv_data += f"Total Words,{report_data['basic_stats']['total_words']}\n"
-                    csv_data += f"Media Messages,{report_data['basic_stats']['media_messages']}\n"
-                    csv_data += f"Links Shared,{report_data['basic_stats']['links_shared']}\n"
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # JSON Download button
-                    st.download_button(
-                        label="📄 Download JSON Report",
-                        data=report_json,
-                        file_name=f"chat_analysis_report_{selected_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                        mime="application/json",
-                        help="Download a comprehensive JSON report of all analysis results"
-                    )
-                
-                with col2:
-                    # CSV Download button
-                    if csv_data:
-                        st.download_button(
-                            label="📊 Download CSV Report",
-                            data=csv_data,
-                            file_name=f"chat_analysis_summary_{selected_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            help="Download a simple CSV summary of key metrics"
-                        )
-                
-            except Exception as e:
-                st.error(f"Error generating report: {str(e)}")
-        
-        # Final completion message
-        status_text.text("✅ Analysis complete! All insights generated successfully.")
-        progress_bar.progress(100)
+            with st.expander("📋 Comprehensive Analysis Report", expanded=False, key='section_report', on_change='rerun') as section:
+                if section.open:
+                    with st.spinner("📋 Generating comprehensive report..."):
+                        run = section_results(chat_key, privacy_mode, selected_user, chat, ['generate_comprehensive_report'])
+                    
+                    try:
+                        report_data = result(run, 'generate_comprehensive_report')
+                        
+                        # Display report sections
+                        if 'basic_stats' in report_data:
+                            st.subheader("📊 Summary Statistics")
+                            col1, col2, col3, col4 = st.columns(4)
+                            with col1:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>💬</h3>
+                                    <h2>{report_data['basic_stats']['total_messages']:,}</h2>
+                                    <p>Messages</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            with col2:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>📝</h3>
+                                    <h2>{report_data['basic_stats']['total_words']:,}</h2>
+                                    <p>Words</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            with col3:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>📷</h3>
+                                    <h2>{report_data['basic_stats']['media_messages']:,}</h2>
+                                    <p>Media</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            with col4:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>🔗</h3>
+                                    <h2>{report_data['basic_stats']['links_shared']:,}</h2>
+                                    <p>Links</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                        
+                        if 'sentiment_analysis' in report_data and report_data['sentiment_analysis']:
+                            st.subheader("😊 Sentiment Summary")
+                            sentiment = report_data['sentiment_analysis']
+                            col1, col2, col3 = st.columns(3)
+                            with col1:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>😊</h3>
+                                    <h2>{sentiment['positive_ratio']:.1%}</h2>
+                                    <p>Positive</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            with col2:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>😐</h3>
+                                    <h2>{sentiment['neutral_ratio']:.1%}</h2>
+                                    <p>Neutral</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                            with col3:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <h3>😔</h3>
+                                    <h2>{sentiment['negative_ratio']:.1%}</h2>
+                                    <p>Negative</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                        
+                        if 'insights' in report_data:
+                            st.subheader("🔍 Key Insights")
+                            for insight in report_data['insights']:
+                                st.markdown(f'<div class="insight-box">• {html.escape(str(insight))}</div>', unsafe_allow_html=True)
+                        
+                        # Download report as JSON
+                        st.subheader("💾 Export Report")
+                        
+                        # Create the report JSON
+                        import json
+                        report_json = json.dumps(report_data, indent=2, default=str)
+                        
+                        # Create CSV report for basic stats
+                        csv_data = ""
+                        if 'basic_stats' in report_data:
+                            csv_data += "Metric,Value\n"
+                            csv_data += f"Total Messages,{report_data['basic_stats']['total_messages']}\n"
+                            csv_data += f"Total Words,{report_data['basic_stats']['total_words']}\n"
+                            csv_data += f"Media Messages,{report_data['basic_stats']['media_messages']}\n"
+                            csv_data += f"Links Shared,{report_data['basic_stats']['links_shared']}\n"
+                        
+                        col1, col2 = st.columns(2)
+                        
+                        with col1:
+                            # JSON Download button
+                            st.download_button(
+                                label="📄 Download JSON Report",
+                                data=report_json,
+                                file_name=f"chat_analysis_report_{selected_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                                mime="application/json",
+                                help="Download a comprehensive JSON report of all analysis results"
+                            )
+                        
+                        with col2:
+                            # CSV Download button
+                            if csv_data:
+                                st.download_button(
+                                    label="📊 Download CSV Report",
+                                    data=csv_data,
+                                    file_name=f"chat_analysis_summary_{selected_user}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                                    mime="text/csv",
+                                    help="Download a simple CSV summary of key metrics"
+                                )
+                        
+                    except Exception as e:
+                        st.error(f"Error generating report: {str(e)}")
         
-        # Clear the progress bar and status text
-        progress_bar.empty()
-        status_text.empty()
+        # Where the time went, for every analysis computed for this chat and user
+        timings = analysis_timings(chat_key, privacy_mode, selected_user)
+        if not timings.empty:
+            with st.expander("⏱️ Analysis timings"):
+                st.dataframe(timings, use_container_width=True)
 
 else:
     # Simple, clean welcome message without repeated content
@@ -0,0 +1,367 @@
+"""Performance benchmarks for the chat analyzer.
+
+Run ``python benchmark.py <name> [--messages N]`` to time one of the
+benchmarks below against a synthetic chat export.
+"""
+import argparse
+import io
+import random
+import tempfile
+import re
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import chat_cache
+import preprocessor
+from chat_index import ChatIndex
+from enhanced_helper_1 import response_time_analysis, conversation_initiator_analysis
+from enhanced_helper_2 import group_interaction_matrix, conversation_flow_analysis, identify_group_roles
+import sentiment
+
+WORDS = ['hello', 'ok', 'haha', 'yes', 'no', 'party', 'birthday', 'meeting', 'love', 'sorry',
+         'great', 'bad', 'kal', 'milte', 'hai', 'kya', 'scene', 'done', 'urgent', 'update',
+         'https://example.com', 'www.example.org', '😂', '👍🏽', '❤️', '!', '?']
+
+
+def synthetic_chat(n_messages, n_users=20, seed=42):
+    """Build a WhatsApp-style export with ``n_messages`` messages."""
+    rng = random.Random(seed)
+    users = [f"Member {i}" for i in range(n_users)]
+    gaps = [0, 0, 1, 1, 2, 5, 30, 90, 600]
+    timestamp = datetime(2020, 1, 1, 8, 0)
+
+    lines = []
+    for _ in range(n_messages):
+        timestamp += timedelta(minutes=rng.choice(gaps))
+        header = timestamp.strftime('%d/%m/%y, %H:%M - ')
+        roll = rng.random()
+        if roll < 0.02:
+            lines.append(f"{header}{rng.choice(users)} added {rng.choice(users)}\n")
+        elif roll < 0.08:
+            lines.append(f"{header}{rng.choice(users)}: <Media omitted>\n")
+        else:
+            text = ' '.join(rng.choices(WORDS, k=rng.randint(1, 15)))
+            lines.append(f"{header}{rng.choice(users)}: {text}\n")
+    return ''.join(lines)
+
+
+def legacy_preprocess(data):
+    """The original split-based parser, kept as the baseline for ``parser``."""
+    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s'
+    messages = re.split(pattern, data)[1:]
+    dates = re.findall(pattern, data)
+
+    df = pd.DataFrame({'user_message': messages, 'message_date': dates})
+    df['message_date'] = pd.to_datetime(df['message_date'], format='%d/%m/%y, %H:%M - ')
+    df.rename(columns={'message_date': 'date'}, inplace=True)
+
+    users = []
+    messages = []
+    for message in df['user_message']:
+        entry = re.split(r'([\w\W]+?):\s', message)
+        if entry[1:]:
+            users.append(entry[1])
+            messages.append(" ".join(entry[2:]))
+        else:
+            users.append('group_notification')
+            messages.append(entry[0])
+
+    df['user'] = users
+    df['message'] = messages
+    df.drop(columns=['user_message'], inplace=True)
+    return df
+
+
+def legacy_conversation_loops(df):
+    """The original ``iloc`` loops of the four reply-based analyses, for ``conversation``."""
+    temp = df[df['user'] != 'group_notification'].sort_values('date', kind='stable')
+    response_times = []
+    for i in range(1, len(temp)):
+        if temp.iloc[i]['user'] != temp.iloc[i-1]['user']:
+            time_diff = (temp.iloc[i]['date'] - temp.iloc[i-1]['date']).total_seconds() / 60
+            if time_diff < 1440:
+                response_times.append((time_diff, temp.iloc[i]['user'], temp.iloc[i-1]['user']))
+
+    starters = []
+    for i in range(len(temp)):
+        if i == 0 or (temp.iloc[i]['date'] - temp.iloc[i-1]['date']).total_seconds() / 60 > 60:
+            starters.append(temp.iloc[i]['user'])
+
+    temp = temp[temp['message'] != '<Media omitted>\n']
+    users = temp['user'].unique()
+    interaction_matrix = pd.DataFrame(0, index=users, columns=users)
+    flow_patterns = []
+    for i in range(1, len(temp)):
+        current_user = temp.iloc[i]['user']
+        prev_user = temp.iloc[i-1]['user']
+        time_gap = (temp.iloc[i]['date'] - temp.iloc[i-1]['date']).total_seconds() / 60
+        if current_user != prev_user and time_gap < 30:
+            interaction_matrix.loc[current_user, prev_user] += 1
+        flow_patterns.append((prev_user, current_user, time_gap, temp.iloc[i]['hour'], temp.iloc[i]['day_name']))
+
+    return response_times, pd.Series(starters).value_counts(), interaction_matrix, flow_patterns
+
+
+def current_conversation_analyses(df):
+    chat = ChatIndex(df)
+    response_df, _ = response_time_analysis('Overall', chat)
+    initiators = conversation_initiator_analysis('Overall', chat)
+    interaction_matrix = group_interaction_matrix(chat)
+    flow = conversation_flow_analysis('Overall', chat)
+    return response_df, initiators, interaction_matrix, flow
+
+
+def legacy_sentiment(df):
+    """Per-message TextBlob scoring, as each sentiment consumer used to do it."""
+    polarities = []
+    subjectivities = []
+    for message in df['message']:
+        blob = sentiment.TextBlob(message)
+        polarities.append(blob.sentiment.polarity)
+        subjectivities.append(blob.sentiment.subjectivity)
+    return polarities, subjectivities
+
+
+def legacy_group_roles(df):
+    """The original per-user loops of ``identify_group_roles``, for ``roles``."""
+    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')]
+
+    if len(temp) == 0:
+        return {}
+
+    user_stats = {}
+    users = temp['user'].unique()
+
+    if len(users) < 2:
+        return {}
+
+    for user in users:
+        user_messages = temp[temp['user'] == user]
+
+        # Calculate various metrics
+        total_messages = len(user_messages)
+        avg_message_length = user_messages['message'].str.len().mean() if total_messages > 0 else 0
+        questions_asked = user_messages['message'].str.count(r'\?').sum()
+        exclamations = user_messages['message'].str.count('!').sum()
+
+        # Response patterns
+        user_indices = temp[temp['user'] == user].index
+        responses_to_others = 0
+
+        for idx in user_indices:
+            if idx > 0 and idx < len(temp):
+                try:
+                    prev_user = temp.loc[idx-1, 'user']
+                    if prev_user != user:
+                        time_diff = (temp.loc[idx, 'date'] - temp.loc[idx-1, 'date']).total_seconds() / 60
+                        if time_diff < 30:  # Responded within 30 minutes
+                            responses_to_others += 1
+                except (KeyError, IndexError):
+                    continue
+
+        user_stats[user] = {
+            'total_messages': total_messages,
+            'avg_message_length': avg_message_length,
+            'questions_asked': questions_asked,
+            'exclamations': exclamations,
+            'responses_to_others': responses_to_others,
+            'response_rate': responses_to_others / total_messages if total_messages > 0 else 0
+        }
+
+    # Classify roles
+    roles = {}
+    for user, stats in user_stats.items():
+        role_scores = {
+            'leader': 0,
+            'supporter': 0,
+            'questioner': 0,
+            'lurker': 0,
+            'entertainer': 0
+        }
+
+        # Calculate thresholds safely
+        message_counts = temp.groupby('user').size()
+        median_messages = message_counts.median() if len(message_counts) > 0 else 0
+        q30_messages = message_counts.quantile(0.3) if len(message_counts) > 0 else 0
+        q25_messages = message_counts.quantile(0.25) if len(message_counts) > 0 else 0
+        avg_message_len = temp['message'].str.len().mean() if len(temp) > 0 else 0
+
+        # Leader: High message count, long messages, low response rate (initiates more)
+        if stats['total_messages'] > median_messages:
+            role_scores['leader'] += 2
+        if stats['avg_message_length'] > avg_message_len:
+            role_scores['leader'] += 1
+        if stats['response_rate'] < 0.5:
+            role_scores['leader'] += 1
+
+        # Supporter: High response rate, moderate message count
+        if stats['response_rate'] > 0.6:
+            role_scores['supporter'] += 2
+        if stats['total_messages'] > q30_messages:
+            role_scores['supporter'] += 1
+
+        # Questioner: High question rate
+        if stats['questions_asked'] > 0 and stats['total_messages'] > 0:
+            role_scores['questioner'] += min(stats['questions_asked'] / stats['total_messages'] * 10, 5)
+
+        # Lurker: Low message count
+        if stats['total_messages'] < q25_messages:
+            role_scores['lurker'] += 3
+
+        # Entertainer: High exclamation usage
+        if stats['exclamations'] > 0 and stats['total_messages'] > 0:
+            role_scores['entertainer'] += min(stats['exclamations'] / stats['total_messages'] * 10, 5)
+
+        # Assign primary role
+        primary_role = max(role_scores, key=role_scores.get)
+        roles[user] = {
+            'primary_role': primary_role,
+            'role_scores': role_scores,
+            'stats': stats
+        }
+
+    return roles
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_parser(n_messages):
+    data = synthetic_chat(n_messages)
+
+    legacy, legacy_time = _timed(legacy_preprocess, data)
+    current, current_time = _timed(preprocessor.preprocess, data)
+
+    # Same messages, authors and timestamps (synthetic messages contain no ": ")
+    pd.testing.assert_frame_equal(legacy, current[legacy.columns.tolist()])
+
+    print(f"messages:        {n_messages:,}")
+    print(f"legacy split:    {legacy_time:.2f}s")
+    print(f"tokenizer:       {current_time:.2f}s (includes derived columns)")
+    print(f"speedup:         {legacy_time / current_time:.1f}x")
+
+
+def bench_conversation(n_messages):
+    df = preprocessor.preprocess(synthetic_chat(n_messages))
+
+    legacy, legacy_time = _timed(legacy_conversation_loops, df)
+    current, current_time = _timed(current_conversation_analyses, df)
+
+    response_times, legacy_initiators, legacy_matrix, flow_patterns = legacy
+    response_df, initiators, interaction_matrix, flow = current
+    assert len(response_times) == len(response_df)
+    assert legacy_initiators.to_dict() == initiators.to_dict()
+    assert (legacy_matrix == interaction_matrix).all().all()
+    assert len(flow_patterns) == len(flow['flow_data'])
+
+    print(f"messages:        {n_messages:,}")
+    print(f"legacy iloc:     {legacy_time:.2f}s")
+    print(f"reply table:     {current_time:.3f}s (response times, initiators, interactions, flow)")
+    print(f"speedup:         {legacy_time / current_time:.0f}x")
+
+
+def bench_sentiment(n_messages):
+    df = preprocessor.preprocess(synthetic_chat(n_messages))
+
+    legacy, legacy_time = _timed(legacy_sentiment, df)
+    sentiment._memos.clear()
+    _, current_time = _timed(sentiment.add_sentiment, df, workers=1)
+    serial = df.pop('polarity'), df.pop('subjectivity'), df.pop('sentiment')
+
+    sentiment._memos.clear()
+    _, parallel_time = _timed(sentiment.add_sentiment, df, workers=sentiment.SENTIMENT_WORKERS)
+
+    assert abs(df['polarity'].to_numpy() - legacy[0]).max() < 1e-6
+    assert abs(df['subjectivity'].to_numpy() - legacy[1]).max() < 1e-6
+    for column in serial:
+        assert df[column.name].equals(column)
+
+    print(f"messages:        {n_messages:,}")
+    print(f"unique texts:    {df['message'].nunique():,}")
+    print(f"per message:     {legacy_time:.2f}s (one pass; the app made three to five)")
+    print(f"deduplicated:    {current_time:.2f}s")
+    print(f"{sentiment.SENTIMENT_WORKERS} workers:{'':<{7 - len(str(sentiment.SENTIMENT_WORKERS))}}{parallel_time:.2f}s")
+    print(f"speedup:         {legacy_time / current_time:.1f}x serial, {legacy_time / parallel_time:.1f}x parallel")
+
+
+def bench_lexicon(n_messages):
+    df = preprocessor.preprocess(synthetic_chat(n_messages))
+    texts = df['message'].unique().tolist()
+
+    textblob, textblob_time = _timed(sentiment.score_many, texts, workers=1, backend='textblob')
+    lexicon, lexicon_time = _timed(sentiment.score_many, texts, workers=1, backend='lexicon')
+
+    textblob = np.array(textblob)
+    lexicon = np.array(lexicon)
+    agreement = (sentiment.sentiment_labels(textblob[:, 0]) == sentiment.sentiment_labels(lexicon[:, 0])).mean()
+
+    print(f"distinct texts:  {len(texts):,}")
+    print(f"textblob:        {textblob_time:.2f}s ({len(texts) / textblob_time:,.0f} texts/s)")
+    print(f"lexicon:         {lexicon_time:.2f}s ({len(texts) / lexicon_time:,.0f} texts/s)")
+    print(f"speedup:         {textblob_time / lexicon_time:.1f}x")
+    print(f"label agreement: {agreement:.1%}")
+    print(f"polarity corr.:  {np.corrcoef(textblob[:, 0], lexicon[:, 0])[0, 1]:.3f}")
+    print(f"polarity MAE:    {np.abs(textblob[:, 0] - lexicon[:, 0]).mean():.3f}")
+
+
+def bench_roles(n_messages, n_users=500):
+    df = preprocessor.preprocess(synthetic_chat(n_messages, n_users=n_users))
+
+    legacy, legacy_time = _timed(legacy_group_roles, df)
+    current, current_time = _timed(identify_group_roles, ChatIndex(df))
+
+    # Same users and message stats; responses differ where the legacy lookups were skipped
+    assert list(legacy) == list(current)
+    for user, role in legacy.items():
+        assert role['stats']['total_messages'] == current[user]['stats']['total_messages']
+        assert role['stats']['questions_asked'] == current[user]['stats']['questions_asked']
+    agreement = np.mean([role['primary_role'] == current[user]['primary_role'] for user, role in legacy.items()])
+
+    print(f"messages:        {n_messages:,} from {len(current)} members")
+    print(f"legacy loops:    {legacy_time:.2f}s")
+    print(f"single pass:     {current_time:.2f}s")
+    print(f"speedup:         {legacy_time / current_time:.0f}x")
+    print(f"same role:       {agreement:.1%}")
+
+
+def bench_append(n_messages, new_fraction=0.01):
+    export = synthetic_chat(n_messages).encode('utf-8')
+    lines = export.splitlines(keepends=True)
+    previous = b''.join(lines[:len(lines) - max(1, int(len(lines) * new_fraction))])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        chat_cache.load_chat(io.BytesIO(previous), cache_dir=cache_dir)
+        _, full_time = _timed(preprocessor.preprocess_file, io.BytesIO(export))
+        appended, append_time = _timed(chat_cache.load_chat, io.BytesIO(export), cache_dir=cache_dir)
+
+    assert 'appended_to' in appended.attrs
+    pd.testing.assert_frame_equal(appended, preprocessor.preprocess_file(io.BytesIO(export)))
+
+    print(f"messages:        {n_messages:,} ({len(lines) - len(previous.splitlines()):,} new)")
+    print(f"full parse:      {full_time:.2f}s")
+    print(f"append:          {append_time:.2f}s (includes storing the new cache entry)")
+    print(f"speedup:         {full_time / append_time:.1f}x")
+
+
+BENCHMARKS = {
+    'parser': bench_parser,
+    'conversation': bench_conversation,
+    'sentiment': bench_sentiment,
+    'lexicon': bench_lexicon,
+    'roles': bench_roles,
+    'append': bench_append,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--messages', type=int, default=200_000)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args.messages)
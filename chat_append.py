@@ -0,0 +1,153 @@
+"""Carry a chat's derived data over to a newer export of the same chat.
+
+When ``chat_cache`` builds a frame by appending new messages to a stored one,
+the frame records its base entry in ``attrs['appended_to']``. If the base
+chat's ``ChatIndex`` is still in memory, ``index_chat`` extends it instead of
+starting over: sentiment and link columns, text features, keyword hits, the
+emoji table, the token stream, the term index and the monthly partials are
+computed for the new messages only and merged with the stored ones. Anything
+else is rebuilt on demand, as for a new chat.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from chat_index import ChatIndex
+from emojis import emoji_table
+from enhanced_helper_2 import monthly_partials
+from keywords import keyword_hits
+from links import add_links
+from sentiment import add_sentiment
+from text_corpus import corpus, token_mask
+from text_features import text_features
+
+# Chat indexes kept for extension, most recently used last
+RECENT_INDEXES = 4
+
+_recent = {}
+
+
+def index_chat(df, key=None):
+    """A ``ChatIndex`` for a parsed chat, extending its base chat's index when it is still in memory."""
+    base = df.attrs.get('appended_to')
+    previous = _recent.get(base['key']) if base else None
+    if previous is not None and len(previous) == base['rows'] <= len(df):
+        chat = extend_index(previous, df, base['rows'], key)
+    else:
+        chat = ChatIndex(df, key=key)
+
+    if key is not None:
+        _recent.pop(key, None)
+        _recent[key] = chat
+        while len(_recent) > RECENT_INDEXES:
+            del _recent[next(iter(_recent))]
+    return chat
+
+
+def extend_index(chat, df, start, key=None):
+    """Index ``df``, whose first ``start`` rows are ``chat``'s messages, reusing ``chat``'s derived data."""
+    frame = chat.frame
+    extended = ChatIndex(df, key=key)
+    tail = ChatIndex(df.iloc[start:].copy())
+
+    # Per-message columns
+    if 'polarity' in frame:
+        add_sentiment(tail, backend=frame.attrs.get('sentiment_backend'))
+        _append_columns(df, frame, tail.frame, ['polarity', 'subjectivity', 'sentiment'])
+        df.attrs['sentiment_backend'] = frame.attrs.get('sentiment_backend')
+    if 'link_count' in frame:
+        add_links(tail)
+        _append_columns(df, frame, tail.frame, ['link_count', 'has_link'])
+
+    cache = chat._cache
+    if 'text_features' in cache:
+        extended._cache['text_features'] = pd.concat([cache['text_features'], text_features(tail)])
+    for cache_key, hits in cache.items():
+        if isinstance(cache_key, tuple) and cache_key[0] == 'keyword_hits':
+            categories = {name: list(words) for name, words in cache_key[1]}
+            extended._cache[cache_key] = pd.concat([hits, keyword_hits(tail, categories)])
+    if 'emoji_table' in cache:
+        extended._cache['emoji_table'] = _append_emoji_table(cache['emoji_table'], emoji_table(tail), start)
+    if 'corpus' in cache:
+        extended._cache['corpus'] = _append_corpus(cache['corpus'], corpus(tail), start)
+        if 'term_index' in cache:
+            index = _append_term_index(cache['term_index'], extended, tail, start)
+            if index is not None:
+                extended._cache['term_index'] = index
+
+    # Monthly partials only aggregate the months the new messages fall in
+    for cache_key, partials in cache.items():
+        if isinstance(cache_key, tuple) and cache_key[0] == 'monthly_partials':
+            monthly_partials(extended, cache_key[1], previous=partials)
+
+    return extended
+
+
+def _append_columns(df, frame, tail_frame, columns):
+    for column in columns:
+        df[column] = pd.concat([frame[column], tail_frame[column]]).to_numpy()
+
+
+def _merge_vocabulary(values, new_values):
+    """Extend ``values`` with the unseen ``new_values``; returns it and the new values' positions."""
+    positions = pd.Index(values).get_indexer(new_values)
+    unseen = positions < 0
+    positions[unseen] = len(values) + np.arange(unseen.sum())
+    return np.concatenate([values, new_values[unseen]]), positions, unseen
+
+
+def _append_emoji_table(table, tail_table, start):
+    emojis, positions, _ = _merge_vocabulary(table['emojis'], tail_table['emojis'])
+    return {
+        'rows': np.concatenate([table['rows'], tail_table['rows'] + start]),
+        'ids': np.concatenate([table['ids'], positions[tail_table['ids']].astype(np.int32)]),
+        'emojis': emojis,
+    }
+
+
+def _append_corpus(stream, tail_stream, start):
+    vocabulary, positions, unseen = _merge_vocabulary(stream['vocabulary'], tail_stream['vocabulary'])
+    return {
+        'ids': np.concatenate([stream['ids'], positions[tail_stream['ids']].astype(np.int32)]),
+        'rows': np.concatenate([stream['rows'], tail_stream['rows'] + start]),
+        'vocabulary': vocabulary,
+        'is_stop': np.concatenate([stream['is_stop'], tail_stream['is_stop'][unseen]]),
+    }
+
+
+def _append_term_index(index, extended, tail, start):
+    """Add the new messages' term counts, or None if they start before the last indexed day."""
+    tail_days = np.unique(tail.frame['only_date'].to_numpy())
+    days = index['days']
+    if len(days) and len(tail_days) and tail_days[0] < days[-1].to_datetime64():
+        return None
+
+    days = days.append(pd.DatetimeIndex(tail_days).difference(days))
+    users = pd.Index(pd.unique(np.concatenate([index['users'].to_numpy(dtype=object),
+                                               tail.frame['user'].to_numpy(dtype=object)])))
+    stream = corpus(extended)
+
+    # The new messages' tokens, as ids of the merged vocabulary
+    tokens = np.flatnonzero(stream['rows'] >= start)[token_mask(tail)]
+    ids = stream['ids'][tokens]
+    rows = stream['rows'][tokens]
+    ones = np.ones(len(ids), dtype=np.int32)
+    shape = len(stream['vocabulary'])
+
+    user_codes = users.get_indexer(extended.frame['user'].to_numpy(dtype=object)[rows])
+    day_codes = days.get_indexer(extended.frame['only_date'].to_numpy()[rows])
+    return {
+        'by_user': _padded(index['by_user'], (len(users), shape))
+                   + sparse.csr_matrix((ones, (user_codes, ids)), shape=(len(users), shape)),
+        'by_day': _padded(index['by_day'], (len(days), shape))
+                  + sparse.csr_matrix((ones, (day_codes, ids)), shape=(len(days), shape)),
+        'users': users,
+        'days': days,
+    }
+
+
+def _padded(matrix, shape):
+    """A copy of a sparse matrix grown to ``shape`` with empty rows and columns."""
+    matrix = matrix.copy()
+    matrix.resize(shape)
+    return matrix
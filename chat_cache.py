@@ -0,0 +1,286 @@
+"""Persistent on-disk cache of parsed chats.
+
+Parsed frames are stored as uncompressed Arrow IPC files named after a hash of
+the uploaded export, so a restarted worker or another replica on the same host
+can memory-map a known chat instead of parsing it again. Files are evicted
+least-recently-used first once the cache grows past its size budget.
+
+A newer export of a chat already in the cache (same leading messages, same
+last ingested message at the same offset) is not parsed again: only the
+messages after the stored ones are parsed and appended to the stored frame.
+Each chat's latest entry is tracked in a small lineage record named after the
+fingerprint of its leading messages; it is removed with that entry. The record
+keeps the date format the stored messages were read with, so new messages are
+read with the same date order rather than one guessed again from the start.
+
+The cache is best-effort: a full, read-only or missing cache directory only
+means chats are parsed again, never a failed upload.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from itertools import islice
+
+import pandas as pd
+import pyarrow.feather as feather
+
+import preprocessor
+
+CACHE_DIR = os.environ.get('CHAT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'chat-analyzer'))
+
+# Size budget in megabytes; 0 disables the cache
+CACHE_SIZE_MB = int(os.environ.get('CHAT_CACHE_SIZE_MB', '2048'))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Messages that identify a chat across exports, and the bytes read to find them
+FINGERPRINT_MESSAGES = 20
+FINGERPRINT_BYTES = 256 * 1024
+
+# Bytes read from the end of an export per attempt to find its last message
+LAST_MESSAGE_WINDOW = 64 * 1024
+
+
+def chat_key(stream, chunk_size=HASH_CHUNK_SIZE):
+    """Hash a chat export without reading it into memory at once."""
+    digest = hashlib.blake2b(digest_size=20)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def load_chat(stream, key=None, cache_dir=CACHE_DIR, size_mb=CACHE_SIZE_MB):
+    """Return the parsed frame for an export, from the cache when possible."""
+    if size_mb <= 0:
+        stream.seek(0)
+        return preprocessor.preprocess_file(stream)
+
+    key = key or chat_key(stream)
+    df = load_cached(key, cache_dir)
+    if df is None:
+        fingerprint = chat_fingerprint(stream)
+        df = load_appended(stream, fingerprint, cache_dir) if fingerprint else None
+        if df is None:
+            stream.seek(0)
+            df = preprocessor.preprocess_file(stream)
+        try:
+            store(key, df, cache_dir, size_mb)
+            if fingerprint:
+                _write_lineage(fingerprint, key, df, stream, cache_dir)
+        except OSError:
+            # Parsing succeeded; an entry that cannot be written is just not cached
+            stream.seek(0)
+    return df
+
+
+def chat_fingerprint(stream, n_messages=FINGERPRINT_MESSAGES):
+    """Hash a chat's leading messages, or None if it is too short to identify."""
+    text = _read_text(stream, 0, FINGERPRINT_BYTES)
+    try:
+        chat_format = preprocessor.sniff_format(text)
+    except ValueError:
+        return None
+
+    # The message after the leading ones shows they are complete
+    matches = list(islice(chat_format['pattern'].finditer(text), n_messages + 1))
+    if len(matches) <= n_messages:
+        return None
+    return hashlib.blake2b(text[:matches[n_messages].start()].encode('utf-8'), digest_size=20).hexdigest()
+
+
+def load_appended(stream, fingerprint, cache_dir=CACHE_DIR):
+    """Extend the cached frame of an earlier export of the same chat, or return None.
+
+    The export must still hold the last stored message at the same offset;
+    only what follows it is parsed. The returned frame records the base entry
+    in ``attrs['appended_to']`` as ``{'key', 'rows'}``.
+    """
+    record = _read_lineage(fingerprint, cache_dir)
+    size = stream.seek(0, os.SEEK_END)
+    if record is None or 'date_format' not in record or size <= record['size']:
+        return None
+
+    stream.seek(record['last_start'])
+    if _digest(stream.read(record['size'] - record['last_start'])) != record['last_hash']:
+        return None
+
+    base = load_cached(record['key'], cache_dir)
+    if base is None or len(base) != record['rows']:
+        return None
+
+    chat_format = preprocessor.sniff_format(_read_text(stream, 0, FINGERPRINT_BYTES))
+    if record['date_format'] not in chat_format['formats']:
+        return None
+    chat_format = dict(chat_format, format=record['date_format'])
+    # New text must start a new message, not continue the last stored one
+    if not chat_format['pattern'].match(_read_text(stream, record['size'], LAST_MESSAGE_WINDOW).lstrip('\r\n')):
+        return None
+
+    stream.seek(record['size'])
+    try:
+        batches = list(preprocessor.preprocess_stream(stream, chat_format=chat_format))
+    except preprocessor.DateOrderChanged:
+        # The new messages do not parse with the stored ones' date order
+        return None
+    finally:
+        stream.seek(0)
+    # New text without a new message only extends the last one; parse it all instead
+    if not batches or batches[0]['date'].iloc[0] < base['date'].iloc[-1]:
+        return None
+
+    df = pd.concat([base, *batches], ignore_index=True)
+    df.attrs['date_format'] = record['date_format']
+    df.attrs['appended_to'] = {'key': record['key'], 'rows': len(base)}
+    return df
+
+
+def load_cached(key, cache_dir=CACHE_DIR):
+    """Memory-map a cached frame back, or return None on a miss."""
+    path = _cache_path(key, cache_dir)
+    try:
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # A truncated or unreadable entry is treated as a miss
+        _remove(path)
+        return None
+
+    # Mark as recently used for LRU eviction
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        # Evicted by another worker after it was read; the frame is still valid
+        pass
+    return df
+
+
+def store(key, df, cache_dir=CACHE_DIR, size_mb=CACHE_SIZE_MB):
+    """Write a parsed frame to the cache, then evict down to the size budget."""
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, _cache_path(key, cache_dir))
+    except Exception:
+        _remove(tmp_path)
+        raise
+
+    evict(cache_dir, size_mb)
+
+
+def evict(cache_dir=CACHE_DIR, size_mb=CACHE_SIZE_MB):
+    """Delete least-recently-used entries until the cache fits its budget.
+
+    Lineage records count towards the budget and go with their chat's entry.
+    """
+    entries, lineages = [], []
+    for name in os.listdir(cache_dir):
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            # Removed by another worker meanwhile
+            continue
+        if name.endswith('.arrow'):
+            entries.append((stat.st_mtime, stat.st_size, name))
+        elif name.endswith('.lineage.json'):
+            lineages.append((name, stat.st_size))
+
+    budget = size_mb * 1024 * 1024
+    total = sum(size for _, size, _ in entries) + sum(size for _, size in lineages)
+    kept = {name[:-len('.arrow')] for _, _, name in entries}
+    for _, size, name in sorted(entries):
+        if total <= budget:
+            break
+        _remove(os.path.join(cache_dir, name))
+        kept.discard(name[:-len('.arrow')])
+        total -= size
+
+    # A lineage record is only useful while its chat's entry is cached
+    for name, _ in lineages:
+        path = os.path.join(cache_dir, name)
+        record = _read_record(path)
+        if record is None or record.get('key') not in kept:
+            _remove(path)
+
+
+def _write_lineage(fingerprint, key, df, stream, cache_dir):
+    """Record ``key`` as the latest entry of a chat, with where its last message lies."""
+    size = stream.seek(0, os.SEEK_END)
+    last_start = _last_message_start(stream, size)
+    stream.seek(last_start)
+    record = {
+        'key': key,
+        'size': size,
+        'rows': len(df),
+        'last_start': last_start,
+        'last_hash': _digest(stream.read(size - last_start)),
+        'date_format': df.attrs['date_format'],
+    }
+    stream.seek(0)
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as fh:
+        json.dump(record, fh)
+    os.replace(tmp_path, _lineage_path(fingerprint, cache_dir))
+
+
+def _read_lineage(fingerprint, cache_dir):
+    return _read_record(_lineage_path(fingerprint, cache_dir))
+
+
+def _read_record(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _last_message_start(stream, size):
+    """Byte offset of the header of an export's last message."""
+    chat_format = preprocessor.sniff_format(_read_text(stream, 0, FINGERPRINT_BYTES))
+    window = LAST_MESSAGE_WINDOW
+    while True:
+        start = max(0, size - window)
+        text = _read_text(stream, start, size - start)
+        # A header cut by the window edge could still match; only trust one inside it
+        starts = [match.start() for match in chat_format['pattern'].finditer(text) if match.start() > 0 or start == 0]
+        if starts:
+            return size - len(text[starts[-1]:].encode('utf-8'))
+        if start == 0:
+            return 0
+        window *= 4
+
+
+def _read_text(stream, start, length):
+    """Decode ``length`` bytes from ``start``, dropping characters cut at either end."""
+    stream.seek(start)
+    data = stream.read(length)
+    stream.seek(0)
+    return data.decode('utf-8', errors='ignore') if isinstance(data, bytes) else data
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def _lineage_path(fingerprint, cache_dir):
+    return os.path.join(cache_dir, f"{fingerprint}.lineage.json")
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.arrow")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
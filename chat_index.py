@@ -0,0 +1,138 @@
+"""Row index over a parsed chat, built once and shared by the analysis helpers.
+
+Every helper used to start with ``df[df['user'] == selected_user]`` followed by
+notification and media filters, each a full string-comparison scan plus a copy.
+``ChatIndex`` precomputes per-user row offsets, the notification and media
+masks and the chronological order, so a selection costs O(k) for a user with
+k messages. Helpers accept either a ``ChatIndex`` or a plain DataFrame.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+MEDIA_MESSAGE = '<Media omitted>\n'
+NOTIFICATION_USER = 'group_notification'
+
+
+class ChatIndex:
+    """Precomputed row positions for one parsed chat frame."""
+
+    def __init__(self, df, key=None):
+        self.frame = df
+        # Fingerprint of the chat this frame came from, when known
+        self.key = key
+        self._cache = {}
+
+    @classmethod
+    def of(cls, df):
+        """Return ``df`` unchanged if it is already an index, else index it."""
+        return df if isinstance(df, cls) else cls(df)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @cached_property
+    def notification_mask(self):
+        return (self.frame['user'] == NOTIFICATION_USER).to_numpy()
+
+    @cached_property
+    def media_mask(self):
+        if 'message' in self.frame:
+            return (self.frame['message'] == MEDIA_MESSAGE).to_numpy()
+        # Anonymised frames only keep the media flag
+        if 'has_media' in self.frame:
+            return self.frame['has_media'].to_numpy(dtype=bool)
+        return np.zeros(len(self.frame), dtype=bool)
+
+    @cached_property
+    def user_rows(self):
+        """Row positions of each user's messages, in frame order."""
+        codes, users = pd.factorize(self.frame['user'])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(users) + 1))
+        return {user: order[start:end] for user, start, end in zip(users, bounds[:-1], bounds[1:])}
+
+    @cached_property
+    def date_order(self):
+        """Row positions sorted by message date (ties keep frame order)."""
+        return np.argsort(self.frame['date'].to_numpy(), kind='stable')
+
+    @cached_property
+    def _date_rank(self):
+        rank = np.empty(len(self.frame), dtype=np.int64)
+        rank[self.date_order] = np.arange(len(self.frame))
+        return rank
+
+    @cached_property
+    def _is_date_sorted(self):
+        return self.frame['date'].is_monotonic_increasing
+
+    def rows(self, selected_user='Overall', notifications=True, media=True, by_date=False):
+        """Row positions for a user (or 'Overall') with optional filters."""
+        key = (selected_user, notifications, media, by_date)
+        if key in self._cache:
+            return self._cache[key]
+
+        if selected_user == 'Overall':
+            keep = np.ones(len(self.frame), dtype=bool)
+            if not notifications:
+                keep &= ~self.notification_mask
+            if not media:
+                keep &= ~self.media_mask
+            rows = np.flatnonzero(keep)
+        else:
+            rows = self.user_rows.get(selected_user, np.array([], dtype=np.int64))
+            if not notifications:
+                rows = rows[~self.notification_mask[rows]]
+            if not media:
+                rows = rows[~self.media_mask[rows]]
+
+        if by_date and not self._is_date_sorted:
+            rows = rows[np.argsort(self._date_rank[rows], kind='stable')]
+
+        self._cache[key] = rows
+        return rows
+
+    def select(self, selected_user='Overall', notifications=True, media=True, by_date=False):
+        """Frame slice for a user (or 'Overall'); original index labels are kept."""
+        return self.frame.take(self.rows(selected_user, notifications, media, by_date))
+
+    def reply_table(self, selected_user='Overall', media=True):
+        """Each message beside the one before it, in chronological order.
+
+        Covers a selection without notifications. ``prev_user`` and
+        ``gap_minutes`` describe the preceding message (missing for the first
+        row) and ``is_reply`` marks a change of speaker. Shared by the
+        response-time, initiator, interaction and flow analyses.
+        """
+        key = ('reply_table', selected_user, media)
+        if key not in self._cache:
+            temp = self.select(selected_user, notifications=False, media=media, by_date=True)
+            users = temp['user'].to_numpy(dtype=object)
+            dates = temp['date'].to_numpy()
+
+            prev_user = np.empty(len(temp), dtype=object)
+            gap_minutes = np.full(len(temp), np.nan)
+            is_reply = np.zeros(len(temp), dtype=bool)
+            if len(temp) > 0:
+                prev_user[1:] = users[:-1]
+                gap_minutes[1:] = np.diff(dates) / np.timedelta64(1, 'm')
+                is_reply[1:] = users[1:] != users[:-1]
+
+            self._cache[key] = pd.DataFrame({
+                'user': users,
+                'date': dates,
+                'prev_user': prev_user,
+                'gap_minutes': gap_minutes,
+                'is_reply': is_reply,
+                'hour': temp['hour'].array,
+                'day_name': temp['day_name'].array,
+            }, index=temp.index)
+        return self._cache[key]
+
+    def user_counts(self):
+        """Messages per user, busiest first, shaped like ``value_counts``."""
+        counts = pd.Series({user: len(rows) for user, rows in self.user_rows.items()}, name='count', dtype='int64')
+        counts.index.name = 'user'
+        return counts.sort_values(ascending=False, kind='stable')
@@ -0,0 +1,153 @@
+"""Emoji extraction for chat messages.
+
+``emoji_helper`` used to test every character of every message against
+``emoji.EMOJI_DATA``, which is slow and splits skin tones, flags and ZWJ
+sequences ("family", "rainbow flag") into separate pieces. Here every emoji
+sequence in ``EMOJI_DATA`` is compiled into one trie-shaped regex that always
+takes the longest sequence. The parser stores an ``emoji_count`` column, and
+``emoji_table`` keeps each chat's emoji as an exploded table of integer
+(row, emoji id) pairs, so counts per user or period are integer groupbys.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+import emoji
+import numpy as np
+import pandas as pd
+
+from chat_index import ChatIndex
+
+
+def trie_pattern(strings):
+    """Regex matching any of ``strings``, preferring the longest match."""
+    root = {}
+    for string in strings:
+        node = root
+        for char in string:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [(char, child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        leaves = [re.escape(char) for char, child in branches if list(child) == ['']]
+        alternatives = [re.escape(char) + build(child) for char, child in branches if list(child) != ['']]
+        if leaves:
+            alternatives.append(f"[{''.join(leaves)}]" if len(leaves) > 1 else leaves[0])
+        body = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        # A sequence that can end here may still continue; the greedy '?' tries the longer one first
+        return f"(?:{body})?" if '' in node else body
+
+    return build(root)
+
+
+EMOJI_PATTERN = re.compile(trie_pattern(emoji.EMOJI_DATA))
+
+# Python's re tries every top-level branch of EMOJI_PATTERN at every position of
+# a message, which is slow; a character class finds where an emoji can start,
+# and only the branch for that character is tried there
+_EMOJI_BY_START = defaultdict(list)
+for _sequence in emoji.EMOJI_DATA:
+    _EMOJI_BY_START[_sequence[0]].append(_sequence)
+
+
+def _start_class(chars):
+    """Character class covering ``chars``: Latin-1 ones exactly, the rest as one span per plane.
+
+    re checks a class of many scattered ranges one range at a time; the few
+    extra characters the spans let through have no branch and are skipped.
+    """
+    chars = sorted(chars)
+    latin = [char for char in chars if ord(char) < 0x100]
+    spans = [[char for char in chars if low <= ord(char) < high] for low, high in ((0x100, 0x10000), (0x10000, 0x110000))]
+    return f"[{''.join(map(re.escape, latin))}{''.join(f'{span[0]}-{span[-1]}' for span in spans if span)}]"
+
+
+EMOJI_START = re.compile(_start_class(_EMOJI_BY_START))
+
+
+@lru_cache(maxsize=None)
+def _emoji_branch(start):
+    return re.compile(trie_pattern(_EMOJI_BY_START[start]))
+
+
+def find_emojis(text):
+    """Every emoji in ``text``, as ``EMOJI_PATTERN.findall`` finds them."""
+    found, position = [], 0
+    while (start := EMOJI_START.search(text, position)) is not None:
+        match = start.group() in _EMOJI_BY_START and _emoji_branch(start.group()).match(text, start.start())
+        if match:
+            found.append(match.group())
+            position = match.end()
+        else:
+            position = start.end()
+    return found
+
+
+def count_emojis(messages):
+    """Number of emoji in each message, as an int16 Series.
+
+    Uses ``find_emojis`` directly: the ``.str`` accessor of Arrow-backed
+    strings would compile the large pattern again on every call.
+    """
+    messages = pd.Series(messages)
+    counts = np.fromiter((len(find_emojis(message)) for message in messages.to_numpy(dtype=object)),
+                         dtype=np.int16, count=len(messages))
+    return pd.Series(counts, index=messages.index)
+
+
+def emoji_table(df):
+    """Every emoji of a chat as parallel integer arrays, built once per ``ChatIndex``.
+
+    Returns a dict with ``rows`` (frame position), ``ids`` (emoji id, in
+    order of first appearance in the chat) and ``emojis`` (id -> emoji).
+    """
+    chat = ChatIndex.of(df)
+    if 'emoji_table' not in chat._cache:
+        frame = chat.frame
+        if 'emoji_count' in frame:
+            candidates = np.flatnonzero(frame['emoji_count'].to_numpy() > 0)
+        else:
+            candidates = np.arange(len(frame))
+
+        found = [find_emojis(message) for message in frame['message'].to_numpy()[candidates]]
+        ids, emojis = pd.factorize(pd.Series([item for items in found for item in items], dtype=object))
+        chat._cache['emoji_table'] = {
+            'rows': np.repeat(candidates, [len(items) for items in found]),
+            'ids': ids.astype(np.int32),
+            'emojis': np.asarray(emojis, dtype=object),
+        }
+    return chat._cache['emoji_table']
+
+
+def emoji_counts(df, selected_user='Overall'):
+    """Emoji used by a user (or 'Overall'), most used first, ties by first appearance."""
+    chat = ChatIndex.of(df)
+    table = emoji_table(chat)
+
+    keep = np.zeros(len(chat), dtype=bool)
+    keep[chat.rows(selected_user)] = True
+    counts = np.bincount(table['ids'][keep[table['rows']]], minlength=len(table['emojis']))
+
+    used = np.flatnonzero(counts)
+    order = used[np.argsort(-counts[used], kind='stable')]
+    return pd.DataFrame({'emoji': table['emojis'][order], 'count': counts[order]})
+
+
+def emoji_usage(df, by='user'):
+    """Emoji counts per value of a frame column (e.g. 'user', 'month', 'only_date').
+
+    Returns a Series indexed by (``by`` value, emoji).
+    """
+    chat = ChatIndex.of(df)
+    table = emoji_table(chat)
+    codes, labels = pd.factorize(chat.frame[by])
+
+    pairs = pd.DataFrame({by: codes[table['rows']], 'emoji': table['ids']})
+    usage = pairs.groupby([by, 'emoji']).size().rename('count')
+    return usage.set_axis(pd.MultiIndex.from_arrays([
+        labels.take(usage.index.get_level_values(0)),
+        table['emojis'][usage.index.get_level_values(1)],
+    ], names=[by, 'emoji']))
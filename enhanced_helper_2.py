@@ -1,151 +1,142 @@
+import operator
 import pandas as pd
 import numpy as np
 import networkx as nx
-from datetime import datetime, timedelta
-from textblob import TextBlob
-from urlextract import URLExtract
+from scipy import sparse
+from datetime import datetime
+from chat_index import ChatIndex
+from sentiment import add_sentiment
+from text_features import text_features
+from keywords import keyword_hits
+from links import add_links
 import warnings
 warnings.filterwarnings('ignore')
 
-extract = URLExtract()
-
 # ==================== GROUP DYNAMICS & SOCIAL NETWORK ANALYSIS ====================
 
+def interaction_edges(df):
+    """Who responds to whom, as a sparse edge list built once per chat
+    
+    Counts text messages answering a different user within 30 minutes.
+    Returns a dict with ``users`` (in order of first message) and parallel
+    ``source`` (responder), ``target`` (user responded to) and ``weight``
+    arrays, sorted by source then target.
+    """
+    chat = ChatIndex.of(df)
+    if 'interaction_edges' not in chat._cache:
+        # Filter out group notifications and media messages
+        flow = chat.reply_table(media=False)
+        codes, users = pd.factorize(flow['user'])
+        
+        # Track who responds to whom within a reasonable time (30 minutes)
+        replies = np.flatnonzero((flow['is_reply'] & (flow['gap_minutes'] < 30)).to_numpy())
+        pairs, weight = np.unique(codes[replies] * len(users) + codes[replies - 1], return_counts=True)
+        
+        chat._cache['interaction_edges'] = {
+            'users': pd.Index(users),
+            'source': pairs // max(len(users), 1),
+            'target': pairs % max(len(users), 1),
+            'weight': weight.astype(np.int64),
+        }
+    return chat._cache['interaction_edges']
+
 def group_interaction_matrix(df):
     """Create interaction matrix for group chats"""
-    # Filter out group notifications and media messages
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')].copy()
-    temp = temp.sort_values('date')
-    
-    users = temp['user'].unique()
-    interaction_matrix = pd.DataFrame(0, index=users, columns=users)
-    
-    # Track who responds to whom
-    for i in range(1, len(temp)):
-        current_user = temp.iloc[i]['user']
-        prev_user = temp.iloc[i-1]['user']
-        
-        if current_user != prev_user:
-            # Check if response is within reasonable time (30 minutes)
-            time_diff = (temp.iloc[i]['date'] - temp.iloc[i-1]['date']).total_seconds() / 60
-            if time_diff < 30:
-                interaction_matrix.loc[current_user, prev_user] += 1
+    edges = interaction_edges(df)
+    users = edges['users']
     
-    return interaction_matrix
+    counts = np.zeros((len(users), len(users)), dtype=np.int64)
+    counts[edges['source'], edges['target']] = edges['weight']
+    return pd.DataFrame(counts, index=list(users), columns=list(users))
 
 def identify_group_roles(df):
     """Identify different roles users play in group chats"""
     try:
-        temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')].copy()
+        chat = ChatIndex.of(df)
+        rows = chat.rows(notifications=False, media=False)
+        features = text_features(chat).take(rows)
+        
+        stats = pd.DataFrame({
+            'user': chat.frame['user'].take(rows).to_numpy(),
+            'length': features['length'].to_numpy(),
+            'questions': features['question_count'].to_numpy(),
+            'exclamations': features['exclamation_count'].to_numpy(),
+        }).groupby('user', sort=False).agg(
+            total_messages=('length', 'size'),
+            avg_message_length=('length', 'mean'),
+            questions_asked=('questions', 'sum'),
+            exclamations=('exclamations', 'sum'),
+        )
         
-        if len(temp) == 0:
+        if len(stats) < 2:
             return {}
         
-        user_stats = {}
-        users = temp['user'].unique()
+        # Responses: a different user's message answered within 30 minutes
+        flow = chat.reply_table(media=False)
+        replies = flow[flow['is_reply'] & (flow['gap_minutes'] < 30)]
+        stats['responses_to_others'] = replies.groupby('user').size().reindex(stats.index, fill_value=0)
+        stats['response_rate'] = stats['responses_to_others'] / stats['total_messages']
         
-        if len(users) < 2:
-            return {}
+        # Thresholds are shared by every user
+        messages = stats['total_messages']
+        median_messages = messages.median()
+        q30_messages = messages.quantile(0.3)
+        q25_messages = messages.quantile(0.25)
+        avg_message_len = features['length'].mean()
         
-        for user in users:
-            user_messages = temp[temp['user'] == user]
-            
-            # Calculate various metrics
-            total_messages = len(user_messages)
-            avg_message_length = user_messages['message'].str.len().mean() if total_messages > 0 else 0
-            questions_asked = user_messages['message'].str.count('\?').sum()
-            exclamations = user_messages['message'].str.count('!').sum()
-            
-            # Response patterns
-            user_indices = temp[temp['user'] == user].index
-            responses_to_others = 0
-            
-            for idx in user_indices:
-                if idx > 0 and idx < len(temp):
-                    try:
-                        prev_user = temp.loc[idx-1, 'user']
-                        if prev_user != user:
-                            time_diff = (temp.loc[idx, 'date'] - temp.loc[idx-1, 'date']).total_seconds() / 60
-                            if time_diff < 30:  # Responded within 30 minutes
-                                responses_to_others += 1
-                    except (KeyError, IndexError):
-                        continue
-            
-            user_stats[user] = {
-                'total_messages': total_messages,
-                'avg_message_length': avg_message_length,
-                'questions_asked': questions_asked,
-                'exclamations': exclamations,
-                'responses_to_others': responses_to_others,
-                'response_rate': responses_to_others / total_messages if total_messages > 0 else 0
-            }
-        
-        # Classify roles
-        roles = {}
-        for user, stats in user_stats.items():
-            role_scores = {
-                'leader': 0,
-                'supporter': 0,
-                'questioner': 0,
-                'lurker': 0,
-                'entertainer': 0
-            }
-            
-            # Calculate thresholds safely
-            message_counts = temp.groupby('user').size()
-            median_messages = message_counts.median() if len(message_counts) > 0 else 0
-            q30_messages = message_counts.quantile(0.3) if len(message_counts) > 0 else 0
-            q25_messages = message_counts.quantile(0.25) if len(message_counts) > 0 else 0
-            avg_message_len = temp['message'].str.len().mean() if len(temp) > 0 else 0
-            
+        role_scores = pd.DataFrame({
             # Leader: High message count, long messages, low response rate (initiates more)
-            if stats['total_messages'] > median_messages:
-                role_scores['leader'] += 2
-            if stats['avg_message_length'] > avg_message_len:
-                role_scores['leader'] += 1
-            if stats['response_rate'] < 0.5:
-                role_scores['leader'] += 1
-                
+            'leader': 2 * (messages > median_messages) + (stats['avg_message_length'] > avg_message_len) + (stats['response_rate'] < 0.5),
             # Supporter: High response rate, moderate message count
-            if stats['response_rate'] > 0.6:
-                role_scores['supporter'] += 2
-            if stats['total_messages'] > q30_messages:
-                role_scores['supporter'] += 1
-                
+            'supporter': 2 * (stats['response_rate'] > 0.6) + (messages > q30_messages),
             # Questioner: High question rate
-            if stats['questions_asked'] > 0 and stats['total_messages'] > 0:
-                role_scores['questioner'] += min(stats['questions_asked'] / stats['total_messages'] * 10, 5)
-                
+            'questioner': np.minimum(stats['questions_asked'] / messages * 10, 5),
             # Lurker: Low message count
-            if stats['total_messages'] < q25_messages:
-                role_scores['lurker'] += 3
-                
+            'lurker': 3 * (messages < q25_messages),
             # Entertainer: High exclamation usage
-            if stats['exclamations'] > 0 and stats['total_messages'] > 0:
-                role_scores['entertainer'] += min(stats['exclamations'] / stats['total_messages'] * 10, 5)
-            
-            # Assign primary role
-            primary_role = max(role_scores, key=role_scores.get)
-            roles[user] = {
-                'primary_role': primary_role,
-                'role_scores': role_scores,
-                'stats': stats
-            }
+            'entertainer': np.minimum(stats['exclamations'] / messages * 10, 5),
+        })
+        
+        # Ties go to the first role, as with max() over the scores
+        primary_roles = role_scores.columns[np.argmax(role_scores.to_numpy(), axis=1)]
         
-        return roles
+        return {
+            user: {'primary_role': primary_role, 'role_scores': scores, 'stats': user_stats}
+            for user, primary_role, scores, user_stats in zip(
+                stats.index, primary_roles, role_scores.to_dict('records'), stats.to_dict('records'))
+        }
     except Exception:
+        # Degenerate chats (one user, no text, no replies) show no roles rather than an error
         return {}
 
+# Above this many users, betweenness is estimated from a sample of source nodes
+BETWEENNESS_EXACT_MAX_USERS = 300
+BETWEENNESS_SAMPLES = 100
+
+def interaction_graph(df):
+    """Directed responder -> responded-to graph with interaction counts as weights"""
+    edges = interaction_edges(df)
+    users = edges['users']
+    
+    G = nx.DiGraph()
+    G.add_nodes_from(users)
+    G.add_weighted_edges_from(zip(users[edges['source']], users[edges['target']], edges['weight'].tolist()))
+    return G
+
 def communication_bridges_analysis(df):
     """Identify users who bridge conversations between different group members"""
-    interaction_matrix = group_interaction_matrix(df)
+    chat = ChatIndex.of(df)
+    if 'bridge_scores' in chat._cache:
+        return chat._cache['bridge_scores'].copy()
     
-    # Create network graph
-    G = nx.from_pandas_adjacency(interaction_matrix, create_using=nx.DiGraph())
+    G = interaction_graph(chat)
     
     # Calculate centrality measures
     try:
-        betweenness = nx.betweenness_centrality(G)
+        if G.number_of_nodes() > BETWEENNESS_EXACT_MAX_USERS:
+            betweenness = nx.betweenness_centrality(G, k=BETWEENNESS_SAMPLES, seed=42)
+        else:
+            betweenness = nx.betweenness_centrality(G)
         closeness = nx.closeness_centrality(G)
         eigenvector = nx.eigenvector_centrality(G, max_iter=1000)
         
@@ -163,44 +154,91 @@ def communication_bridges_analysis(df):
             bridge_scores['eigenvector'] * 0.2
         )
         
-        return bridge_scores.sort_values('bridge_score', ascending=False)
+        bridge_scores = bridge_scores.sort_values('bridge_score', ascending=False)
     except Exception:
-        return pd.DataFrame()
-
-def group_activity_correlation(df):
-    """Analyze how group members' activity affects others"""
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')].copy()
-    
-    # Group by hour and user to get activity patterns
-    hourly_activity = temp.groupby(['date', 'hour', 'user']).size().unstack(fill_value=0)
-    
-    # Calculate correlation between users' activity
-    correlation_matrix = hourly_activity.corr()
-    
-    # Find strongest correlations (excluding self-correlation)
-    strong_correlations = []
-    for user1 in correlation_matrix.columns:
-        for user2 in correlation_matrix.columns:
-            if user1 != user2:
-                corr_value = correlation_matrix.loc[user1, user2]
-                if abs(corr_value) > 0.3:  # Significant correlation
-                    strong_correlations.append({
-                        'user1': user1,
-                        'user2': user2,
-                        'correlation': corr_value,
-                        'relationship': 'positive' if corr_value > 0 else 'negative'
-                    })
-    
-    return pd.DataFrame(strong_correlations).sort_values('correlation', key=abs, ascending=False)
+        bridge_scores = pd.DataFrame()
+    
+    chat._cache['bridge_scores'] = bridge_scores
+    return bridge_scores.copy()
+
+# Supported activity bin widths, in minutes
+ACTIVITY_BINS = {'15min': 15, 'hour': 60, 'day': 1440}
+
+def activity_matrix(df, freq='hour'):
+    """Text messages per time bin and user, as a sparse (bins x users) matrix
+    
+    Bins are ``freq`` wide ('15min', 'hour' or 'day') and cover the whole
+    chat, quiet bins included; only bins with messages are stored, so years
+    of 15-minute bins for many users stay small. Returns a dict with ``bins``
+    (bin starts), ``users`` and ``counts`` (int32 CSR matrix).
+    """
+    if freq not in ACTIVITY_BINS:
+        raise ValueError(f"Unknown activity bin {freq!r}, expected one of {sorted(ACTIVITY_BINS)}")
+    
+    chat = ChatIndex.of(df)
+    rows = chat.rows(notifications=False, media=False)
+    codes, users = pd.factorize(chat.frame['user'].take(rows))
+    
+    width = np.timedelta64(ACTIVITY_BINS[freq], 'm')
+    dates = chat.frame['date'].to_numpy()[rows]
+    origin = dates.min().astype('datetime64[D]') if len(rows) else np.datetime64('1970-01-01')
+    bins = ((dates - origin) // width).astype(np.int64)
+    n_bins = bins.max() + 1 if len(rows) else 0
+    
+    counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (bins, codes)), shape=(n_bins, len(users)))
+    counts.sum_duplicates()
+    return {
+        'bins': pd.DatetimeIndex(origin + np.arange(n_bins) * width),
+        'users': pd.Index(users),
+        'counts': counts,
+    }
+
+def group_activity_correlation(df, freq='hour', threshold=0.3):
+    """Analyze how group members' activity affects others
+    
+    Correlates users' message counts per time bin and returns each pair
+    whose correlation exceeds ``threshold`` in magnitude, strongest first.
+    """
+    activity = activity_matrix(df, freq)
+    users = activity['users'].to_numpy(dtype=object)
+    
+    counts = activity['counts']
+    n_bins = counts.shape[0]
+    
+    # Users x users correlation from one sparse product, quiet bins counting as zeros,
+    # as np.corrcoef over the dense matrix; users who never vary correlate as NaN
+    if n_bins > 1:
+        counts = counts.astype(np.float64)
+        totals = np.asarray(counts.sum(axis=0)).ravel()
+        products = (counts.T @ counts).toarray()
+        covariance = (products - np.outer(totals, totals) / n_bins) / (n_bins - 1)
+        spread = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation_matrix = np.clip(covariance / np.outer(spread, spread), -1, 1)
+    else:
+        correlation_matrix = np.full((len(users), len(users)), np.nan)
+    
+    # Each pair once, excluding self-correlation
+    first, second = np.triu_indices(len(users), k=1)
+    values = correlation_matrix[first, second]
+    strong = np.abs(values) > threshold
+    
+    strong_correlations = pd.DataFrame({
+        'user1': users[first[strong]],
+        'user2': users[second[strong]],
+        'correlation': values[strong],
+        'relationship': np.where(values[strong] > 0, 'positive', 'negative'),
+    })
+    return strong_correlations.sort_values('correlation', key=abs, ascending=False, kind='stable')
 
 # ==================== PREDICTIVE ANALYTICS ====================
 
 def predict_activity_patterns(df):
     """Predict busy/quiet periods based on historical data"""
-    temp = df[df['user'] != 'group_notification'].copy()
+    temp = ChatIndex.of(df).select(notifications=False)
     
     # Activity by hour and day
-    activity_patterns = temp.groupby(['day_name', 'hour']).size().unstack(fill_value=0)
+    activity_patterns = temp.groupby(['day_name', 'hour'], observed=True).size().unstack(fill_value=0)
     
     # Calculate average activity for each hour across all days
     avg_hourly_activity = activity_patterns.mean(axis=0)
@@ -217,57 +255,86 @@ def predict_activity_patterns(df):
     
     return predictions
 
+def monthly_partials(df, selected_user='Overall', previous=None):
+    """Per-month partial aggregates of a user's text messages, cached per chat
+    
+    One row per month (indexed by month start) with ``message_count``,
+    ``length_sum``, ``polarity_sum``, ``unique_users`` and ``active_days``.
+    ``previous`` may hold the partials of an earlier prefix of the same chat:
+    its months before the last one are complete and reused as they are, so
+    only the last stored month and any newer ones are aggregated again.
+    """
+    chat = ChatIndex.of(df)
+    key = ('monthly_partials', selected_user)
+    if key in chat._cache:
+        return chat._cache[key]
+    
+    add_sentiment(chat)
+    rows = chat.rows(selected_user, notifications=False, media=False)
+    dates = chat.frame['date'].to_numpy()[rows]
+    months = dates.astype('datetime64[M]')
+    
+    kept = None
+    if previous is not None and len(previous):
+        # The last stored month may have grown since; earlier months are final
+        resume = previous.index[-1].to_datetime64().astype('datetime64[M]')
+        kept = previous[previous.index < previous.index[-1]]
+        fresh = months >= resume
+        rows, dates, months = rows[fresh], dates[fresh], months[fresh]
+    
+    partials = pd.DataFrame({
+        'month': pd.DatetimeIndex(months.astype('datetime64[s]')),
+        'length': text_features(chat)['length'].to_numpy()[rows],
+        'polarity': chat.frame['polarity'].to_numpy(dtype=np.float64)[rows],
+        'user': chat.frame['user'].take(rows).to_numpy(),
+        'day': dates.astype('datetime64[D]'),
+    }).groupby('month').agg(
+        message_count=('length', 'size'),
+        length_sum=('length', 'sum'),
+        polarity_sum=('polarity', 'sum'),
+        unique_users=('user', 'nunique'),
+        active_days=('day', 'nunique'),
+    )
+    if kept is not None:
+        partials = pd.concat([kept, partials])
+    
+    chat._cache[key] = partials
+    return partials
+
 def relationship_evolution_analysis(selected_user, df):
     """Track how communication patterns change over time"""
-    if selected_user == 'Overall':
-        temp = df[df['user'] != 'group_notification'].copy()
-    else:
-        temp = df[df['user'] == selected_user].copy()
-    
-    temp = temp[temp['message'] != '<Media omitted>\n']
-    
     # Group by month to see evolution
-    temp['year_month'] = temp['date'].dt.to_period('M')
-    
-    monthly_stats = []
-    for period in temp['year_month'].unique():
-        period_data = temp[temp['year_month'] == period]
-        
-        # Calculate various metrics for this period
-        stats = {
-            'period': str(period),
-            'message_count': len(period_data),
-            'avg_message_length': period_data['message'].str.len().mean(),
-            'unique_users': period_data['user'].nunique(),
-            'avg_daily_messages': len(period_data) / period_data['only_date'].nunique()
-        }
-        
-        # Sentiment analysis for this period
-        try:
-            sentiments = []
-            for message in period_data['message']:
-                blob = TextBlob(message)
-                sentiments.append(blob.sentiment.polarity)
-            stats['avg_sentiment'] = np.mean(sentiments)
-        except Exception:
-            stats['avg_sentiment'] = 0
-        
-        monthly_stats.append(stats)
-    
-    evolution_df = pd.DataFrame(monthly_stats)
+    partials = monthly_partials(df, selected_user)
+    
+    evolution_df = pd.DataFrame({
+        'period': partials.index.strftime('%Y-%m'),
+        'message_count': partials['message_count'].to_numpy(),
+        'avg_message_length': (partials['length_sum'] / partials['message_count']).to_numpy(),
+        'unique_users': partials['unique_users'].to_numpy(),
+        'avg_daily_messages': (partials['message_count'] / partials['active_days']).to_numpy(),
+        # Sentiment for this period, from the shared scores
+        'avg_sentiment': (partials['polarity_sum'] / partials['message_count']).to_numpy(),
+    })
     return evolution_df.sort_values('period')
 
 # ==================== ADVANCED INSIGHTS & REPORTS ====================
 
-def generate_chat_insights(selected_user, df):
-    """Generate AI-like insights about the chat"""
+def _reuse(computed, name, func, *args):
+    """A result already computed by the caller, or ``func(*args)``."""
+    if computed and name in computed:
+        return computed[name]
+    return func(*args)
+
+def generate_chat_insights(selected_user, df, computed=None):
+    """Generate AI-like insights about the chat
+    
+    ``computed`` maps analysis names to results the caller already has.
+    """
     insights = []
     
     # Basic stats
-    if selected_user != 'Overall':
-        user_df = df[df['user'] == selected_user]
-    else:
-        user_df = df[df['user'] != 'group_notification']
+    chat = ChatIndex.of(df)
+    user_df = chat.select(selected_user, notifications=False)
     
     total_messages = len(user_df)
     unique_users = user_df['user'].nunique()
@@ -279,7 +346,7 @@ def generate_chat_insights(selected_user, df):
     
     # Activity patterns
     busiest_hour = user_df.groupby('hour').size().idxmax()
-    busiest_day = user_df.groupby('day_name').size().idxmax()
+    busiest_day = user_df.groupby('day_name', observed=True).size().idxmax()
     
     insights.append(f"⏰ Most active at {busiest_hour}:00 on {busiest_day}s.")
     
@@ -291,7 +358,7 @@ def generate_chat_insights(selected_user, df):
         insights.append("💬 Participants prefer short, quick messages.")
     
     # Media usage
-    media_count = len(user_df[user_df['message'] == '<Media omitted>\n'])
+    media_count = chat.media_mask[chat.rows(selected_user, notifications=False)].sum()
     media_ratio = media_count / total_messages
     
     if media_ratio > 0.1:
@@ -300,7 +367,7 @@ def generate_chat_insights(selected_user, df):
     # Sentiment insight
     try:
         from enhanced_helper_1 import sentiment_analysis
-        sentiment_data = sentiment_analysis(selected_user, df)
+        sentiment_data = _reuse(computed, 'sentiment_analysis', sentiment_analysis, selected_user, chat)
         positive_ratio = len(sentiment_data[sentiment_data['sentiment'] == 'Positive']) / len(sentiment_data)
         if positive_ratio > 0.6:
             insights.append("😊 Overall positive communication tone.")
@@ -312,7 +379,7 @@ def generate_chat_insights(selected_user, df):
     # Response time insight
     try:
         from enhanced_helper_1 import response_time_analysis
-        response_df, avg_response = response_time_analysis(selected_user, df)
+        response_df, avg_response = _reuse(computed, 'response_time_analysis', response_time_analysis, selected_user, chat)
         if not response_df.empty:
             avg_resp_time = response_df['response_time_minutes'].median()
             if avg_resp_time < 10:
@@ -326,194 +393,167 @@ def generate_chat_insights(selected_user, df):
 
 def conversation_highlights(selected_user, df, limit=10):
     """Find the most interesting/important messages"""
-    if selected_user != 'Overall':
-        temp = df[df['user'] == selected_user]
-    else:
-        temp = df[df['user'] != 'group_notification']
+    chat = ChatIndex.of(df)
+    rows = chat.rows(selected_user, notifications=False, media=False)
+    temp = chat.frame.take(rows)
+    features = text_features(chat).take(rows)
     
-    temp = temp[temp['message'] != '<Media omitted>\n'].copy()
+    length = features['length'].to_numpy()
     
-    highlights = []
+    # Length score (longer messages might be more important)
+    score = np.select([length > 100, length > 50], [2.0, 1.0], default=0.0)
     
-    for _, row in temp.iterrows():
-        message = row['message']
-        score = 0
-        
-        # Length score (longer messages might be more important)
-        if len(message) > 100:
-            score += 2
-        elif len(message) > 50:
-            score += 1
-        
-        # Emotion score
-        exclamations = message.count('!')
-        questions = message.count('?')
-        score += min(exclamations * 0.5, 2)
-        score += min(questions * 0.5, 2)
-        
-        # Caps usage (excitement/importance)
-        caps_ratio = sum(1 for c in message if c.isupper()) / len(message) if len(message) > 0 else 0
-        if caps_ratio > 0.2:
-            score += 1
-        
-        # Keywords that might indicate importance
-        important_keywords = ['important', 'urgent', 'news', 'announcement', 'update', 'decision', 'final', 'confirmed']
-        for keyword in important_keywords:
-            if keyword.lower() in message.lower():
-                score += 1
-        
-        highlights.append({
-            'date': row['date'],
-            'user': row['user'],
-            'message': message,
-            'score': score
-        })
+    # Emotion score
+    score += np.minimum(features['exclamation_count'].to_numpy() * 0.5, 2)
+    score += np.minimum(features['question_count'].to_numpy() * 0.5, 2)
+    
+    # Caps usage (excitement/importance)
+    score += features['caps_ratio'].to_numpy() > 0.2
     
-    highlights_df = pd.DataFrame(highlights)
+    # One point per important keyword used (see keywords.KEYWORD_CATEGORIES)
+    score += keyword_hits(chat)['important'].to_numpy()[rows]
+    
+    highlights_df = pd.DataFrame({
+        'date': temp['date'].to_numpy(),
+        'user': temp['user'].to_numpy(),
+        'message': temp['message'].to_numpy(),
+        'score': score
+    })
     return highlights_df.nlargest(limit, 'score') if not highlights_df.empty else pd.DataFrame()
 
 # ==================== GAMIFICATION & ACHIEVEMENT SYSTEM ====================
 
+# Badge tiers per metric of the per-user summary: the first tier a user passes is awarded
+BADGE_RULES = [
+    ('messages', operator.ge, [(10000, "🏆 Chat Legend (10K+ messages)"),
+                               (5000, "💎 Super Communicator (5K+ messages)"),
+                               (1000, "🌟 Active Chatter (1K+ messages)"),
+                               (100, "💬 Regular User (100+ messages)")]),
+    ('span_days', operator.ge, [(365, "📅 Long-term Friend (1+ year)"),
+                                (180, "🗓️ Consistent Chatter (6+ months)")]),
+    ('active_days', operator.ge, [(100, "⏰ Daily Communicator (100+ active days)")]),
+    ('media', operator.ge, [(500, "📸 Media Master (500+ media)"),
+                            (100, "🖼️ Photo Sharer (100+ media)")]),
+    ('night', operator.ge, [(100, "🌙 Night Owl (100+ late night messages)")]),
+    ('early', operator.ge, [(100, "🌅 Early Bird (100+ early morning messages)")]),
+    ('avg_response', operator.lt, [(5, "⚡ Lightning Fast (Avg <5min response)"),
+                                   (30, "🏃 Quick Responder (Avg <30min response)")]),
+]
+
+def badge_stats(selected_user, df):
+    """Per-user metrics the badge rules are evaluated on, one row per user"""
+    chat = ChatIndex.of(df)
+    rows = chat.rows(selected_user, notifications=False)
+    temp = chat.frame.take(rows)
+    hours = temp['hour']
+    
+    stats = temp.assign(
+        media=chat.media_mask[rows],
+        night=(hours.between(22, 23) | hours.between(0, 5)).to_numpy(),
+        early=hours.between(5, 8).to_numpy(),
+    ).groupby('user', sort=False).agg(
+        messages=('user', 'size'),
+        first=('date', 'min'),
+        last=('date', 'max'),
+        active_days=('only_date', 'nunique'),
+        media=('media', 'sum'),
+        night=('night', 'sum'),
+        early=('early', 'sum'),
+    )
+    stats['span_days'] = (stats.pop('last') - stats.pop('first')).dt.days
+    
+    # Replies to someone else within 24 hours, from the whole chat's reply table
+    flow = chat.reply_table()
+    replies = flow[flow['is_reply'] & (flow['gap_minutes'] < 1440)]
+    stats['avg_response'] = replies.groupby('user')['gap_minutes'].mean().reindex(stats.index)
+    return stats
+
 def calculate_communication_badges(selected_user, df):
     """Award badges based on communication patterns"""
-    if selected_user != 'Overall':
-        user_df = df[df['user'] == selected_user]
-    else:
-        user_df = df[df['user'] != 'group_notification']
-    
-    badges = {}
+    stats = badge_stats(selected_user, df)
     
-    for user in user_df['user'].unique():
-        user_messages = user_df[user_df['user'] == user]
-        user_badges = []
-        
-        # Message count badges
-        msg_count = len(user_messages)
-        if msg_count >= 10000:
-            user_badges.append("🏆 Chat Legend (10K+ messages)")
-        elif msg_count >= 5000:
-            user_badges.append("💎 Super Communicator (5K+ messages)")
-        elif msg_count >= 1000:
-            user_badges.append("🌟 Active Chatter (1K+ messages)")
-        elif msg_count >= 100:
-            user_badges.append("💬 Regular User (100+ messages)")
-        
-        # Time-based badges
-        date_range = (user_messages['date'].max() - user_messages['date'].min()).days
-        if date_range >= 365:
-            user_badges.append("📅 Long-term Friend (1+ year)")
-        elif date_range >= 180:
-            user_badges.append("🗓️ Consistent Chatter (6+ months)")
-        
-        # Activity badges
-        unique_days = user_messages['only_date'].nunique()
-        if unique_days >= 100:
-            user_badges.append("⏰ Daily Communicator (100+ active days)")
-        
-        # Media badges
-        media_count = len(user_messages[user_messages['message'] == '<Media omitted>\n'])
-        if media_count >= 500:
-            user_badges.append("📸 Media Master (500+ media)")
-        elif media_count >= 100:
-            user_badges.append("🖼️ Photo Sharer (100+ media)")
-        
-        # Time-specific badges
-        night_messages = len(user_messages[user_messages['hour'].between(22, 23) | user_messages['hour'].between(0, 5)])
-        if night_messages >= 100:
-            user_badges.append("🌙 Night Owl (100+ late night messages)")
-        
-        early_messages = len(user_messages[user_messages['hour'].between(5, 8)])
-        if early_messages >= 100:
-            user_badges.append("🌅 Early Bird (100+ early morning messages)")
-        
-        # Response badges
-        try:
-            from enhanced_helper_1 import response_time_analysis
-            response_df, avg_response = response_time_analysis(user, df)
-            if not response_df.empty and user in avg_response.index:
-                avg_resp_time = avg_response.loc[user, 'mean']
-                if avg_resp_time < 5:
-                    user_badges.append("⚡ Lightning Fast (Avg <5min response)")
-                elif avg_resp_time < 30:
-                    user_badges.append("🏃 Quick Responder (Avg <30min response)")
-        except Exception:
-            pass
-        
-        badges[user] = user_badges
+    awarded = np.column_stack([
+        np.select([compare(stats[metric].to_numpy(), threshold) for threshold, _ in tiers],
+                  [badge for _, badge in tiers], default='')
+        for metric, compare, tiers in BADGE_RULES
+    ]) if len(stats) else np.empty((0, len(BADGE_RULES)), dtype=object)
     
-    return badges
+    return {user: [badge for badge in row if badge] for user, row in zip(stats.index, awarded.tolist())}
 
-def personality_matching_analysis(df):
-    """Compare communication styles between users"""
-    temp = df[(df['user'] != 'group_notification') & (df['message'] != '<Media omitted>\n')].copy()
-    
-    user_personalities = {}
-    
-    for user in temp['user'].unique():
-        user_messages = temp[temp['user'] == user]
-        
-        # Calculate personality metrics
-        total_messages = len(user_messages)
-        avg_length = user_messages['message'].str.len().mean()
-        question_ratio = user_messages['message'].str.count('\?').sum() / total_messages
-        exclamation_ratio = user_messages['message'].str.count('!').sum() / total_messages
-        caps_usage = user_messages['message'].apply(lambda x: sum(1 for c in x if c.isupper()) / len(x) if len(x) > 0 else 0).mean()
-        
-        # Sentiment analysis
-        try:
-            sentiments = []
-            for message in user_messages['message']:
-                blob = TextBlob(message)
-                sentiments.append(blob.sentiment.polarity)
-            avg_sentiment = np.mean(sentiments)
-        except Exception:
-            avg_sentiment = 0
-        
-        # Time patterns
-        night_ratio = len(user_messages[user_messages['hour'].between(22, 23) | user_messages['hour'].between(0, 5)]) / total_messages
-        weekend_ratio = len(user_messages[user_messages['day_name'].isin(['Saturday', 'Sunday'])]) / total_messages
-        
-        user_personalities[user] = {
-            'avg_message_length': avg_length,
-            'question_ratio': question_ratio,
-            'exclamation_ratio': exclamation_ratio,
-            'caps_usage': caps_usage,
-            'avg_sentiment': avg_sentiment,
-            'night_ratio': night_ratio,
-            'weekend_ratio': weekend_ratio
-        }
-    
-    # Calculate similarity between users
-    similarities = []
-    users = list(user_personalities.keys())
-    
-    for i in range(len(users)):
-        for j in range(i+1, len(users)):
-            user1, user2 = users[i], users[j]
-            
-            # Calculate Euclidean distance between personality vectors
-            p1 = np.array(list(user_personalities[user1].values()))
-            p2 = np.array(list(user_personalities[user2].values()))
-            
-            # Normalize to prevent length bias
-            p1_norm = (p1 - np.mean(p1)) / (np.std(p1) + 1e-8)
-            p2_norm = (p2 - np.mean(p2)) / (np.std(p2) + 1e-8)
-            
-            similarity = 1 / (1 + np.linalg.norm(p1_norm - p2_norm))
-            
-            similarities.append({
-                'user1': user1,
-                'user2': user2,
-                'similarity_score': similarity,
-                'compatibility': 'High' if similarity > 0.7 else 'Medium' if similarity > 0.5 else 'Low'
-            })
-    
-    return pd.DataFrame(similarities).sort_values('similarity_score', ascending=False), user_personalities
+# Cells of the user x user distance block held in memory at once
+PAIR_BLOCK_CELLS = 4_000_000
+
+def nearest_users(points, k):
+    """Each row's ``k`` nearest other rows by Euclidean distance, as an (n, k) index array."""
+    n = len(points)
+    squares = np.einsum('ij,ij->i', points, points)
+    block = max(1, PAIR_BLOCK_CELLS // max(n, 1))
+    nearest = np.empty((n, k), dtype=np.int64)
+    
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, for a block of rows against all rows
+        distances = squares[start:stop, None] + squares[None, :] - 2 * points[start:stop] @ points.T
+        distances[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest[start:stop] = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    return nearest
+
+def personality_matching_analysis(df, top_k=5):
+    """Compare communication styles between users
+    
+    Returns each user's ``top_k`` closest matches (every pair in small groups),
+    most similar first, and the per-user metrics.
+    """
+    chat = ChatIndex.of(df)
+    add_sentiment(chat)
+    rows = chat.rows(notifications=False, media=False)
+    temp = chat.frame.take(rows)
+    features = text_features(chat).take(rows)
+    hours = temp['hour']
+    
+    # User x feature matrix: every metric is a per-user mean
+    personalities = pd.DataFrame({
+        'user': temp['user'].to_numpy(),
+        'avg_message_length': features['length'].to_numpy(),
+        'question_ratio': features['question_count'].to_numpy(),
+        'exclamation_ratio': features['exclamation_count'].to_numpy(),
+        'caps_usage': features['caps_ratio'].to_numpy(),
+        'avg_sentiment': temp['polarity'].to_numpy(),
+        'night_ratio': (hours.between(22, 23) | hours.between(0, 5)).to_numpy(),
+        'weekend_ratio': temp['day_name'].isin(['Saturday', 'Sunday']).to_numpy(),
+    }).groupby('user', sort=False).mean()
+    user_personalities = personalities.to_dict('index')
+    
+    users = personalities.index.to_numpy(dtype=object)
+    k = min(top_k, len(users) - 1)
+    if k < 1:
+        return pd.DataFrame(columns=['user1', 'user2', 'similarity_score', 'compatibility']), user_personalities
+    
+    # Normalize each user's vector to prevent length bias
+    points = personalities.to_numpy(dtype=np.float64)
+    points = (points - points.mean(axis=1, keepdims=True)) / (points.std(axis=1, keepdims=True) + 1e-8)
+    
+    # Each user with their nearest users, every pair once (earlier user first)
+    nearest = nearest_users(points, k)
+    first = np.repeat(np.arange(len(users)), k)
+    pairs = np.unique(np.sort(np.column_stack([first, nearest.ravel()]), axis=1), axis=0)
+    
+    similarity = 1 / (1 + np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1))
+    similarities = pd.DataFrame({
+        'user1': users[pairs[:, 0]],
+        'user2': users[pairs[:, 1]],
+        'similarity_score': similarity,
+        'compatibility': np.select([similarity > 0.7, similarity > 0.5], ['High', 'Medium'], default='Low'),
+    })
+    
+    return similarities.sort_values('similarity_score', ascending=False, kind='stable'), user_personalities
 
 # ==================== PRIVACY & SECURITY FEATURES ====================
 
 def create_anonymous_analysis(df):
     """Create anonymized version of data for privacy-conscious analysis"""
+    chat = ChatIndex.of(df)
+    df = add_links(chat)
     anonymous_df = df.copy()
     
     # Replace usernames with generic identifiers
@@ -526,10 +566,11 @@ def create_anonymous_analysis(df):
     # Remove actual message content, keep only metadata
     anonymous_df['message_length'] = anonymous_df['message'].str.len()
     anonymous_df['word_count'] = anonymous_df['message'].str.split().str.len()
-    anonymous_df['has_media'] = (anonymous_df['message'] == '<Media omitted>\n').astype(int)
-    anonymous_df['has_link'] = anonymous_df['message'].apply(lambda x: 1 if extract.find_urls(x) else 0)
-    anonymous_df['question_marks'] = anonymous_df['message'].str.count('\?')
-    anonymous_df['exclamations'] = anonymous_df['message'].str.count('!')
+    anonymous_df['has_media'] = chat.media_mask.astype(int)
+    anonymous_df['has_link'] = df['has_link'].astype(int)
+    features = text_features(chat)
+    anonymous_df['question_marks'] = features['question_count']
+    anonymous_df['exclamations'] = features['exclamation_count']
     
     # Remove actual message content
     anonymous_df = anonymous_df.drop('message', axis=1)
@@ -540,30 +581,26 @@ def create_anonymous_analysis(df):
 
 def prepare_network_graph_data(df):
     """Prepare data for network visualization"""
-    interaction_matrix = group_interaction_matrix(df)
+    edges = interaction_edges(df)
+    users = edges['users']
+    weights = edges['weight']
     
     # Create nodes and edges for visualization
-    nodes = []
-    for user in interaction_matrix.index:
-        total_interactions = interaction_matrix.loc[user].sum() + interaction_matrix[user].sum()
-        nodes.append({
-            'id': user,
-            'label': user,
-            'size': min(total_interactions * 2, 50),  # Scale node size
-            'interactions': total_interactions
-        })
-    
-    edges = []
-    for user1 in interaction_matrix.index:
-        for user2 in interaction_matrix.columns:
-            weight = interaction_matrix.loc[user1, user2]
-            if weight > 0:
-                edges.append({
-                    'source': user1,
-                    'target': user2,
-                    'weight': weight,
-                    'width': min(weight * 0.5, 10)  # Scale edge width
-                })
+    interactions = (np.bincount(edges['source'], weights, minlength=len(users)) +
+                    np.bincount(edges['target'], weights, minlength=len(users))).astype(np.int64)
+    nodes = [{
+        'id': user,
+        'label': user,
+        'size': min(total_interactions * 2, 50),  # Scale node size
+        'interactions': total_interactions
+    } for user, total_interactions in zip(users, interactions.tolist())]
+    
+    edges = [{
+        'source': source,
+        'target': target,
+        'weight': weight,
+        'width': min(weight * 0.5, 10)  # Scale edge width
+    } for source, target, weight in zip(users[edges['source']], users[edges['target']], weights.tolist())]
     
     return {'nodes': nodes, 'edges': edges}
 
@@ -574,7 +611,7 @@ def prepare_sentiment_heatmap_data(selected_user, df):
     
     # Create sentiment score by day and hour
     sentiment_df['sentiment_score'] = sentiment_df['polarity']
-    heatmap_data = sentiment_df.groupby(['day_name', 'hour'])['sentiment_score'].mean().unstack(fill_value=0)
+    heatmap_data = sentiment_df.groupby(['day_name', 'hour'], observed=True)['sentiment_score'].mean().unstack(fill_value=0)
     
     # Reorder days
     day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -584,31 +621,16 @@ def prepare_sentiment_heatmap_data(selected_user, df):
 
 def conversation_flow_analysis(selected_user, df):
     """Analyze conversation flow patterns"""
-    if selected_user != 'Overall':
-        temp = df[df['user'] == selected_user]
-    else:
-        temp = df[df['user'] != 'group_notification']
-    
-    temp = temp[temp['message'] != '<Media omitted>\n'].copy()
-    temp = temp.sort_values('date')
-    
-    flow_patterns = []
+    flow = ChatIndex.of(df).reply_table(selected_user, media=False).iloc[1:]
     
-    for i in range(1, len(temp)):
-        prev_user = temp.iloc[i-1]['user']
-        curr_user = temp.iloc[i]['user']
-        time_gap = (temp.iloc[i]['date'] - temp.iloc[i-1]['date']).total_seconds() / 60
-        
-        flow_patterns.append({
-            'from_user': prev_user,
-            'to_user': curr_user,
-            'time_gap_minutes': time_gap,
-            'is_continuation': prev_user == curr_user,
-            'hour': temp.iloc[i]['hour'],
-            'day_name': temp.iloc[i]['day_name']
-        })
-    
-    flow_df = pd.DataFrame(flow_patterns)
+    flow_df = pd.DataFrame({
+        'from_user': flow['prev_user'].to_numpy(),
+        'to_user': flow['user'].to_numpy(),
+        'time_gap_minutes': flow['gap_minutes'].to_numpy(),
+        'is_continuation': ~flow['is_reply'].to_numpy(),
+        'hour': flow['hour'].to_numpy(),
+        'day_name': flow['day_name'].to_numpy()
+    })
     
     # Analyze patterns
     avg_response_time = flow_df[flow_df['is_continuation'] == False]['time_gap_minutes'].median()
@@ -622,8 +644,11 @@ def conversation_flow_analysis(selected_user, df):
 
 # ==================== EXPORT AND REPORTING FUNCTIONS ====================
 
-def generate_comprehensive_report(selected_user, df):
-    """Generate a comprehensive analysis report"""
+def generate_comprehensive_report(selected_user, df, computed=None):
+    """Generate a comprehensive analysis report
+    
+    ``computed`` maps analysis names to results the caller already has.
+    """
     report = {
         'basic_stats': {},
         'sentiment_analysis': {},
@@ -635,10 +660,13 @@ def generate_comprehensive_report(selected_user, df):
         'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
+    # Index once and share it with every analysis below
+    df = ChatIndex.of(df)
+    
     try:
         # Basic statistics
         from enhanced_helper_1 import fetch_stats
-        num_messages, words, num_media_messages, num_links = fetch_stats(selected_user, df)
+        num_messages, words, num_media_messages, num_links = _reuse(computed, 'fetch_stats', fetch_stats, selected_user, df)
         report['basic_stats'] = {
             'total_messages': num_messages,
             'total_words': words,
@@ -649,7 +677,7 @@ def generate_comprehensive_report(selected_user, df):
         # Sentiment analysis
         try:
             from enhanced_helper_1 import sentiment_analysis
-            sentiment_data = sentiment_analysis(selected_user, df)
+            sentiment_data = _reuse(computed, 'sentiment_analysis', sentiment_analysis, selected_user, df)
             if not sentiment_data.empty:
                 sentiment_counts = sentiment_data['sentiment'].value_counts()
                 report['sentiment_analysis'] = {
@@ -664,7 +692,7 @@ def generate_comprehensive_report(selected_user, df):
         # Response patterns
         try:
             from enhanced_helper_1 import response_time_analysis
-            response_df, avg_response = response_time_analysis(selected_user, df)
+            response_df, avg_response = _reuse(computed, 'response_time_analysis', response_time_analysis, selected_user, df)
             if not response_df.empty:
                 report['response_patterns'] = {
                     'avg_response_time_minutes': response_df['response_time_minutes'].mean(),
@@ -677,7 +705,7 @@ def generate_comprehensive_report(selected_user, df):
         # Communication style
         try:
             from enhanced_helper_1 import communication_style_analysis
-            style_analysis = communication_style_analysis(selected_user, df)
+            style_analysis = _reuse(computed, 'communication_style_analysis', communication_style_analysis, selected_user, df)
             report['communication_style'] = style_analysis.to_dict()
         except Exception:
             pass
@@ -685,7 +713,7 @@ def generate_comprehensive_report(selected_user, df):
         # Important moments
         try:
             from enhanced_helper_1 import detect_important_moments
-            moments = detect_important_moments(selected_user, df)
+            moments = _reuse(computed, 'detect_important_moments', detect_important_moments, selected_user, df)
             report['important_moments'] = {
                 'count': len(moments),
                 'top_moments': moments.head(5).to_dict('records') if not moments.empty else []
@@ -694,11 +722,11 @@ def generate_comprehensive_report(selected_user, df):
             pass
         
         # Generate insights
-        report['insights'] = generate_chat_insights(selected_user, df)
+        report['insights'] = _reuse(computed, 'generate_chat_insights', generate_chat_insights, selected_user, df, computed)
         
         # Badges
         try:
-            badges = calculate_communication_badges(selected_user, df)
+            badges = _reuse(computed, 'calculate_communication_badges', calculate_communication_badges, selected_user, df)
             report['badges'] = badges
         except Exception:
             pass
@@ -0,0 +1,104 @@
+"""Keyword categories matched in a single pass over each message.
+
+Every keyword of every category is compiled into one trie-shaped regex, so a
+message is scanned once however many keywords there are, and a keyword or
+phrase only matches as whole words ("miss" does not match "mission").
+``keyword_hits`` returns, per message, the number of distinct keywords of each
+category found, as integer columns cached on the chat's ``ChatIndex``.
+
+Besides the built-in categories, every ``*.txt`` file in ``KEYWORD_DIR`` is a
+category named after the file, with one keyword or phrase per line ("#" starts
+a comment). A file named like a built-in category extends it. The directory is
+read once per process, like the stop words.
+"""
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chat_index import ChatIndex
+from emojis import trie_pattern
+
+KEYWORD_CATEGORIES = {
+    'celebration': ['birthday', 'anniversary', 'congratulations', 'congrats', 'celebration', 'party', 'wedding'],
+    'decision': ['decide', 'decision', 'choose', 'final', 'confirmed', 'agreed', 'settled'],
+    'emotional': ['love', 'miss', 'sorry', 'forgive', 'angry', 'upset', 'happy', 'excited'],
+    'important': ['important', 'urgent', 'news', 'announcement', 'update', 'decision', 'final', 'confirmed'],
+}
+
+# Directory of user keyword files, one category per file
+KEYWORD_DIR = os.environ.get('KEYWORD_DIR', '')
+
+
+def load_keyword_dir(path=KEYWORD_DIR):
+    """Categories from the ``*.txt`` files of a directory; empty if there is none."""
+    if not path or not os.path.isdir(path):
+        return {}
+
+    categories = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.txt'):
+            with open(os.path.join(path, name), encoding='utf-8') as fh:
+                lines = (line.split('#', 1)[0].strip() for line in fh)
+                categories[name[:-len('.txt')]] = [line for line in lines if line]
+    return categories
+
+
+def keyword_categories():
+    """Built-in categories merged with the user keyword files."""
+    return {name: list(words) for name, words in _default_key()}
+
+
+@lru_cache(maxsize=1)
+def _default_key():
+    """The default categories as a hashable key, with ``KEYWORD_DIR`` read once."""
+    categories = {name: list(words) for name, words in KEYWORD_CATEGORIES.items()}
+    for name, words in load_keyword_dir().items():
+        categories.setdefault(name, []).extend(words)
+    return tuple((name, tuple(words)) for name, words in categories.items())
+
+
+@lru_cache(maxsize=8)
+def _compile(categories):
+    names = [name for name, _ in categories]
+    keywords = sorted({' '.join(word.lower().split()) for _, words in categories for word in words} - {''})
+    membership = np.zeros((len(keywords), len(names)), dtype=bool)
+    positions = {keyword: position for position, keyword in enumerate(keywords)}
+    for column, (_, words) in enumerate(categories):
+        for word in words:
+            keyword = ' '.join(word.lower().split())
+            if keyword:
+                membership[positions[keyword], column] = True
+
+    pattern = re.compile(rf'(?<!\w)(?:{trie_pattern(keywords)})(?!\w)') if keywords else None
+    return names, positions, membership, pattern
+
+
+def keyword_hits(df, categories=None):
+    """Distinct keywords of each category found in each message, aligned with the frame.
+
+    ``categories`` maps a name to a list of keywords and defaults to
+    ``keyword_categories()``. Messages are matched case-insensitively.
+    """
+    chat = ChatIndex.of(df)
+    if categories is None:
+        key = _default_key()
+    else:
+        key = tuple((name, tuple(words)) for name, words in categories.items())
+    if ('keyword_hits', key) not in chat._cache:
+        names, positions, membership, pattern = _compile(key)
+        found = [pattern.findall(message.lower()) for message in chat.frame['message']] if pattern else []
+
+        rows = np.repeat(np.arange(len(found)), [len(matches) for matches in found])
+        ids = np.fromiter((positions[match] for matches in found for match in matches), dtype=np.int64, count=len(rows))
+        # Each keyword counts once per message, however often it repeats
+        pairs = np.unique(rows * len(positions) + ids)
+        rows, ids = pairs // max(len(positions), 1), pairs % max(len(positions), 1)
+
+        chat._cache[('keyword_hits', key)] = pd.DataFrame({
+            name: np.bincount(rows[membership[ids, column]], minlength=len(chat)).astype(np.int16)
+            for column, name in enumerate(names)
+        }, index=chat.frame.index)
+    return chat._cache[('keyword_hits', key)]
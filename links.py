@@ -0,0 +1,47 @@
+"""Link detection for chat messages.
+
+``URLExtract.find_urls`` is slow per call, and calling it on every message
+dominated the statistics on large chats. Detection now runs in two stages: a
+vectorized regex prefilter keeps only messages that could hold a link (a
+"://" or a dot followed by a word character, as in "example.com",
+"192.168.1.1" or "site.рф"), and URLExtract runs once per distinct candidate
+text. Results are stored on the chat frame as ``has_link`` and
+``link_count`` columns.
+"""
+import numpy as np
+import pandas as pd
+from urlextract import URLExtract
+
+from chat_index import ChatIndex
+
+extract = URLExtract()
+
+# Anything URLExtract can match contains one of these
+LINK_HINT_PATTERN = r'://|\.\w'
+
+
+def count_links(messages):
+    """Number of links in each message, as an int32 array."""
+    messages = pd.Series(messages, dtype=object)
+    counts = np.zeros(len(messages), dtype=np.int32)
+
+    candidates = messages.str.contains(LINK_HINT_PATTERN, regex=True).to_numpy(dtype=bool)
+    if candidates.any():
+        codes, uniques = pd.factorize(messages[candidates])
+        found = np.array([len(extract.find_urls(text)) for text in uniques], dtype=np.int32)
+        counts[candidates] = found[codes]
+    return counts
+
+
+def add_links(df):
+    """Add ``has_link`` and ``link_count`` columns to a chat frame, once.
+
+    Accepts a ``ChatIndex`` or a DataFrame and returns the frame, which is
+    updated in place so later analyses of the same chat reuse the counts.
+    """
+    frame = ChatIndex.of(df).frame
+    if 'link_count' not in frame:
+        counts = count_links(frame['message'])
+        frame['link_count'] = counts
+        frame['has_link'] = counts > 0
+    return frame
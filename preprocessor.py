@@ -1,51 +1,289 @@
+import io
 import re
+import codecs
+from itertools import islice
 import pandas as pd
+from emojis import count_emojis
+
+# Header layouts as "{date}"/"{time}" templates, with the characters a header can
+# start with: Android "31/12/21, 23:59 - " and iOS "[31/12/2021, 23:59:59] "
+HEADER_LAYOUTS = [
+    ('android', r'{date},\s{time}\s-\s', r'\d'),
+    ('ios', r'\u200e?\[{date},\s{time}\]\s', r'\[\u200e'),
+]
+
+# Date shapes and the strptime formats they can stand for, most common first
+DATE_STYLES = [
+    (r'\d{1,2}/\d{1,2}/\d{2}', ['%d/%m/%y', '%m/%d/%y']),
+    (r'\d{1,2}/\d{1,2}/\d{4}', ['%d/%m/%Y', '%m/%d/%Y']),
+    (r'\d{1,2}\.\d{1,2}\.\d{2}', ['%d.%m.%y']),
+    (r'\d{1,2}\.\d{1,2}\.\d{4}', ['%d.%m.%Y']),
+]
+
+# Clock shapes; 12-hour markers ("pm", "PM", "p.m.", also after a narrow no-break
+# space) are normalised before parsing
+TIME_STYLES = [
+    (r'\d{1,2}:\d{2}', '%H:%M'),
+    (r'\d{1,2}:\d{2}:\d{2}', '%H:%M:%S'),
+    (r'\d{1,2}:\d{2}\s?[AaPp]\.?\s?[Mm]\.?', '%I:%M %p'),
+    (r'\d{1,2}:\d{2}:\d{2}\s?[AaPp]\.?\s?[Mm]\.?', '%I:%M:%S %p'),
+]
+
+AM_PM_PATTERN = re.compile(r'\s*([AaPp])\.?\s?([Mm])\.?$')
+
+# Lines inspected by sniff_format when choosing a format
+SNIFF_LINES = 200
+
+
+class DateOrderChanged(ValueError):
+    """A streamed batch needs another date order than the batches before it.
+
+    ``chat_format`` is the format to parse the whole export with instead.
+    """
+
+    def __init__(self, chat_format):
+        super().__init__(f"Dates only parse as {chat_format['format']!r} after the first messages")
+        self.chat_format = chat_format
+
+
+def _chat_format(layout, date_style, time_style):
+    name, template, lead = layout
+    date_regex, date_formats = date_style
+    time_regex, time_format = time_style
+
+    header = template.format(date=f'(?P<date>{date_regex})', time=f'(?P<time>{time_regex})')
+    boundary = template.format(date=date_regex, time=time_regex)
+
+    # One pass over the export pulls out every field of every message. The author
+    # is the text up to the first ": " on the header line; a message without one
+    # is a group notification. The body runs until the next header or end of
+    # text, and only characters a header can start with are checked.
+    pattern = re.compile(
+        header
+        + r'(?:(?P<author>[^\n]+?):\s)?'
+        + rf'(?P<body>[^{lead}]*(?:(?!{boundary})[{lead}][^{lead}]*)*)'
+    )
+
+    return {
+        'layout': name,
+        'header': re.compile(header),
+        'pattern': pattern,
+        'formats': [f'{date_format}, {time_format}' for date_format in date_formats],
+    }
+
+
+CHAT_FORMATS = [
+    _chat_format(layout, date_style, time_style)
+    for layout in HEADER_LAYOUTS
+    for date_style in DATE_STYLES
+    for time_style in TIME_STYLES
+]
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+PERIOD_LABELS = ['00-1'] + [f"{hour}-{hour + 1}" for hour in range(1, 23)] + ['23-00']
+
+# Read size for streaming parsing; peak memory scales with this, not the file size
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Longest possible date header, kept around while scanning for the first message
+_MAX_HEADER_LEN = 40
+
 
 def preprocess(data):
-    pattern = '\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s'
-
-    messages = re.split(pattern, data)[1:]
-    dates = re.findall(pattern, data)
-
-    df = pd.DataFrame({'user_message': messages, 'message_date': dates})
-    # convert message_date type
-    df['message_date'] = pd.to_datetime(df['message_date'], format='%d/%m/%y, %H:%M - ')
-
-    df.rename(columns={'message_date': 'date'}, inplace=True)
-
-    users = []
-    messages = []
-    for message in df['user_message']:
-        entry = re.split('([\w\W]+?):\s', message)
-        if entry[1:]:  # user name
-            users.append(entry[1])
-            messages.append(" ".join(entry[2:]))
-        else:
-            users.append('group_notification')
-            messages.append(entry[0])
-
-    df['user'] = users
-    df['message'] = messages
-    df.drop(columns=['user_message'], inplace=True)
-
-    df['only_date'] = df['date'].dt.date
-    df['year'] = df['date'].dt.year
-    df['month_num'] = df['date'].dt.month
-    df['month'] = df['date'].dt.month_name()
-    df['day'] = df['date'].dt.day
-    df['day_name'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['minute'] = df['date'].dt.minute
-
-    period = []
-    for hour in df[['day_name', 'hour']]['hour']:
-        if hour == 23:
-            period.append(str(hour) + "-" + str('00'))
-        elif hour == 0:
-            period.append(str('00') + "-" + str(hour + 1))
-        else:
-            period.append(str(hour) + "-" + str(hour + 1))
-
-    df['period'] = period
-
-    return df
\ No newline at end of file
+    chat_format = sniff_format(data)
+    records = [match.group('date', 'time', 'author', 'body') for match in chat_format['pattern'].finditer(data)]
+
+    df, date_format = _build_frame(records, chat_format)
+    df.attrs['date_format'] = date_format
+    return df
+
+
+def sniff_format(text, sample_lines=SNIFF_LINES):
+    """Detect the timestamp format of a chat export from its first lines.
+
+    The header layout is the one matching the most sampled lines; among the
+    date orders it allows, the first that parses every sampled timestamp in
+    chronological order wins; the other orders stay available in ``formats``
+    for a batch the sampled lines could not settle. Raises ``ValueError`` for
+    unsupported exports.
+    """
+    lines = list(islice(io.StringIO(text), sample_lines))
+
+    best, best_matches = None, []
+    for candidate in CHAT_FORMATS:
+        matches = [match for match in map(candidate['header'].match, lines) if match]
+        if len(matches) > len(best_matches):
+            best, best_matches = candidate, matches
+
+    if best is None:
+        raise ValueError("No messages found: the chat export's date format is not supported")
+
+    dates = pd.Series([match.group('date') for match in best_matches])
+    times = pd.Series([match.group('time') for match in best_matches])
+
+    parsed_formats = []
+    for date_format in best['formats']:
+        stamps = pd.to_datetime(dates + ', ' + _normalize_times(times, date_format), format=date_format, errors='coerce')
+        if stamps.notna().all():
+            parsed_formats.append((stamps.is_monotonic_increasing, date_format))
+
+    if not parsed_formats:
+        raise ValueError("No messages found: the chat export's dates could not be parsed")
+
+    # Prefer a reading of the dates that keeps the messages in order
+    date_format = next((fmt for in_order, fmt in parsed_formats if in_order), parsed_formats[0][1])
+    formats = [date_format] + [fmt for fmt in best['formats'] if fmt != date_format]
+    return {'layout': best['layout'], 'pattern': best['pattern'], 'format': date_format, 'formats': formats}
+
+
+def preprocess_stream(stream, chunk_size=CHUNK_SIZE, chat_format=None):
+    """Parse a chat export from a file-like object, yielding DataFrame batches.
+
+    The stream is read ``chunk_size`` units at a time (bytes are decoded as
+    UTF-8 incrementally), so memory is bounded by the chunk size rather than
+    the size of the export. A message that straddles a chunk boundary is held
+    back until the header of the following message has been seen. Unless
+    ``chat_format`` is given, it is sniffed from the first lines.
+
+    A sniffed date order that a later batch cannot parse is swapped for the
+    one that does while nothing has been yielded yet; after that, or when
+    ``chat_format`` was given, ``DateOrderChanged`` is raised instead. Each
+    batch records the date format it was parsed with in ``attrs['date_format']``.
+    """
+    carry = ''
+    fixed = chat_format is not None
+    yielded = False
+
+    def build(records):
+        nonlocal chat_format
+        df, date_format = _build_frame(records, chat_format)
+        if date_format != chat_format['format']:
+            chat_format = dict(chat_format, format=date_format)
+            if fixed or yielded:
+                raise DateOrderChanged(chat_format)
+        df.attrs['date_format'] = date_format
+        return df
+
+    for text in _iter_text(stream, chunk_size):
+        buffer = carry + text
+
+        if chat_format is None:
+            if buffer.count('\n') < SNIFF_LINES:
+                carry = buffer
+                continue
+            chat_format = sniff_format(buffer)
+
+        matches = list(chat_format['pattern'].finditer(buffer))
+
+        if not matches:
+            # No header yet: keep only enough text to complete one split across chunks
+            carry = buffer[-_MAX_HEADER_LEN:]
+            continue
+
+        # The last message may continue in the next chunk
+        carry = buffer[matches[-1].start():]
+
+        if len(matches) > 1:
+            df = build([match.group('date', 'time', 'author', 'body') for match in matches[:-1]])
+            yielded = True
+            yield df
+
+    if chat_format is None:
+        chat_format = sniff_format(carry)
+
+    records = [match.group('date', 'time', 'author', 'body') for match in chat_format['pattern'].finditer(carry)]
+    if records:
+        yield build(records)
+
+
+def preprocess_file(stream, chunk_size=CHUNK_SIZE, chat_format=None):
+    """Parse a whole chat export from a file-like object in bounded-size chunks.
+
+    If a late message shows the dates' real order, the export is read again
+    from the start with it. The date format the export was read with is kept
+    in ``attrs['date_format']``.
+    """
+    try:
+        batches = list(preprocess_stream(stream, chunk_size, chat_format))
+    except DateOrderChanged as e:
+        if not stream.seekable():
+            raise
+        stream.seek(0)
+        batches = list(preprocess_stream(stream, chunk_size, e.chat_format))
+    if not batches:
+        raise ValueError("No messages found in the chat export")
+    df = pd.concat(batches, ignore_index=True)
+    df.attrs['date_format'] = batches[-1].attrs['date_format']
+    return df
+
+
+def _normalize_times(times, date_format):
+    if '%p' not in date_format:
+        return times
+    return times.str.replace(AM_PM_PATTERN, r' \1\2', regex=True)
+
+
+def _iter_text(stream, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _add_derived_columns(df):
+    """Add calendar columns as compact integers and ordered categoricals."""
+    dates = df['date']
+
+    df['only_date'] = dates.dt.normalize()
+    df['year'] = dates.dt.year.astype('int16')
+    df['month_num'] = dates.dt.month.astype('int8')
+    df['month'] = pd.Categorical.from_codes(df['month_num'] - 1, categories=MONTH_NAMES, ordered=True)
+    df['day'] = dates.dt.day.astype('int8')
+    df['day_name'] = pd.Categorical.from_codes(dates.dt.dayofweek, categories=DAY_NAMES, ordered=True)
+    df['hour'] = dates.dt.hour.astype('int8')
+    df['minute'] = dates.dt.minute.astype('int8')
+    # Hour-of-day buckets such as "14-15"; the hour is the category code
+    df['period'] = pd.Categorical.from_codes(df['hour'], categories=PERIOD_LABELS, ordered=True)
+
+    return df
+
+
+def _parse_dates(raw, chat_format):
+    """Convert a batch's timestamps, returning them with the format that parsed them.
+
+    The sniffed format is tried first. A batch it cannot parse, e.g. a
+    month-first export whose sampled days were all 12 or less, is tried with
+    the other date orders of the same style.
+    """
+    error = None
+    others = [fmt for fmt in chat_format.get('formats', []) if fmt != chat_format['format']]
+    for date_format in [chat_format['format']] + others:
+        try:
+            # one vectorized conversion per batch
+            times = _normalize_times(raw['time'], date_format)
+            return pd.to_datetime(raw['date'] + ', ' + times, format=date_format), date_format
+        except ValueError as e:
+            error = error or e
+    raise error
+
+
+def _build_frame(records, chat_format):
+    """Frame of parsed records, and the date format used for them."""
+    raw = pd.DataFrame.from_records(records, columns=['date', 'time', 'user', 'message'])
+    dates, date_format = _parse_dates(raw, chat_format)
+    df = pd.DataFrame({
+        'date': dates,
+        'user': raw['user'].fillna('group_notification').astype(str),
+        'message': raw['message'].astype(str),
+    })
+    df['emoji_count'] = count_emojis(df['message'])
+
+    return _add_derived_columns(df), date_format
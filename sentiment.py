@@ -0,0 +1,139 @@
+"""Sentiment scoring shared by every analysis.
+
+Each message used to be run through TextBlob separately by the sentiment,
+evolution, personality, insight and report helpers. Here every distinct
+message text is scored once (chats repeat "ok", "haha" and emoji-only
+messages constantly), scores are memoised across calls, and the results are
+stored on the chat frame as float32 ``polarity`` and ``subjectivity`` columns
+plus a ``sentiment`` label column that all consumers read.
+
+Large chats can be scored on a process pool: distinct texts are split into
+chunks, scored by ``SENTIMENT_WORKERS`` processes and merged back in order, so
+the result is the same as scoring in-process. Workers are spawned rather than
+forked, since forking the multi-threaded Streamlit server can deadlock.
+
+Scoring engines are pluggable through ``BACKENDS``: ``textblob`` (the default,
+most faithful) and ``lexicon`` (``sentiment_lexicon``, much faster and aware of
+Hinglish and emoji). ``SENTIMENT_BACKEND`` picks one per deployment.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+
+from chat_index import ChatIndex
+import sentiment_lexicon
+
+# Polarity above/below which a message is Positive/Negative rather than Neutral
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+# Engine used when none is passed: 'textblob' or 'lexicon'
+SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'textblob')
+
+# Distinct texts remembered between calls; the memo is dropped when it fills up
+MEMO_SIZE = 500_000
+
+# Worker processes for scoring; 1 scores in-process. Each worker holds its own
+# copy of the scoring engine, so the default stays small on many-core hosts
+SENTIMENT_WORKERS = int(os.environ.get('SENTIMENT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Fewer new texts than this are scored in-process, where pool startup would dominate
+PARALLEL_MIN_TEXTS = 20_000
+
+# Chunks handed out per worker, so uneven chunks still balance
+CHUNKS_PER_WORKER = 4
+
+# Memoised scores per backend, keyed by message text
+_memos = {}
+
+
+def score_text(text):
+    """(polarity, subjectivity) of one message with TextBlob; unreadable text scores 0."""
+    try:
+        sentiment = TextBlob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
+    except Exception:
+        return 0.0, 0.0
+
+
+def score_textblob(texts):
+    return [score_text(text) for text in texts]
+
+
+def score_lexicon(texts):
+    return [tuple(scores) for scores in sentiment_lexicon.score_texts(texts).tolist()]
+
+
+# Each backend maps a list of texts to a list of (polarity, subjectivity) pairs
+BACKENDS = {
+    'textblob': score_textblob,
+    'lexicon': score_lexicon,
+}
+
+
+def score_many(texts, workers=None, backend=None):
+    """Score a list of texts, on a process pool when it is worth it.
+
+    Results are in the order of ``texts`` whatever the number of workers.
+    """
+    score = BACKENDS[backend or SENTIMENT_BACKEND]
+    workers = SENTIMENT_WORKERS if workers is None else workers
+    if workers <= 1 or len(texts) < PARALLEL_MIN_TEXTS:
+        return score(texts)
+
+    chunk_size = -(-len(texts) // (workers * CHUNKS_PER_WORKER))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # map yields chunk results in submission order
+        return [scores for chunk in executor.map(score, chunks) for scores in chunk]
+
+
+def score_texts(texts, workers=None, backend=None):
+    """Score a sequence of messages, running the backend once per distinct text.
+
+    Returns float32 ``polarity`` and ``subjectivity`` arrays aligned with
+    ``texts`` and their labels. Labels come from the full-precision scores,
+    so rounding to float32 never moves a message across a threshold.
+    """
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object), use_na_sentinel=False)
+
+    backend = backend or SENTIMENT_BACKEND
+    memo = _memos.setdefault(backend, {})
+    missing = [text for text in uniques if text not in memo]
+    if len(memo) + len(missing) > MEMO_SIZE:
+        memo.clear()
+    memo.update(zip(missing, score_many(missing, workers, backend)))
+
+    scores = np.array([memo[text] for text in uniques], dtype=np.float64).reshape(-1, 2)
+    labels = sentiment_labels(scores[:, 0])
+    scores = scores.astype(np.float32)
+    return scores[codes, 0], scores[codes, 1], labels[codes]
+
+
+def add_sentiment(df, workers=None, backend=None):
+    """Add ``polarity``, ``subjectivity`` and ``sentiment`` columns to a chat frame, once.
+
+    Accepts a ``ChatIndex`` or a DataFrame and returns the frame, which is
+    updated in place so later analyses of the same chat reuse the scores.
+    ``workers`` and ``backend`` override ``SENTIMENT_WORKERS`` and
+    ``SENTIMENT_BACKEND``; scores from another backend are replaced.
+    """
+    frame = ChatIndex.of(df).frame
+    backend = backend or SENTIMENT_BACKEND
+    if 'polarity' not in frame or frame.attrs.get('sentiment_backend') != backend:
+        polarity, subjectivity, labels = score_texts(frame['message'], workers, backend)
+        frame['polarity'] = polarity
+        frame['subjectivity'] = subjectivity
+        frame['sentiment'] = labels
+        frame.attrs['sentiment_backend'] = backend
+    return frame
+
+
+def sentiment_labels(polarity):
+    """Positive / Neutral / Negative label for each polarity score."""
+    return np.select([polarity > POSITIVE_THRESHOLD, polarity < NEGATIVE_THRESHOLD],
+                     ['Positive', 'Negative'], default='Neutral').astype(object)
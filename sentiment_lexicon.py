@@ -0,0 +1,129 @@
+"""Lexicon-based sentiment scoring, a fast alternative to TextBlob.
+
+TextBlob builds a Blob, tokenizes and walks the pattern lexicon once per
+message. This engine tokenizes a whole batch of messages with one regex,
+explodes the tokens into a single column and looks every token up in one
+hash-map join, then applies pattern's rules for modifiers ("very good"),
+negations ("not good") and exclamation marks with shifted columns.
+
+The lexicon is pattern's English word list (the one TextBlob uses), minus the
+stop words in ``stop_hinglish.txt`` so filler words score neutral, plus a few
+common Hinglish words and an emoji and emoticon polarity table.
+"""
+import re
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from text_corpus import load_stop_words
+
+# Words that flip the polarity of the next scored word ("not good" is slightly bad)
+NEGATIONS = frozenset({'no', 'not', "n't", 'never', 'nahi', 'nahin', 'nai', 'mat', 'नहीं', 'मत'})
+
+# Polarity and subjectivity of common Hinglish words
+HINGLISH_WORDS = {
+    'accha': (0.5, 0.6), 'acha': (0.5, 0.6), 'achha': (0.5, 0.6), 'अच्छा': (0.5, 0.6),
+    'badhiya': (0.7, 0.7), 'badiya': (0.7, 0.7), 'mast': (0.7, 0.7), 'zabardast': (0.8, 0.8),
+    'shukriya': (0.5, 0.5), 'dhanyavad': (0.5, 0.5), 'pyaar': (0.6, 0.7), 'pyar': (0.6, 0.7),
+    'khush': (0.7, 0.8), 'sahi': (0.4, 0.5), 'theek': (0.2, 0.4), 'thik': (0.2, 0.4), 'ठीक': (0.2, 0.4),
+    'bekar': (-0.6, 0.7), 'bakwas': (-0.7, 0.8), 'bura': (-0.6, 0.7), 'बुरा': (-0.6, 0.7),
+    'ganda': (-0.6, 0.7), 'gussa': (-0.6, 0.8), 'dukh': (-0.6, 0.8), 'pagal': (-0.3, 0.7),
+}
+
+# Polarity of emoji and emoticons; they count as fully subjective
+EMOJI_POLARITY = {
+    '😀': 0.8, '😃': 0.8, '😄': 0.8, '😁': 0.8, '😆': 0.7, '😂': 0.6, '🤣': 0.6, '😊': 0.8,
+    '🙂': 0.4, '😉': 0.4, '😍': 0.9, '🥰': 0.9, '😘': 0.7, '😎': 0.5, '🤗': 0.6, '🥳': 0.9,
+    '❤': 0.8, '💕': 0.8, '💖': 0.8, '💯': 0.6, '👍': 0.5, '👏': 0.6, '🙏': 0.4, '🎉': 0.8,
+    '🔥': 0.5, '✨': 0.4, '😐': 0.0, '🤔': 0.0, '😕': -0.3, '🙄': -0.4, '😒': -0.5, '😔': -0.5,
+    '😞': -0.6, '😢': -0.6, '😭': -0.7, '😠': -0.8, '😡': -0.9, '🤬': -0.9, '💔': -0.8, '👎': -0.5,
+    '😤': -0.5, '😩': -0.6, '😫': -0.6, '😱': -0.4, '🤮': -0.8,
+    ':)': 0.5, ':-)': 0.5, ':D': 1.0, ':-D': 1.0, ';)': 0.5, ':P': 0.4, '<3': 0.8,
+    ':(': -0.75, ':-(': -0.75, ":'(": -0.75, ':/': -0.25, '</3': -0.8,
+}
+
+# Links first, so "https://" does not read as ":/"; then emoticons, so ":)" is not
+# split into punctuation; then words; then any other single symbol (emoji, "!")
+_EMOTICONS = sorted((token for token in EMOJI_POLARITY if not token.isalpha() and len(token) > 1), key=len, reverse=True)
+TOKEN_RE = re.compile(r'\w+://\S+|www\.\S+|' + '|'.join(map(re.escape, _EMOTICONS)) + r"|[\w\u0900-\u097f']+|[^\w\s]")
+
+
+@lru_cache(maxsize=1)
+def load_lexicon():
+    """Token lookup table: polarity, subjectivity, intensity and modifier/scored flags."""
+    from textblob.en import sentiment as pattern
+
+    stop_words = load_stop_words()
+
+    entries = {}
+    for word, senses in pattern.items():
+        polarity, subjectivity, intensity = senses[None]
+        modifier = any(tag in senses for tag in pattern.modifiers)
+        # Stop words keep their role as modifiers ("very good") but score nothing themselves
+        scored = word not in stop_words
+        entries[word] = (polarity, subjectivity, intensity, modifier, scored)
+    for word, (polarity, subjectivity) in HINGLISH_WORDS.items():
+        entries[word] = (polarity, subjectivity, 1.0, False, True)
+    for token, polarity in EMOJI_POLARITY.items():
+        entries[token.lower()] = (polarity, 1.0, 1.0, False, True)
+
+    return pd.DataFrame.from_dict(entries, orient='index',
+                                  columns=['polarity', 'subjectivity', 'intensity', 'modifier', 'scored'])
+
+
+def score_texts(texts):
+    """Score a batch of texts; returns a float64 ``(n, 2)`` array of polarity and subjectivity."""
+    lexicon = load_lexicon()
+    scores = np.zeros((len(texts), 2))
+
+    token_lists = [TOKEN_RE.findall(text.lower()) for text in texts]
+    rows = np.repeat(np.arange(len(texts)), [len(tokens) for tokens in token_lists])
+    if len(rows) == 0:
+        return scores
+
+    # Look each distinct token up once, then broadcast to every occurrence
+    codes, vocabulary = pd.factorize(np.fromiter(chain.from_iterable(token_lists), dtype=object, count=len(rows)))
+    table = lexicon.reindex(vocabulary)
+    known = table['polarity'].notna().to_numpy()[codes]
+    polarity = table['polarity'].to_numpy(dtype=float)[codes]
+    subjectivity = table['subjectivity'].to_numpy(dtype=float)[codes]
+    intensity = table['intensity'].to_numpy(dtype=float)[codes]
+    modifier = table['modifier'].fillna(False).to_numpy(dtype=bool)[codes]
+    scored = table['scored'].fillna(False).to_numpy(dtype=bool)[codes]
+    negation = np.isin(vocabulary, list(NEGATIONS))[codes]
+    exclamation = (vocabulary == '!')[codes]
+
+    # Each token's predecessor in the same message
+    same_row = np.zeros(len(rows), dtype=bool)
+    same_row[1:] = rows[1:] == rows[:-1]
+    prev_modifier = np.zeros(len(rows), dtype=bool)
+    prev_modifier[1:] = known[:-1] & modifier[:-1]
+    prev_modifier &= same_row
+    prev_negation = np.zeros(len(rows), dtype=bool)
+    prev_negation[1:] = negation[:-1]
+    prev_negation &= same_row
+    next_exclamation = np.zeros(len(rows), dtype=bool)
+    next_exclamation[:-1] = exclamation[1:] & same_row[1:]
+
+    # "very good": the modifier scales the word and is not scored on its own
+    boosted = known & prev_modifier
+    prev_intensity = np.ones(len(rows))
+    prev_intensity[1:] = intensity[:-1]
+    polarity = np.where(boosted, np.clip(polarity * prev_intensity, -1.0, 1.0), polarity)
+    subjectivity = np.where(boosted, np.clip(subjectivity * prev_intensity, -1.0, 1.0), subjectivity)
+    absorbed = np.zeros(len(rows), dtype=bool)
+    absorbed[:-1] = boosted[1:]
+
+    # "good!" is a little more positive, "not good" is slightly bad
+    polarity = np.where(known & next_exclamation, np.clip(polarity * 1.25, -1.0, 1.0), polarity)
+    polarity = np.where(known & prev_negation, polarity * -0.5, polarity)
+
+    assessed = known & (scored | boosted) & ~absorbed
+    counts = np.bincount(rows[assessed], minlength=len(texts))
+    totals = np.stack([
+        np.bincount(rows[assessed], weights=polarity[assessed], minlength=len(texts)),
+        np.bincount(rows[assessed], weights=subjectivity[assessed], minlength=len(texts)),
+    ], axis=1)
+    return np.divide(totals, counts[:, None], out=scores, where=counts[:, None] > 0)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+import preprocessor
+from benchmark import synthetic_chat
+from enhanced_helper_2 import activity_matrix, group_activity_correlation
+
+
+@pytest.fixture(scope='module')
+def chat():
+    return preprocessor.preprocess(synthetic_chat(3000))
+
+
+@pytest.mark.parametrize('freq', ['15min', 'hour', 'day'])
+def test_correlation_matches_dense_corrcoef(chat, freq):
+    activity = activity_matrix(chat, freq)
+    dense = activity['counts'].toarray()
+    assert dense.shape == (len(activity['bins']), len(activity['users']))
+    assert dense.sum() == len(chat[(chat['user'] != 'group_notification') & (chat['message'] != '<Media omitted>\n')])
+
+    expected = np.corrcoef(dense, rowvar=False)
+    pairs = group_activity_correlation(chat, freq, threshold=0)
+    users = list(activity['users'])
+    for row in pairs.itertuples():
+        assert row.correlation == pytest.approx(expected[users.index(row.user1), users.index(row.user2)], abs=1e-12)
+    assert len(pairs) == len(users) * (len(users) - 1) // 2
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pandas as pd
+
+import analysis_graph
+import enhanced_helper_1
+import preprocessor
+from analysis_graph import ANALYSES, run_analyses, result
+from chat_index import ChatIndex
+
+CHAT = """12/01/21, 10:00 - Alice: good morning
+12/01/21, 10:01 - Bob: morning! great day
+12/01/21, 10:05 - Alice: terrible traffic though
+12/01/21, 10:07 - Carol: see example.com
+"""
+
+
+def test_results_match_direct_calls():
+    chat = ChatIndex(preprocessor.preprocess(CHAT))
+    run = run_analyses(chat, 'Alice', ['fetch_stats', 'sentiment_analysis'])
+
+    reference = ChatIndex(preprocessor.preprocess(CHAT))
+    assert result(run, 'fetch_stats') == enhanced_helper_1.fetch_stats('Alice', reference)
+    pd.testing.assert_frame_equal(result(run, 'sentiment_analysis'),
+                                  enhanced_helper_1.sentiment_analysis('Alice', reference))
+
+
+def test_dependents_of_a_failed_frame_writer_do_not_run(monkeypatch):
+    def fail(chat):
+        raise RuntimeError('scoring failed')
+
+    calls = []
+    monkeypatch.setitem(ANALYSES, 'sentiment', dict(ANALYSES['sentiment'], func=fail))
+    monkeypatch.setattr(enhanced_helper_1, 'add_sentiment', lambda *args: calls.append(args))
+
+    run = run_analyses(ChatIndex(preprocessor.preprocess(CHAT)), 'Overall',
+                       ['sentiment_timeline', 'generate_chat_insights'])
+
+    assert not calls
+    assert isinstance(run['errors']['sentiment_analysis'], RuntimeError)
+    assert isinstance(run['errors']['sentiment_timeline'], RuntimeError)
+    assert isinstance(run['errors']['generate_chat_insights'], RuntimeError)
+    assert 'response_time_analysis' in run['results']
+
+
+def test_results_are_kept_for_recent_users_only(monkeypatch):
+    monkeypatch.setattr(analysis_graph, 'ANALYSIS_USERS', 2)
+    chat = ChatIndex(preprocessor.preprocess(CHAT))
+    for user in ['Alice', 'Bob', 'Carol']:
+        run_analyses(chat, user, ['daily_timeline', 'most_busy_users'])
+
+    users = {user for _, user in chat._cache['analyses']}
+    assert users == {None, 'Bob', 'Carol'}
+
+
+
+def test_sessions_sharing_an_index_run_one_at_a_time(monkeypatch):
+    # One kept user: every run drops the other sessions' results
+    monkeypatch.setattr(analysis_graph, 'ANALYSIS_USERS', 1)
+    chat = ChatIndex(preprocessor.preprocess(CHAT))
+    active, overlaps = [], []
+
+    def fetch_stats(selected_user, df):
+        active.append(selected_user)
+        overlaps.append(len(active))
+        time.sleep(0.01)
+        active.remove(selected_user)
+        return enhanced_helper_1.fetch_stats(selected_user, df)
+    monkeypatch.setitem(ANALYSES, 'fetch_stats', dict(ANALYSES['fetch_stats'], func=fetch_stats))
+
+    runs = []
+
+    def session(user):
+        for _ in range(5):
+            runs.append(run_analyses(chat, user, ['sentiment_analysis', 'fetch_stats']))
+
+    threads = [threading.Thread(target=session, args=(user,)) for user in ['Alice', 'Bob', 'Carol']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 15 and not any(run['errors'] for run in runs)
+    assert max(overlaps) == 1
@@ -0,0 +1,91 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+import chat_append
+import chat_cache
+import preprocessor
+from analysis_graph import run_analyses
+from benchmark import synthetic_chat
+from chat_index import ChatIndex
+from enhanced_helper_2 import monthly_partials
+
+# Everything chat_append carries over, and the analyses that build it
+ARTIFACTS = ['sentiment', 'links', 'text_features', 'keyword_hits', 'emoji_table', 'corpus', 'term_index']
+USERS = ['Overall', 'Alice']
+
+
+def warm(chat):
+    run_analyses(chat, 'Overall', ARTIFACTS)
+    for user in USERS:
+        monthly_partials(chat, user)
+    return chat
+
+
+def assert_same(extended, fresh, path=()):
+    if isinstance(fresh, dict):
+        assert extended.keys() == fresh.keys(), path
+        for key in fresh:
+            assert_same(extended[key], fresh[key], path + (key,))
+    elif isinstance(fresh, pd.DataFrame):
+        pd.testing.assert_frame_equal(extended, fresh, obj=str(path))
+    elif isinstance(fresh, pd.Index):
+        pd.testing.assert_index_equal(extended, fresh, obj=str(path))
+    elif sparse.issparse(fresh):
+        assert extended.shape == fresh.shape and (extended != fresh).nnz == 0, path
+    else:
+        np.testing.assert_array_equal(extended, fresh, err_msg=str(path))
+
+
+def split_export(text, new_messages):
+    """An export and a shorter earlier export of it, cut before its last ``new_messages`` messages."""
+    starts = [match.start() for match in preprocessor.sniff_format(text)['pattern'].finditer(text)]
+    return text[:starts[-new_messages]].encode('utf-8'), text.encode('utf-8')
+
+
+def extend_and_compare(old, new, cache_dir):
+    base = chat_cache.load_chat(io.BytesIO(old), cache_dir=cache_dir)
+    chat = warm(chat_append.index_chat(base, key=chat_cache.chat_key(io.BytesIO(old))))
+
+    appended = chat_cache.load_chat(io.BytesIO(new), cache_dir=cache_dir)
+    assert appended.attrs['appended_to']['rows'] == len(chat)
+    extended = chat_append.index_chat(appended, key=chat_cache.chat_key(io.BytesIO(new)))
+
+    fresh = warm(ChatIndex(preprocessor.preprocess_file(io.BytesIO(new))))
+    carried = {key for key in extended._cache if key in chat._cache}
+    assert {key if isinstance(key, str) else key[0] for key in carried} >= \
+        {'text_features', 'keyword_hits', 'emoji_table', 'corpus', 'term_index', 'monthly_partials'}
+
+    pd.testing.assert_frame_equal(extended.frame, fresh.frame)
+    for key in carried:
+        assert_same(extended._cache[key], fresh._cache[key], (key,))
+    # Carried data is reused, not rebuilt, by later analyses
+    warm(extended)
+    for key in carried:
+        assert_same(extended._cache[key], fresh._cache[key], (key,))
+    return extended
+
+
+@pytest.fixture(autouse=True)
+def no_recent_indexes(monkeypatch):
+    monkeypatch.setattr(chat_append, '_recent', {})
+
+
+@pytest.mark.parametrize('new_messages', [1, 300])
+def test_extended_index_matches_a_fresh_one(tmp_path, new_messages):
+    old, new = split_export(synthetic_chat(3000), new_messages)
+    extend_and_compare(old, new, str(tmp_path))
+
+
+def test_extended_month_first_chat_matches_a_fresh_one(tmp_path):
+    # Early days all fit either date order; only 1/13/24 shows dates are month-first
+    lines = [f"1/1/24, 10:{i % 60:02d} - {'Alice' if i % 2 else 'Bob'}: hello 😀 {i}" for i in range(300)]
+    lines += ["1/13/24, 09:00 - Alice: later see example.com", "2/28/24, 09:00 - Bob: last old"]
+    lines += [f"3/{day}/24, 09:00 - Alice: great news {day}" for day in range(5, 13)]
+    old, new = split_export('\n'.join(lines) + '\n', 8)
+
+    extended = extend_and_compare(old, new, str(tmp_path))
+    assert extended.frame['date'].iloc[-1] == pd.Timestamp('2024-03-12 09:00')
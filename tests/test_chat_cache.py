@@ -0,0 +1,88 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import chat_cache
+import preprocessor
+
+
+def export(n_messages, start=0):
+    lines = [f"12/01/21, {10 + i // 60}:{i % 60:02d} - {'Alice' if i % 2 else 'Bob'}: message {i}"
+             for i in range(start, start + n_messages)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def test_cache_hit_returns_the_parsed_frame(tmp_path, monkeypatch):
+    data = export(50)
+    first = chat_cache.load_chat(io.BytesIO(data), cache_dir=str(tmp_path))
+
+    monkeypatch.setattr(preprocessor, 'preprocess_file', lambda *args, **kwargs: pytest.fail('parsed again'))
+    second = chat_cache.load_chat(io.BytesIO(data), cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_newer_export_is_appended_to_the_cached_one(tmp_path):
+    old, new = export(50), export(50) + export(30, start=50)
+    chat_cache.load_chat(io.BytesIO(old), cache_dir=str(tmp_path))
+
+    appended = chat_cache.load_chat(io.BytesIO(new), cache_dir=str(tmp_path))
+
+    assert appended.attrs['appended_to']['rows'] == 50
+    pd.testing.assert_frame_equal(appended, preprocessor.preprocess_file(io.BytesIO(new)))
+
+
+def test_eviction_removes_oldest_entries_and_their_lineage(tmp_path):
+    for key, age in [('old', 200), ('new', 100)]:
+        path = tmp_path / f'{key}.arrow'
+        path.write_bytes(b'x' * 700_000)
+        os.utime(path, (os.path.getmtime(path) - age,) * 2)
+        (tmp_path / f'{key}-chat.lineage.json').write_text(f'{{"key": "{key}"}}')
+    (tmp_path / 'orphan.lineage.json').write_text('{"key": "gone"}')
+
+    chat_cache.evict(str(tmp_path), size_mb=1)
+
+    assert sorted(os.listdir(tmp_path)) == ['new-chat.lineage.json', 'new.arrow']
+
+
+def test_cache_write_failures_do_not_fail_the_upload(tmp_path):
+    # A regular file where the cache directory should be: every write fails
+    blocked = tmp_path / 'not-a-directory'
+    blocked.write_text('')
+
+    df = chat_cache.load_chat(io.BytesIO(export(50)), cache_dir=str(blocked))
+
+    assert len(df) == 50
+
+
+def test_entry_evicted_after_reading_is_still_returned(tmp_path, monkeypatch):
+    data = export(50)
+    chat_cache.load_chat(io.BytesIO(data), cache_dir=str(tmp_path))
+
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, 'utime', evicted)
+
+    assert len(chat_cache.load_cached(chat_cache.chat_key(io.BytesIO(data)), str(tmp_path))) == 50
+
+
+def month_first_export(new_days=()):
+    # The first 300 messages fit either date order; 1/13/24 only parses month-first
+    lines = [f"1/1/24, 10:{i % 60:02d} - {'Alice' if i % 2 else 'Bob'}: hello {i}" for i in range(300)]
+    lines += ["1/13/24, 09:00 - Alice: later", "2/28/24, 09:00 - Bob: last old"]
+    lines += [f"3/{day}/24, 09:00 - Alice: new {day}" for day in new_days]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def test_appended_messages_keep_the_stored_date_order(tmp_path):
+    base = chat_cache.load_chat(io.BytesIO(month_first_export()), cache_dir=str(tmp_path))
+    assert base.attrs['date_format'].startswith('%m/%d')
+
+    new = month_first_export(range(5, 13))
+    appended = chat_cache.load_chat(io.BytesIO(new), cache_dir=str(tmp_path))
+
+    assert appended.attrs['appended_to']['rows'] == len(base)
+    pd.testing.assert_frame_equal(appended, preprocessor.preprocess_file(io.BytesIO(new)))
+    assert appended['date'].iloc[-1] == pd.Timestamp('2024-03-12 09:00')
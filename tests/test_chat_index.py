@@ -0,0 +1,45 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocessor
+from benchmark import synthetic_chat
+from chat_index import MEDIA_MESSAGE, NOTIFICATION_USER, ChatIndex
+
+
+@pytest.fixture(scope='module')
+def chat():
+    df = preprocessor.preprocess(synthetic_chat(3000))
+    # Out of date order, with index labels that are not positions
+    df = df.take(np.random.default_rng(0).permutation(len(df))[:2500])
+    return df.set_axis(df.index * 3 + 7)
+
+
+def masked(df, selected_user, notifications, media, by_date):
+    temp = df if selected_user == 'Overall' else df[df['user'] == selected_user]
+    if not notifications:
+        temp = temp[temp['user'] != NOTIFICATION_USER]
+    if not media:
+        temp = temp[temp['message'] != MEDIA_MESSAGE]
+    return temp.sort_values('date', kind='stable') if by_date else temp
+
+
+@pytest.mark.parametrize('notifications, media, by_date', itertools.product([True, False], repeat=3))
+def test_select_matches_boolean_masks(chat, notifications, media, by_date):
+    index = ChatIndex(chat)
+    for user in ['Overall', *chat['user'].unique()]:
+        expected = masked(chat, user, notifications, media, by_date)
+        pd.testing.assert_frame_equal(index.select(user, notifications, media, by_date), expected)
+        assert index.rows(user, notifications, media, by_date).tolist() == chat.index.get_indexer(expected.index).tolist()
+
+
+def test_unknown_user_selects_nothing(chat):
+    assert len(ChatIndex(chat).select('nobody', notifications=False, media=False)) == 0
+
+
+def test_anonymised_frame_uses_media_flag(chat):
+    anonymous = chat.drop(columns='message').assign(has_media=chat['message'] == MEDIA_MESSAGE)
+    rows = ChatIndex(anonymous).rows(media=False)
+    assert rows.tolist() == np.flatnonzero(chat['message'].to_numpy() != MEDIA_MESSAGE).tolist()
@@ -0,0 +1,20 @@
+import emoji
+import pytest
+
+from emojis import EMOJI_PATTERN, find_emojis
+
+TEXTS = [
+    'hi 👍🏽',
+    '🏳️‍🌈 and 😀😀',
+    '1️⃣ 2 #️⃣ # * © ® ‼ 〰 ㊙ 中文 ー',
+    '👨‍👩‍👧‍👦👨‍👩',
+    'no emoji at all',
+    '',
+    ' '.join(emoji.EMOJI_DATA),
+    ''.join(emoji.EMOJI_DATA),
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_find_emojis_matches_the_full_pattern(text):
+    assert find_emojis(text) == EMOJI_PATTERN.findall(text)
@@ -0,0 +1,21 @@
+import pytest
+
+import preprocessor
+from benchmark import synthetic_chat
+from chat_index import ChatIndex
+from enhanced_helper_1 import fetch_stats
+
+
+@pytest.fixture(scope='module')
+def chat():
+    return preprocessor.preprocess(synthetic_chat(2000) + "12/01/21, 10:00 - Alice: tabs\tand spaces  \n  twice\n")
+
+
+@pytest.mark.parametrize('user', ['Overall', 'Alice'])
+def test_stats_match_counting_each_message(chat, user):
+    selected = chat if user == 'Overall' else chat[chat['user'] == user]
+    num_messages, num_words, num_media, _ = fetch_stats(user, ChatIndex(chat))
+
+    assert num_messages == len(selected)
+    assert num_words == sum(len(message.split()) for message in selected['message'])
+    assert num_media == (selected['message'] == '<Media omitted>\n').sum()
@@ -0,0 +1,25 @@
+import pytest
+
+import preprocessor
+from enhanced_helper_2 import identify_group_roles
+
+CHATS = {
+    'notifications only': "12/01/2023, 10:00 - Messages and calls are end-to-end encrypted.\n",
+    'single user': "12/01/2023, 10:00 - Alice: hi\n12/01/2023, 10:05 - Alice: there?\n",
+    'media only': "12/01/2023, 10:00 - Alice: <Media omitted>\n12/01/2023, 10:01 - Bob: <Media omitted>\n",
+}
+
+
+@pytest.mark.parametrize('text', CHATS.values(), ids=CHATS.keys())
+def test_degenerate_chats_have_no_roles(text):
+    assert identify_group_roles(preprocessor.preprocess(text)) == {}
+
+
+def test_empty_frame_has_no_roles():
+    assert identify_group_roles(preprocessor.preprocess(CHATS['single user']).iloc[:0]) == {}
+
+
+def test_chat_without_replies_still_has_roles():
+    text = "12/01/2023, 10:00 - Alice: hi\n12/01/2023, 12:00 - Alice: x\n13/01/2023, 10:00 - Bob: hey\n"
+    roles = identify_group_roles(preprocessor.preprocess(text))
+    assert {user: role['stats']['responses_to_others'] for user, role in roles.items()} == {'Alice': 0, 'Bob': 0}
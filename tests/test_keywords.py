@@ -0,0 +1,30 @@
+import keywords
+import preprocessor
+
+CHAT = """12/01/21, 10:00 - Alice: happy birthday!
+12/01/21, 10:01 - Bob: the final decision is confirmed
+12/01/21, 10:05 - Alice: mission accomplished
+"""
+
+
+def test_keyword_dir_is_read_once(monkeypatch):
+    reads = []
+    monkeypatch.setattr(keywords, 'load_keyword_dir', lambda *args: reads.append(args) or {'travel': ['trip']})
+    keywords._default_key.cache_clear()
+    try:
+        for _ in range(3):
+            hits = keywords.keyword_hits(preprocessor.preprocess(CHAT))
+    finally:
+        keywords._default_key.cache_clear()
+
+    assert len(reads) == 1
+    assert list(hits.columns) == ['celebration', 'decision', 'emotional', 'important', 'travel']
+
+
+def test_keywords_match_whole_words_once_per_message():
+    hits = keywords.keyword_hits(preprocessor.preprocess(CHAT))
+
+    assert hits['celebration'].tolist() == [1, 0, 0]
+    assert hits['decision'].tolist() == [0, 3, 0]
+    # "happy" counts, "mission" does not contain the keyword "miss"
+    assert hits['emotional'].tolist() == [1, 0, 0]
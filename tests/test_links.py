@@ -0,0 +1,32 @@
+import pytest
+
+from links import count_links, extract
+
+MESSAGES = [
+    'see 192.168.1.1',
+    'site.Рф',
+    'https://example.com/a?b=1 and www.example.org',
+    'mail me at someone@example.com',
+    'two: example.com, example.net.',
+    'no link here. Really',
+    'version 1.2.3',
+    'ftp://files.example.com/x',
+    'ends with a dot.',
+    '<Media omitted>',
+    '',
+    'münchen.de ist schön',
+    'localhost:8080',
+]
+
+
+@pytest.mark.parametrize('message', MESSAGES)
+def test_link_counts_match_urlextract(message):
+    assert count_links([message])[0] == len(extract.find_urls(message))
+
+
+def test_link_counts_match_urlextract_on_a_chat():
+    from benchmark import synthetic_chat
+    import preprocessor
+
+    messages = preprocessor.preprocess(synthetic_chat(2000))['message'].tolist() + MESSAGES
+    assert count_links(messages).tolist() == [len(extract.find_urls(message)) for message in messages]
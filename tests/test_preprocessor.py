@@ -0,0 +1,63 @@
+import io
+
+import pandas as pd
+import pytest
+
+import preprocessor
+from emojis import count_emojis
+
+
+def us_export(n_early=250):
+    """A month-first export whose first messages all fall on days 12 or below."""
+    lines = [f"1/{5 + i // 100}/21, {10 + i % 100 // 60}:{i % 100 % 60:02d} - Alice: message {i}" for i in range(n_early)]
+    lines.append("1/13/21, 10:00 - Bob: a later day")
+    return '\n'.join(lines) + '\n'
+
+
+def test_us_dates_with_late_day_over_12():
+    df = preprocessor.preprocess(us_export())
+
+    assert df['date'].iloc[0] == pd.Timestamp('2021-01-05 10:00')
+    assert df['date'].iloc[-1] == pd.Timestamp('2021-01-13 10:00')
+    assert df['date'].is_monotonic_increasing
+
+
+@pytest.mark.parametrize('chunk_size', [512, 4096, preprocessor.CHUNK_SIZE])
+def test_streamed_us_dates_are_read_again_with_the_late_order(chunk_size):
+    text = us_export()
+    streamed = preprocessor.preprocess_file(io.BytesIO(text.encode('utf-8')), chunk_size=chunk_size)
+
+    assert streamed['date'].tolist() == preprocessor.preprocess(text)['date'].tolist()
+
+
+def test_given_format_is_not_switched_silently():
+    chat_format = preprocessor.sniff_format(us_export())
+    stream = io.StringIO(us_export())
+
+    with pytest.raises(preprocessor.DateOrderChanged) as raised:
+        list(preprocessor.preprocess_stream(stream, chat_format=chat_format))
+    assert raised.value.chat_format['format'] == '%m/%d/%y, %H:%M'
+
+
+def test_day_first_dates_stay_day_first():
+    text = "13/01/21, 10:00 - Alice: hi\n14/01/21, 10:05 - Bob: hello\n"
+    df = preprocessor.preprocess(text)
+
+    assert df['date'].dt.month.tolist() == [1, 1]
+
+
+@pytest.mark.parametrize('chunk_size', [256, 8192, preprocessor.CHUNK_SIZE])
+def test_streamed_parse_matches_one_shot(chunk_size):
+    from benchmark import synthetic_chat
+
+    text = synthetic_chat(2000)
+    streamed = preprocessor.preprocess_file(io.BytesIO(text.encode('utf-8')), chunk_size=chunk_size)
+
+    pd.testing.assert_frame_equal(streamed, preprocessor.preprocess(text))
+
+
+def test_emoji_counts_use_whole_sequences():
+    counts = count_emojis(['hi 👍🏽', '🏳️‍🌈 and 😀😀', 'none'])
+
+    assert counts.tolist() == [1, 3, 0]
+    assert counts.dtype == 'int16'
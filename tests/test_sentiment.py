@@ -0,0 +1,11 @@
+import sentiment
+
+TEXTS = ['great news!', 'this is terrible', 'ok', 'haha 😂', 'bahut accha yaar', ''] * 20
+
+
+def test_pool_scores_match_in_process(monkeypatch):
+    monkeypatch.setattr(sentiment, 'PARALLEL_MIN_TEXTS', 0)
+
+    for backend in sentiment.BACKENDS:
+        assert sentiment.score_many(TEXTS, workers=2, backend=backend) == \
+            sentiment.score_many(TEXTS, workers=1, backend=backend)
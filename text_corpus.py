@@ -0,0 +1,174 @@
+"""Normalised token stream of a chat, shared by the word analyses.
+
+The word cloud, top words, topics and keyword features used to reread
+``stop_hinglish.txt`` on every call and re-split every message. Here the stop
+list is loaded once into a frozenset, and each chat is tokenized once: words
+are lowercased, split on whitespace and stripped of surrounding punctuation,
+then stored as an int32 id per token with the row it came from and a shared
+vocabulary. The stream is cached on the chat's ``ChatIndex``.
+
+On top of the stream, ``term_index`` keeps sparse user x term and day x term
+count matrices, so the top words of any user or date range are a sparse row
+sum and an ``argpartition`` rather than a recount of the text.
+"""
+import os
+import string
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from chat_index import ChatIndex
+
+STOP_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stop_hinglish.txt')
+
+# Characters stripped from both ends of a word ("hello," -> "hello")
+STRIP_CHARS = string.punctuation
+
+
+@lru_cache(maxsize=None)
+def load_stop_words(path=STOP_WORDS_FILE):
+    """The stop list as a frozenset, read from disk once per process."""
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return frozenset(fh.read().split())
+    except FileNotFoundError:
+        return frozenset()
+
+
+def tokenize(messages):
+    """Normalised words of each message, as one flat list plus per-message counts."""
+    token_lists = [[word for word in (raw.strip(STRIP_CHARS) for raw in message.lower().split()) if word]
+                   for message in messages]
+    return list(chain.from_iterable(token_lists)), [len(tokens) for tokens in token_lists]
+
+
+def corpus(df):
+    """Token stream of a whole chat, built once per ``ChatIndex``.
+
+    Returns a dict with ``ids`` (vocabulary id of every token, in frame
+    order), ``rows`` (frame position each token came from), ``vocabulary``
+    and ``is_stop`` (stop-word flag per vocabulary id).
+    """
+    chat = ChatIndex.of(df)
+    if 'corpus' not in chat._cache:
+        tokens, lengths = tokenize(chat.frame['message'])
+        ids, vocabulary = pd.factorize(pd.Series(tokens, dtype=object))
+        vocabulary = np.asarray(vocabulary, dtype=object)
+        stop_words = load_stop_words()
+        chat._cache['corpus'] = {
+            'ids': ids.astype(np.int32),
+            'rows': np.repeat(np.arange(len(chat)), lengths),
+            'vocabulary': vocabulary,
+            'is_stop': np.fromiter((word in stop_words for word in vocabulary), dtype=bool, count=len(vocabulary)),
+        }
+    return chat._cache['corpus']
+
+
+def token_mask(df, selected_user='Overall', stop_words=False):
+    """Which tokens of the stream belong to a user's text messages."""
+    chat = ChatIndex.of(df)
+    stream = corpus(chat)
+    keep = np.zeros(len(chat), dtype=bool)
+    keep[chat.rows(selected_user, notifications=False, media=False)] = True
+    mask = keep[stream['rows']]
+    if not stop_words:
+        mask &= ~stream['is_stop'][stream['ids']]
+    return mask
+
+
+def message_words(df, selected_user='Overall', stop_words=False):
+    """Words of each of a user's text messages, one list per message."""
+    chat = ChatIndex.of(df)
+    stream = corpus(chat)
+    mask = token_mask(chat, selected_user, stop_words)
+    rows = chat.rows(selected_user, notifications=False, media=False)
+
+    words = stream['vocabulary'][stream['ids'][mask]].tolist()
+    # Tokens are in frame order, so each message's words are a contiguous run
+    counts = np.bincount(stream['rows'][mask], minlength=len(chat))[rows]
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    return [words[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def term_index(df):
+    """Sparse term counts of a chat's text messages, stop words excluded.
+
+    Returns a dict with ``by_user`` (user x term CSR matrix) and ``by_day``
+    (day x term CSR matrix) plus their row labels ``users`` and ``days``
+    (sorted). Columns are vocabulary ids of ``corpus``.
+    """
+    chat = ChatIndex.of(df)
+    if 'term_index' not in chat._cache:
+        stream = corpus(chat)
+        mask = token_mask(chat)
+        ids = stream['ids'][mask]
+        rows = stream['rows'][mask]
+        ones = np.ones(len(ids), dtype=np.int32)
+        shape = len(stream['vocabulary'])
+
+        user_codes, users = pd.factorize(chat.frame['user'])
+        days, day_codes = np.unique(chat.frame['only_date'].to_numpy(), return_inverse=True)
+
+        chat._cache['term_index'] = {
+            # Duplicate (row, term) entries are summed into counts
+            'by_user': sparse.csr_matrix((ones, (user_codes[rows], ids)), shape=(len(users), shape)),
+            'by_day': sparse.csr_matrix((ones, (day_codes[rows], ids)), shape=(len(days), shape)),
+            'users': pd.Index(users),
+            'days': pd.DatetimeIndex(days),
+        }
+    return chat._cache['term_index']
+
+
+def term_counts(df, selected_user='Overall', start=None, end=None):
+    """Count of every vocabulary term for a user and/or an inclusive date range."""
+    chat = ChatIndex.of(df)
+    index = term_index(chat)
+
+    if start is None and end is None:
+        if selected_user == 'Overall':
+            counts = index['by_user'].sum(axis=0)
+        else:
+            position = index['users'].get_indexer([selected_user])[0]
+            if position < 0:
+                return np.zeros(index['by_user'].shape[1], dtype=np.int64)
+            counts = index['by_user'][position].toarray()
+        return np.asarray(counts, dtype=np.int64).ravel()
+
+    days = index['days']
+    low = 0 if start is None else days.searchsorted(pd.Timestamp(start), side='left')
+    high = len(days) if end is None else days.searchsorted(pd.Timestamp(end), side='right')
+    if selected_user == 'Overall':
+        return np.asarray(index['by_day'][low:high].sum(axis=0), dtype=np.int64).ravel()
+
+    # A user within a date range: count that user's tokens on the days in range
+    stream = corpus(chat)
+    dates = chat.frame['only_date']
+    in_range = np.ones(len(chat), dtype=bool)
+    if start is not None:
+        in_range &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        in_range &= (dates <= pd.Timestamp(end)).to_numpy()
+    mask = token_mask(chat, selected_user) & in_range[stream['rows']]
+    return np.bincount(stream['ids'][mask], minlength=len(stream['vocabulary']))
+
+
+def top_terms(df, selected_user='Overall', n=20, start=None, end=None):
+    """The ``n`` most used words as ``(word, count)`` pairs, like ``Counter.most_common``.
+
+    Ties are broken by first appearance in the chat.
+    """
+    vocabulary = corpus(df)['vocabulary']
+    counts = term_counts(df, selected_user, start, end)
+    used = np.count_nonzero(counts)
+    n = min(n, used)
+    if n == 0:
+        return []
+
+    # One key per term: higher count first, then lower (earlier) id
+    key = counts * len(counts) + (len(counts) - 1 - np.arange(len(counts)))
+    top = np.argpartition(-key, n - 1)[:n]
+    top = top[np.argsort(-key[top])]
+    return list(zip(vocabulary[top].tolist(), counts[top].tolist()))
@@ -0,0 +1,84 @@
+"""Per-message text features shared by the style, moment and highlight scores.
+
+The style, moment and highlight analyses used to walk ``iterrows`` and, per
+message, count capitals with a generator and average word lengths with
+``np.mean``. ``text_features`` computes every feature for a whole chat at
+once: messages are encoded to code points in chunks and classified with lookup
+tables, so uppercase and whitespace follow ``str.isupper`` and ``str.split``
+exactly. The result is cached on the chat's ``ChatIndex``. Keyword hits live
+in ``keywords``.
+"""
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chat_index import ChatIndex
+
+# Messages encoded per step; bounds the size of the code point buffers
+CHUNK_MESSAGES = 50_000
+
+_EXCLAMATION = ord('!')
+_QUESTION = ord('?')
+
+
+@lru_cache(maxsize=1)
+def _char_tables():
+    """Uppercase and whitespace flags for every code point."""
+    chars = np.arange(sys.maxunicode + 1, dtype=np.uint32).view('<U1')
+    return np.char.isupper(chars), np.char.isspace(chars)
+
+
+def _count_chars(messages):
+    """Character-level counts for a list of messages, as a dict of int32 arrays."""
+    upper, space = _char_tables()
+    lengths = np.fromiter(map(len, messages), dtype=np.int64, count=len(messages))
+
+    # Each message followed by one whitespace separator, so words never run across
+    # messages and every message's span (separator included) is non-empty
+    points = np.frombuffer(('\n'.join(messages) + '\n').encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    starts = np.concatenate([[0], np.cumsum(lengths[:-1] + 1)]).astype(np.int64)
+
+    is_space = space[points]
+    previous_space = np.concatenate([[True], is_space[:-1]])
+    flags = {
+        'upper_count': upper[points],
+        'exclamation_count': points == _EXCLAMATION,
+        'question_count': points == _QUESTION,
+        'word_count': ~is_space & previous_space,
+        'word_chars': ~is_space,
+    }
+
+    # The separator is whitespace, so it adds nothing to any count
+    counts = {name: np.add.reduceat(flag.view(np.uint8), starts, dtype=np.int32) for name, flag in flags.items()}
+    counts['length'] = lengths.astype(np.int32)
+    return counts
+
+
+def text_features(df):
+    """Text features of every message, aligned with the chat frame.
+
+    Columns: ``length``, ``word_count``, ``upper_count``,
+    ``exclamation_count``, ``question_count``, ``caps_ratio`` and
+    ``avg_word_length``.
+    """
+    chat = ChatIndex.of(df)
+    if 'text_features' not in chat._cache:
+        messages = chat.frame['message'].tolist()
+        chunks = [_count_chars(messages[start:start + CHUNK_MESSAGES])
+                  for start in range(0, len(messages), CHUNK_MESSAGES)]
+        counts = {name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.zeros(0, dtype=np.int32)
+                  for name in ['length', 'word_count', 'upper_count', 'exclamation_count', 'question_count', 'word_chars']}
+
+        features = pd.DataFrame({name: counts[name] for name in
+                                 ['length', 'word_count', 'upper_count', 'exclamation_count', 'question_count']},
+                                index=chat.frame.index)
+        # Ratios are 0 for empty messages, as in the per-message versions
+        features['caps_ratio'] = np.divide(counts['upper_count'], counts['length'],
+                                           out=np.zeros(len(features)), where=counts['length'] > 0)
+        # Word characters over words is the mean of the word lengths
+        features['avg_word_length'] = np.divide(counts['word_chars'], counts['word_count'],
+                                                out=np.zeros(len(features)), where=counts['word_count'] > 0)
+        chat._cache['text_features'] = features
+    return chat._cache['text_features']